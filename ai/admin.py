@@ -1,9 +1,10 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import AssistantInfo, Thread, Message
+from .models import AssistantInfo, Thread, Message, VectorStoreFile, PendingVectorStoreSync
 
 admin.site.register(AssistantInfo)
 admin.site.register(Thread)
 admin.site.register(Message)
-
+admin.site.register(VectorStoreFile)
+admin.site.register(PendingVectorStoreSync)
@@ -0,0 +1,126 @@
+import hashlib
+import os
+import tempfile
+import threading
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def get_content_key(*parts: str) -> str:
+    return hashlib.blake2b("\0".join(parts).encode(), digest_size=32).hexdigest()
+
+
+class TranslationCache:
+    """
+    Translations of assistant replies in the Django cache, keyed on the text and the language.
+    """
+
+    @staticmethod
+    def get_key(text: str, language: str) -> str:
+        return f"translation:{get_content_key(language, text)}"
+
+    @staticmethod
+    def get(text: str, language: str) -> Optional[str]:
+        return cache.get(TranslationCache.get_key(text, language))
+
+    @staticmethod
+    def set(text: str, language: str, translated_text: str) -> None:
+        cache.set(TranslationCache.get_key(text, language), translated_text, settings.AI_TRANSLATION_CACHE_TIMEOUT)
+
+
+class AudioCache:
+    """
+    Content addressed speech clips on disk, one file per (text, language, voice, model) named by their hash.
+    Reads touch the file so its modification time is the last use, once the directory grows over max_bytes
+    the least recently used clips are removed until it is back under low_water of it.
+    Clips are written to a temporary file and moved in place so readers never see a partial clip.
+    """
+
+    def __init__(self, directory: str = None, max_bytes: int = None, max_text_length: int = None,
+                 low_water: float = 0.9):
+        self.directory = directory or settings.AI_AUDIO_CACHE_DIR
+        self.max_bytes = max_bytes or settings.AI_AUDIO_CACHE_MAX_BYTES
+        self.max_text_length = max_text_length or settings.AI_AUDIO_CACHE_MAX_TEXT_LENGTH
+        self.low_water = low_water
+        self.size = None
+        self._lock = threading.Lock()
+
+    def get_path(self, text: str, language: str, voice: str, model: str) -> str:
+        key = get_content_key(model, voice, language, text)
+        return os.path.join(self.directory, key[:2], f"{key}.mp3")
+
+    def get(self, text: str, language: str, voice: str, model: str) -> Optional[bytes]:
+        path = self.get_path(text, language, voice, model)
+        try:
+            with open(path, 'rb') as file:
+                audio = file.read()
+            os.utime(path)
+        except FileNotFoundError:
+            # Missing or evicted by another process between the read and the touch
+            return None
+        return audio
+
+    def set(self, text: str, language: str, voice: str, model: str, audio: bytes) -> None:
+        # Long replies are unlikely to repeat, they would only push the common ones out
+        if len(text) > self.max_text_length or len(audio) > self.max_bytes:
+            return
+        path = self.get_path(text, language, voice, model)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=os.path.dirname(path), delete=False) as file:
+            file.write(audio)
+        os.replace(file.name, path)
+
+        with self._lock:
+            if self.size is None:
+                self.size = self.get_size()
+            else:
+                self.size += len(audio)
+            if self.size > self.max_bytes:
+                self.size = self.evict()
+
+    def get_clips(self) -> [os.DirEntry]:
+        clips = []
+        if not os.path.isdir(self.directory):
+            return clips
+        for bucket in os.scandir(self.directory):
+            if bucket.is_dir():
+                clips.extend(entry for entry in os.scandir(bucket.path) if entry.name.endswith('.mp3'))
+        return clips
+
+    def get_size(self) -> int:
+        return sum(clip.stat().st_size for clip in self.get_clips())
+
+    def evict(self) -> int:
+        """
+        Remove the least recently used clips until the cache is under low_water of max_bytes, returns its size.
+        The directory is scanned again so clips written by other processes are accounted for.
+        """
+        clips = []
+        for clip in self.get_clips():
+            try:
+                stat = clip.stat()
+            except FileNotFoundError:
+                continue
+            clips.append((stat.st_mtime, stat.st_size, clip.path))
+        size = sum(clip_size for _, clip_size, _ in clips)
+        for _, clip_size, path in sorted(clips):
+            if size <= self.max_bytes * self.low_water:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            size -= clip_size
+        return size
+
+
+_audio_cache = None
+
+
+def get_audio_cache() -> AudioCache:
+    global _audio_cache
+    if _audio_cache is None or _audio_cache.directory != settings.AI_AUDIO_CACHE_DIR:
+        _audio_cache = AudioCache()
+    return _audio_cache
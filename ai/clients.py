@@ -0,0 +1,161 @@
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from django.conf import settings
+from openai import AsyncOpenAI, OpenAI
+from openai.types.beta import Assistant, Thread, VectorStore
+
+_clients = {}
+_clients_lock = threading.Lock()
+# The async connection pool is bound to the event loop it was created on
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_openai_client() -> OpenAI:
+    """
+    Return the process wide OpenAI client for the configured api key and base url.
+    The client is thread safe and keeps its HTTP connection pool between requests.
+    """
+    key = (settings.OPEN_AI_API_KEY, settings.OPEN_AI_BASE_URL)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                client = OpenAI(api_key=settings.OPEN_AI_API_KEY, base_url=settings.OPEN_AI_BASE_URL,
+                                max_retries=settings.OPEN_AI_MAX_RETRIES)
+                _clients[key] = client
+    return client
+
+
+def create_async_openai_client() -> AsyncOpenAI:
+    """
+    Return a new AsyncOpenAI client for the configured api key and base url, the caller closes it.
+    """
+    return AsyncOpenAI(api_key=settings.OPEN_AI_API_KEY, base_url=settings.OPEN_AI_BASE_URL,
+                       max_retries=settings.OPEN_AI_MAX_RETRIES)
+
+
+def get_async_openai_client() -> AsyncOpenAI:
+    """
+    Return the AsyncOpenAI client of the running event loop for the configured api key and base url.
+    Only meant for long lived loops like the one of the ASGI server, short lived loops such as the ones of
+    async_to_sync should use their own client from create_async_openai_client and close it.
+    """
+    key = (settings.OPEN_AI_API_KEY, settings.OPEN_AI_BASE_URL)
+    loop_clients = _async_clients.setdefault(asyncio.get_running_loop(), {})
+    client = loop_clients.get(key)
+    if client is None:
+        client = create_async_openai_client()
+        loop_clients[key] = client
+    return client
+
+
+class TTLCache:
+    """
+    Small thread safe in memory cache, entries expire after ttl seconds and the least recently used
+    entries are evicted once maxsize is reached.
+    """
+
+    def __init__(self, ttl: float, maxsize: int = 1024):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any) -> Any:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = self.set(key, factory())
+        return value
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def delete_matching(self, predicate: Callable[[Hashable], bool]) -> None:
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class OpenAIResourceCache:
+    """
+    Cache of the remote assistants, threads and vector stores plus the local AssistantInfo row.
+    Writes through AIBaseClass refresh the cached objects, AssistantInfo changes are invalidated by ai.signals.
+    Other processes see a change after at most OPEN_AI_CACHE_TTL seconds.
+    """
+    _cache = TTLCache(ttl=settings.OPEN_AI_CACHE_TTL)
+
+    @classmethod
+    def get_assistant_info(cls) -> 'AssistantInfo':
+        from ai.models import AssistantInfo
+        return cls._cache.get_or_set('assistant_info',
+                                     lambda: AssistantInfo.objects.first() or AssistantInfo.objects.create())
+
+    @classmethod
+    def get_assistant(cls, assistant_id: str) -> Assistant:
+        return cls._cache.get_or_set(('assistant', assistant_id),
+                                     lambda: get_openai_client().beta.assistants.retrieve(assistant_id))
+
+    @classmethod
+    def get_thread(cls, thread_id: str) -> Thread:
+        return cls._cache.get_or_set(('thread', thread_id),
+                                     lambda: get_openai_client().beta.threads.retrieve(thread_id))
+
+    @classmethod
+    def set_thread(cls, thread: Thread) -> Thread:
+        return cls._cache.set(('thread', thread.id), thread)
+
+    @classmethod
+    def get_vector_store(cls, vector_store_id: str) -> VectorStore:
+        return cls._cache.get_or_set(('vector_store', vector_store_id),
+                                     lambda: get_openai_client().beta.vector_stores.retrieve(vector_store_id))
+
+    @classmethod
+    def set_vector_store(cls, vector_store: VectorStore) -> VectorStore:
+        return cls._cache.set(('vector_store', vector_store.id), vector_store)
+
+    @classmethod
+    def invalidate_vector_store(cls, vector_store_id: str) -> None:
+        cls._cache.delete(('vector_store', vector_store_id))
+
+    @classmethod
+    def invalidate_assistant_info(cls) -> None:
+        # The assistant ids and the base vector store id live in AssistantInfo, drop everything they resolve to
+        assistant_info = cls._cache.get('assistant_info')
+        base_vector_store_id = assistant_info.base_vector_store_id if assistant_info else None
+        cls._cache.delete_matching(lambda key: key == 'assistant_info' or key[0] == 'assistant' or
+                                   key == ('vector_store', base_vector_store_id))
+
+    @classmethod
+    def clear(cls) -> None:
+        cls._cache.clear()
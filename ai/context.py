@@ -0,0 +1,200 @@
+import hashlib
+import re
+import uuid
+from typing import Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Model, QuerySet
+
+WHITESPACE = re.compile(r'\s+')
+CHARS_PER_TOKEN = 4
+RENDER_CHUNK_SIZE = 100
+
+
+def estimate_tokens(text: str) -> int:
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def compact(value, max_chars: int = None) -> str:
+    text = WHITESPACE.sub(' ', str(value)).strip() if value is not None else ''
+    max_chars = max_chars or settings.AI_CONTEXT_FIELD_MAX_CHARS
+    return text if len(text) <= max_chars else text[:max_chars - 3].rstrip() + '...'
+
+
+def join_fields(title: str, **fields) -> str:
+    parts = [title] + [f"{name.replace('_', ' ')}: {compact(value)}" for name, value in fields.items()
+                       if value not in (None, '', [])]
+    return ' | '.join(parts)
+
+
+def render_documents(documents) -> str:
+    return '; '.join(compact(f"file {document.file_id}: {document.description}") for document in documents)
+
+
+def get_version_key(model: type[Model], pk) -> str:
+    return f"ai_context_version:{model._meta.label_lower}:{pk}"
+
+
+def bump_versions(model: type[Model], pks) -> None:
+    """
+    Give the objects a new version, their cached texts and the texts that embed them are not used anymore.
+    """
+    cache.set_many({get_version_key(model, pk): uuid.uuid4().hex for pk in pks}, timeout=None)
+
+
+class ContextRenderer:
+    """
+    Renders one model as a compact single line. dependencies maps the lookups of the related rows that are part
+    of the text to their model, a change of any of them invalidates the cached text.
+    """
+    model_label = None
+    select_related = ()
+    prefetch_related = ()
+    dependencies = {}
+
+    @property
+    def model(self) -> type[Model]:
+        return apps.get_model(self.model_label)
+
+    def load(self, pks) -> dict:
+        queryset = self.model.objects.filter(pk__in=pks).select_related(*self.select_related)
+        return queryset.prefetch_related(*self.prefetch_related).in_bulk()
+
+    def render(self, obj) -> str:
+        raise NotImplementedError("Subclasses must implement this method.")
+
+
+class BeeRenderer(ContextRenderer):
+    model_label = 'honeycomb.Bee'
+    select_related = ('user',)
+    prefetch_related = ('documents',)
+    dependencies = {'user_id': settings.AUTH_USER_MODEL}
+
+    def render(self, bee) -> str:
+        return join_fields(f"Bee {bee.id}", name=f"{bee.user.first_name} {bee.user.last_name}".strip(),
+                           bee_type=bee.bee_type, bio=bee.bee_bio, documents=render_documents(bee.documents.all()))
+
+
+class HiveRenderer(ContextRenderer):
+    model_label = 'honeycomb.Hive'
+    prefetch_related = ('documents', 'tags')
+
+    def render(self, hive) -> str:
+        return join_fields(f"Hive {hive.id}: {compact(hive.name)}", hive_type=hive.hive_type,
+                           description=hive.description, requirements=hive.hive_requirements,
+                           tags=', '.join(tag.name for tag in hive.tags.all()),
+                           documents=render_documents(hive.documents.all()))
+
+
+class NectarRenderer(ContextRenderer):
+    model_label = 'honeycomb.Nectar'
+    prefetch_related = ('documents', 'tags')
+
+    def render(self, nectar) -> str:
+        return join_fields(f"Nectar {nectar.id}: {compact(nectar.nectar_title)}", hive_id=nectar.nectar_hive_id,
+                           description=nectar.nectar_description, required_skills=nectar.required_skills,
+                           price=nectar.price, duration=nectar.duration, deadline=nectar.deadline,
+                           status=nectar.status, tags=', '.join(tag.name for tag in nectar.tags.all()),
+                           documents=render_documents(nectar.documents.all()))
+
+
+class ContractRenderer(ContextRenderer):
+    model_label = 'honeycomb.Contract'
+    select_related = ('nectar', 'bee__user')
+    prefetch_related = ('documents', 'nectar__documents', 'nectar__tags', 'bee__documents')
+    dependencies = {'nectar_id': 'honeycomb.Nectar', 'bee_id': 'honeycomb.Bee',
+                    'bee__user_id': settings.AUTH_USER_MODEL}
+
+    def render(self, contract) -> str:
+        return join_fields(f"Contract {contract.id}", accepted_rate=contract.accepted_rate,
+                           is_accepted=contract.is_accepted, documents=render_documents(contract.documents.all()),
+                           nectar=f"({NectarRenderer().render(contract.nectar)})",
+                           bee=f"({BeeRenderer().render(contract.bee)})")
+
+
+class ReportRenderer(ContextRenderer):
+    model_label = 'honeycomb.Report'
+    select_related = ('hive', 'bee__user')
+    prefetch_related = ('documents', 'bee__documents')
+    dependencies = {'bee_id': 'honeycomb.Bee', 'bee__user_id': settings.AUTH_USER_MODEL}
+
+    def render(self, report) -> str:
+        return join_fields(f"Report {report.id}: {compact(report.title)}", hive_id=report.hive_id,
+                           nectar_id=report.nectar_id, status=report.status, hours=report.hours,
+                           content=report.content, documents=render_documents(report.documents.all()),
+                           bee=f"({BeeRenderer().render(report.bee)})")
+
+
+RENDERERS = {renderer.model_label.lower(): renderer for renderer in
+             (BeeRenderer(), HiveRenderer(), NectarRenderer(), ContractRenderer(), ReportRenderer())}
+
+
+def get_renderer(model: type[Model]) -> ContextRenderer:
+    return RENDERERS[model._meta.label_lower]
+
+
+class AIContextBuilder:
+    """
+    Renders querysets as compact AI readable text. The rendered line of every object is cached under the versions
+    of the object and of its dependencies, only the missing ones are loaded, in a few batched queries per chunk.
+    Rendering stops once the token budget shared by all render calls of the builder is used up.
+    """
+
+    def __init__(self, token_budget: Optional[int] = None):
+        self.remaining_tokens = token_budget
+
+    def get_versions(self, rows: [tuple], renderer: ContextRenderer) -> dict:
+        models = [renderer.model] + [apps.get_model(label) for label in renderer.dependencies.values()]
+        keys = {get_version_key(model, pk) for row in rows for model, pk in zip(models, row) if pk is not None}
+        versions = cache.get_many(keys)
+        missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+        if missing:
+            # A version that fell out of the cache must not match the texts rendered before it was lost
+            cache.set_many(missing, timeout=None)
+            versions.update(missing)
+        return {row[0]: [versions.get(get_version_key(model, pk)) for model, pk in zip(models, row)]
+                for row in rows}
+
+    @staticmethod
+    def get_text_key(renderer: ContextRenderer, pk, versions: [str]) -> str:
+        digest = hashlib.blake2b(':'.join(str(version) for version in versions).encode(), digest_size=8).hexdigest()
+        return f"ai_context:{renderer.model._meta.label_lower}:{pk}:{digest}"
+
+    def get_texts(self, rows: [tuple], renderer: ContextRenderer) -> dict:
+        versions = self.get_versions(rows, renderer)
+        keys = {row[0]: self.get_text_key(renderer, row[0], versions[row[0]]) for row in rows}
+        cached = cache.get_many(keys.values())
+        texts = {pk: cached[key] for pk, key in keys.items() if key in cached}
+
+        missing = [pk for pk in keys if pk not in texts]
+        if missing:
+            rendered = {pk: renderer.render(obj) for pk, obj in renderer.load(missing).items()}
+            cache.set_many({keys[pk]: text for pk, text in rendered.items()}, timeout=settings.AI_CONTEXT_CACHE_TIMEOUT)
+            texts.update(rendered)
+        return texts
+
+    def render(self, queryset: QuerySet) -> str:
+        renderer = get_renderer(queryset.model)
+        rows = list(queryset.values_list('pk', *renderer.dependencies))
+        lines = []
+        for start in range(0, len(rows), RENDER_CHUNK_SIZE):
+            chunk = rows[start:start + RENDER_CHUNK_SIZE]
+            texts = self.get_texts(chunk, renderer)
+            for index, row in enumerate(chunk):
+                text = texts.get(row[0])
+                if text is None:
+                    continue
+                if self.remaining_tokens is not None:
+                    tokens = estimate_tokens(text)
+                    if tokens > self.remaining_tokens:
+                        omitted = len(rows) - start - index
+                        lines.append(f"... {omitted} more {queryset.model._meta.verbose_name_plural} omitted")
+                        return '\n'.join(lines)
+                    self.remaining_tokens -= tokens
+                lines.append(text)
+        return '\n'.join(lines)
+
+    def render_object(self, obj: Model) -> str:
+        return self.render(type(obj).objects.filter(pk=obj.pk))
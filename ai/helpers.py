@@ -1,110 +1,225 @@
-import asyncio
-import time
-from typing import Literal
+from typing import AsyncIterator, Literal
 
+from asgiref.sync import async_to_sync, sync_to_async
 from django.conf import settings
 from django.db.models import QuerySet
-from openai import OpenAI
+import openai
 from openai.types.beta import VectorStore, Assistant, Thread
 from openai.types.beta.threads import Run
 
 import honeycomb.honeycomb_service
+from assistant.usage import UsageLedger
 from common.models import Document
-from .models import Thread as ThreadModel
+from .audio_cache import TranslationCache, get_audio_cache
+from .clients import get_openai_client, get_async_openai_client, OpenAIResourceCache
+from .models import Thread as ThreadModel, VectorStoreFile
+from .uploader import UploadResult, VectorStoreUploader
 
-client = OpenAI(api_key=settings.OPEN_AI_API_KEY)
+TRANSLATION_MODEL = "gpt-3.5-turbo"
+SPEECH_MODEL = "tts-1"
 
 
 class AIBaseClass:
     def __init__(self, assistant_type="general_assistant"):
         self.tools = None
-        self.client = OpenAI(api_key=settings.OPEN_AI_API_KEY)
+        self.client = get_openai_client()
         self.assistant_info = self.get_or_create_assistant_info_model_object()
         self.base_vector_store = self.assistant_info.base_vector_store_id
         self.functions = []
+        self.assistant_type = assistant_type
 
-        self.assistant = self.get_assistant(assistant_type)
+    @property
+    def assistant(self) -> Assistant:
+        # Retrieved on first use, jobs that only manage files never need it
+        return self.get_assistant(self.assistant_type)
 
     @staticmethod
-    def get_translation(audio_file) -> str:
+    def get_translation(audio_file, user: 'User' = None) -> str:
 
-        transcript = client.audio.translations.create(
+        transcript = get_openai_client().audio.translations.create(
             model="whisper-1",
             file=("transcript.mp3", audio_file, 'audio/mpeg'),
+            response_format="verbose_json",
         )
+        UsageLedger.record(user, "whisper-1", "stt", duration=round(float(getattr(transcript, 'duration', 0) or 0)))
         return transcript.text
 
     @staticmethod
-    def generate_audio(text: str, language="English", voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy"):
-        translated_text = text
-        if(language != "English"):
-            completion = client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=[
-                    {"role": "system", "content": f"You are a the best expert in {language} language. translate the user text to {language} and send the response without any extra text or signs or slash and etc"},
-                    {"role": "user", "content": text}
-                ]
+    async def get_translation_async(audio_file, user: 'User' = None) -> str:
+        transcript = await get_async_openai_client().audio.translations.create(
+            model="whisper-1",
+            file=("transcript.mp3", audio_file, 'audio/mpeg'),
+            response_format="verbose_json",
+        )
+        await sync_to_async(UsageLedger.record)(user, "whisper-1", "stt",
+                                                duration=round(float(getattr(transcript, 'duration', 0) or 0)))
+        return transcript.text
+
+    @staticmethod
+    def get_text_translation_messages(text: str, language: str) -> [dict]:
+        return [
+            {"role": "system", "content": f"You are a the best expert in {language} language. translate the user text to {language} and send the response without any extra text or signs or slash and etc"},
+            {"role": "user", "content": text}
+        ]
+
+    @staticmethod
+    def translate_text(text: str, language: str, user: 'User' = None) -> str:
+        if language == "English":
+            return text
+        translated_text = TranslationCache.get(text, language)
+        if translated_text is None:
+            completion = get_openai_client().chat.completions.create(
+                model=TRANSLATION_MODEL,
+                messages=AIBaseClass.get_text_translation_messages(text, language)
+            )
+            UsageLedger.record_completion(user, completion)
+            translated_text = completion.choices[0].message.content
+            TranslationCache.set(text, language, translated_text)
+        return translated_text
+
+    @staticmethod
+    async def translate_text_async(text: str, language: str, user: 'User' = None) -> str:
+        if language == "English":
+            return text
+        translated_text = await sync_to_async(TranslationCache.get)(text, language)
+        if translated_text is None:
+            completion = await get_async_openai_client().chat.completions.create(
+                model=TRANSLATION_MODEL,
+                messages=AIBaseClass.get_text_translation_messages(text, language)
             )
+            await sync_to_async(UsageLedger.record_completion)(user, completion)
             translated_text = completion.choices[0].message.content
+            await sync_to_async(TranslationCache.set)(text, language, translated_text)
+        return translated_text
+
+    @staticmethod
+    def generate_audio(text: str, language="English", voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
+                       user: 'User' = None) -> bytes:
+        audio_cache = get_audio_cache()
+        audio = audio_cache.get(text, language, voice, SPEECH_MODEL)
+        if audio is not None:
+            return audio
+        translated_text = AIBaseClass.translate_text(text, language, user)
         print(translated_text)
-        response = client.audio.speech.create(
-            model="tts-1",
+        response = get_openai_client().audio.speech.create(
+            model=SPEECH_MODEL,
             voice=voice,
             input=translated_text,
         )
-        return response
+        UsageLedger.record(user, SPEECH_MODEL, "tts", characters=len(translated_text))
+        audio_cache.set(text, language, voice, SPEECH_MODEL, response.content)
+        return response.content
 
-    def get_new_file_ids(self, vector_store_id, document_queryset: QuerySet[Document]) -> [str]:
+    @staticmethod
+    async def generate_audio_async(text: str, language="English",
+                                   voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
+                                   user: 'User' = None) -> bytes:
+        return b"".join([chunk async for chunk in AIBaseClass.stream_audio_async(text, language, voice, user)])
+
+    @staticmethod
+    async def stream_audio_async(text: str, language="English",
+                                 voice: Literal["alloy", "echo", "fable", "onyx", "nova", "shimmer"] = "alloy",
+                                 user: 'User' = None, chunk_size: int = None) -> AsyncIterator[bytes]:
         """
-        Retrieve new file IDs that are not already in the vector store.
+        Yield the speech of the text in chunks as the synthesis produces them, cached clips are yielded at once.
+        """
+        chunk_size = chunk_size or settings.AI_VOICE_FRAME_SIZE
+        # Clips are keyed on the source text, a cached clip needs neither the translation nor the synthesis
+        audio_cache = get_audio_cache()
+        audio = await sync_to_async(audio_cache.get, thread_sensitive=False)(text, language, voice, SPEECH_MODEL)
+        if audio is not None:
+            for start in range(0, len(audio), chunk_size):
+                yield audio[start:start + chunk_size]
+            return
+
+        translated_text = await AIBaseClass.translate_text_async(text, language, user)
+        chunks = []
+        async with get_async_openai_client().audio.speech.with_streaming_response.create(
+                model=SPEECH_MODEL,
+                voice=voice,
+                input=translated_text,
+        ) as response:
+            async for chunk in response.iter_bytes(chunk_size):
+                chunks.append(chunk)
+                yield chunk
+        await sync_to_async(UsageLedger.record)(user, SPEECH_MODEL, "tts", characters=len(translated_text))
+        await sync_to_async(audio_cache.set, thread_sensitive=False)(text, language, voice, SPEECH_MODEL,
+                                                                     b"".join(chunks))
 
-        :param vector_store_id: The ID of the vector store.
-        :param document_queryset: QuerySet of documents to check.
-        :return: List of new file IDs.
+    @staticmethod
+    def get_supported_documents(document_queryset: QuerySet[Document]) -> {str: Document}:
+        """
+        Return the documents that can be added to a vector store by their file id.
         """
         supported_extensions = ['pdf', 'txt', 'docx']  # Add all supported extensions here
 
-        file_ids = []
+        documents = {}
         for document in document_queryset:
             file_extension = document.document.file.name.split('.')[-1].lower()
             if file_extension not in supported_extensions:
                 print(
                     f"Unsupported file extension: {file_extension} for document {document.document.file.name} - {document.document.id}")
                 continue
+            if document.file_id:
+                documents[document.file_id] = document
+        return documents
 
-            file_ids.append(document.file_id)
-
-        # Distinct file_ids
-        file_ids = list(set(file_ids))
-
-        # Retrieve existing file IDs from the vector store
-        try:
-            existing_files_page = self.client.beta.vector_stores.files.list(vector_store_id=vector_store_id)
-            existing_file_ids = {file.id for file in existing_files_page}
-        except Exception as e:
-            print(f"Failed to retrieve existing files from vector store: {e}")
-            return []
-
-        # Filter out the file IDs that are already in the vector store
-        new_file_ids = [file_id for file_id in file_ids if file_id not in existing_file_ids]
+    def get_new_file_ids(self, vector_store_id, document_queryset: QuerySet[Document]) -> [str]:
+        """
+        Retrieve new file IDs that are not already in the vector store according to the local manifest.
 
-        return new_file_ids
+        :param vector_store_id: The ID of the vector store.
+        :param document_queryset: QuerySet of documents to check.
+        :return: List of new file IDs.
+        """
+        documents = self.get_supported_documents(document_queryset)
+        return VectorStoreFile.objects.get_missing_file_ids(
+            vector_store_id, {file_id: document.hash for file_id, document in documents.items()})
 
-    def add_documents_to_vector_store(self, vector_store_id, document_queryset):
+    def add_documents_to_vector_store(self, vector_store_id, document_queryset, remove_missing: bool = False):
         """
-        Add documents to the vector store.
+        Add documents to the vector store, only the files missing from the local manifest are sent.
 
         :param vector_store_id: The ID of the vector store.
         :param document_queryset: QuerySet of documents to add.
+        :param remove_missing: Also remove the files of the vector store that are not in document_queryset.
         :return: None
         """
-
-        new_file_ids = self.get_new_file_ids(vector_store_id, document_queryset)
+        documents = self.get_supported_documents(document_queryset)
+        content_hashes = {file_id: document.hash for file_id, document in documents.items()}
+        new_file_ids = VectorStoreFile.objects.get_missing_file_ids(vector_store_id, content_hashes)
         if new_file_ids:
-            asyncio.run(add_files_async(vector_store_id, new_file_ids))
+            self.upload_files_to_vector_store(vector_store_id, {file_id: content_hashes[file_id]
+                                                                for file_id in new_file_ids})
         else:
             print("No new files to add to vector store")
 
+        if remove_missing:
+            for file_id in VectorStoreFile.objects.get_stale_file_ids(vector_store_id, content_hashes.keys()):
+                try:
+                    self.client.beta.vector_stores.files.delete(vector_store_id=vector_store_id, file_id=file_id)
+                except openai.NotFoundError:
+                    pass
+                except openai.OpenAIError as e:
+                    print(f"Failed to remove file {file_id} from vector store {vector_store_id}: {e}")
+                    continue
+                VectorStoreFile.objects.filter(vector_store_id=vector_store_id, file_id=file_id).delete()
+        OpenAIResourceCache.invalidate_vector_store(vector_store_id)
+
+    def upload_files_to_vector_store(self, vector_store_id: str, content_hashes: {str: str}) -> UploadResult:
+        """
+        Add the files to the vector store with the batch uploader and record the outcome in the manifest.
+        Failed files are marked as such and retried by the next sync, the caller decides how to report them.
+        """
+        VectorStoreFile.objects.mark(vector_store_id, content_hashes, VectorStoreFile.STATUS_IN_PROGRESS)
+        result = async_to_sync(VectorStoreUploader().upload)(vector_store_id, list(content_hashes))
+
+        for status, file_ids in ((VectorStoreFile.STATUS_COMPLETED, result.completed_file_ids),
+                                 (VectorStoreFile.STATUS_FAILED, result.failed_file_ids)):
+            VectorStoreFile.objects.mark(vector_store_id, {file_id: content_hashes[file_id] for file_id in file_ids},
+                                         status)
+        return result
+
     def get_hive_tools(self, hive_id: str) -> 'HiveAI':
         if self.tools:
             return self.tools
@@ -114,9 +229,9 @@ class AIBaseClass:
 
     def get_or_create_vector_store(self, vector_store_id: str) -> VectorStore:
         if not vector_store_id:
-            return self.client.beta.vector_stores.create()
+            return OpenAIResourceCache.set_vector_store(self.client.beta.vector_stores.create())
         else:
-            return self.client.beta.vector_stores.retrieve(vector_store_id)
+            return OpenAIResourceCache.get_vector_store(vector_store_id)
 
     def add_files_to_vector_store(self, file_ids: [str], vector_store_id: str) -> VectorStore:
         self.client.beta.vector_stores.file_batches.create(
@@ -124,6 +239,7 @@ class AIBaseClass:
             file_ids=file_ids
         )
 
+        OpenAIResourceCache.invalidate_vector_store(vector_store_id)
         return self.get_or_create_vector_store(vector_store_id)
 
     def add_file_to_vector_store(self, file_id: str, vector_store_id: str) -> VectorStore:
@@ -132,6 +248,7 @@ class AIBaseClass:
             file_id=file_id
         )
 
+        OpenAIResourceCache.invalidate_vector_store(vector_store_id)
         return self.get_or_create_vector_store(vector_store_id)
 
     def remove_file_from_vector_store(self, file_id: str, vector_store_id: str) -> VectorStore:
@@ -140,31 +257,46 @@ class AIBaseClass:
             file_id=file_id
         )
 
+        OpenAIResourceCache.invalidate_vector_store(vector_store_id)
         return self.get_or_create_vector_store(vector_store_id)
 
     @staticmethod
     def get_or_create_assistant_info_model_object() -> 'AssistantInfo':
-        from ai.models import AssistantInfo
-        if AssistantInfo.objects.count() < 1:
-            return AssistantInfo.objects.create()
-        else:
-            return AssistantInfo.objects.first()
+        return OpenAIResourceCache.get_assistant_info()
 
     def get_or_create_thread(self, thread_id) -> Thread:
         if not thread_id:
-            return self.client.beta.threads.create()
+            return OpenAIResourceCache.set_thread(self.client.beta.threads.create())
         else:
-            return self.client.beta.threads.retrieve(thread_id)
+            return OpenAIResourceCache.get_thread(thread_id)
 
     def get_or_create_thread_by_user(self, user: 'User') -> Thread:
         thread_model_object = ThreadModel.objects.filter(user=user).first()
         if thread_model_object:
-            return self.client.beta.threads.retrieve(thread_model_object.thread_id)
+            return OpenAIResourceCache.get_thread(thread_model_object.thread_id)
         else:
-            thread = self.client.beta.threads.create()
+            thread = OpenAIResourceCache.set_thread(self.client.beta.threads.create())
             ThreadModel.objects.create(user=user, thread_id=thread.id)
             return thread
 
+    def update_thread_vector_stores(self, thread_id: str, vector_store_ids: [str]) -> Thread:
+        """
+        Attach the vector stores to the thread for file search. The update is skipped if the thread row already
+        records them, the cached thread can be outdated when another process updated it.
+        """
+        thread = self.get_or_create_thread(thread_id)
+        thread_rows = ThreadModel.objects.filter(thread_id=thread_id)
+        if thread_rows.values_list('vector_store_ids', flat=True).first() == list(vector_store_ids):
+            return thread
+        thread = OpenAIResourceCache.set_thread(self.client.beta.threads.update(
+            thread_id,
+            tool_resources={
+                "file_search": {"vector_store_ids": vector_store_ids}},
+            metadata=thread.metadata
+        ))
+        thread_rows.update(vector_store_ids=list(vector_store_ids))
+        return thread
+
     def run(self, assistant_id: str, thread_id: str, additional_instructions: str = "") -> Run:
         run = self.client.beta.threads.runs.create_and_poll(
             thread_id=thread_id,
@@ -180,7 +312,7 @@ class AIBaseClass:
         #     print("Cancelled existing run")
         # except Exception as e:
         #     print(f"Failed to cancel existing run: {e}")
-        thread = self.client.beta.threads.retrieve(thread_id)
+        thread = self.get_or_create_thread(thread_id)
         self.client.beta.threads.messages.create(
             thread_id=thread_id,
             content=message,
@@ -191,11 +323,11 @@ class AIBaseClass:
 
     def get_assistant(self, model: str) -> Assistant:
         if model == "general_assistant":
-            return self.client.beta.assistants.retrieve(self.assistant_info.general_assistant_id)
+            return OpenAIResourceCache.get_assistant(self.assistant_info.general_assistant_id)
         elif model == "hive_assistant":
-            return self.client.beta.assistants.retrieve(self.assistant_info.hive_assistant_id)
+            return OpenAIResourceCache.get_assistant(self.assistant_info.hive_assistant_id)
         else:
-            return self.client.beta.assistants.retrieve(self.assistant_info.backend_assistant_id)
+            return OpenAIResourceCache.get_assistant(self.assistant_info.backend_assistant_id)
 
 
 class HiveAI:
@@ -208,59 +340,3 @@ class HiveAI:
         hive_object = honeycomb.honeycomb_service.HiveService.get_hive(hive_id)
         return self.ai_base_class.get_or_create_vector_store(
             hive_object.vector_store_id if hive_object.vector_store_id else None)
-
-
-async def add_files_async(vector_store_id, file_ids):
-    tasks = []
-    for file_id in file_ids:
-        task = asyncio.create_task(create_file(vector_store_id, file_id))
-        tasks.append(task)
-
-    await asyncio.gather(*tasks)
-
-
-async def create_file(vector_store_id, file_id):
-    from django.conf import settings
-    from openai import OpenAI
-    client = OpenAI(api_key=settings.OPEN_AI_API_KEY)
-    print(f"Adding file {file_id} to vector store {vector_store_id}")
-    loop = asyncio.get_event_loop()
-    try:
-        await loop.run_in_executor(None, lambda: client.beta.vector_stores.files.create_and_poll(
-            vector_store_id=vector_store_id, file_id=file_id))
-        print(f"Successfully added file {file_id} to vector store")
-    except Exception as e:
-        print(f"Failed to add file {file_id} to vector store: {e}")
-        raise e
-
-
-async def create_file(vector_store_id, file_id):
-    loop = asyncio.get_event_loop()
-    client = OpenAI(api_key=settings.OPEN_AI_API_KEY)
-
-    try:
-        await loop.run_in_executor(None, lambda: client.beta.vector_stores.files.create_and_poll(
-            vector_store_id=vector_store_id, file_id=file_id))
-        print(f"Successfully initiated upload for file {file_id}")
-
-        # Polling until the file becomes available
-        await poll_file_availability(vector_store_id, file_id)
-
-        print(f"File {file_id} is now available in vector store")
-    except Exception as e:
-        print(f"Failed to add file {file_id} to vector store: {e}")
-
-
-async def poll_file_availability(vector_store_id, file_id, timeout=20, poll_interval=2):
-    start_time = time.time()
-    while time.time() - start_time < timeout:
-        try:
-            # Replace this with the actual method to check if the file is available
-            file = client.beta.vector_stores.files.retrieve(vector_store_id=vector_store_id, file_id=file_id)
-            if file and file.status == 'completed':  # Assuming 'available' is the status you are checking for
-                return file
-        except Exception as e:
-            print(f"Waiting for file {file_id} to become available: {e}")
-
-        await asyncio.sleep(poll_interval)
-    raise TimeoutError(f"File {file_id} did not become available within {timeout} seconds.")
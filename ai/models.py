@@ -1,4 +1,8 @@
+from datetime import timedelta
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 
 
 # Create your models here
@@ -17,6 +21,8 @@ class Thread(models.Model):
     thread_id = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now=True)
     title = models.CharField(max_length=255, blank=True)
+    # Vector stores last attached to the OpenAI thread, shared by the processes that update it
+    vector_store_ids = models.JSONField(default=list, blank=True)
 
 
 class Message(models.Model):
@@ -27,3 +33,88 @@ class Message(models.Model):
     status = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+
+class VectorStoreFileManager(models.Manager):
+    def get_missing_file_ids(self, vector_store_id: str, content_hashes: dict) -> [str]:
+        """
+        Return the file ids of content_hashes ({file_id: content hash}) that are not in the vector store yet,
+        failed before, were recorded with another content or are still in progress after the upload timeout,
+        the worker uploading them is taken for dead.
+        """
+        abandoned_before = timezone.now() - timedelta(seconds=settings.VECTOR_STORE_FILE_IN_PROGRESS_TIMEOUT)
+        synced = dict(self.filter(vector_store_id=vector_store_id, file_id__in=content_hashes.keys()).exclude(
+            status=VectorStoreFile.STATUS_FAILED).exclude(
+            status=VectorStoreFile.STATUS_IN_PROGRESS, updated_at__lt=abandoned_before).values_list(
+            'file_id', 'content_hash'))
+        return [file_id for file_id, content_hash in content_hashes.items() if synced.get(file_id) != content_hash]
+
+    def get_stale_file_ids(self, vector_store_id: str, file_ids) -> [str]:
+        return list(self.filter(vector_store_id=vector_store_id).exclude(file_id__in=file_ids)
+                    .values_list('file_id', flat=True))
+
+    def mark(self, vector_store_id: str, content_hashes: dict, status: str) -> None:
+        self.bulk_create(
+            [VectorStoreFile(vector_store_id=vector_store_id, file_id=file_id, content_hash=content_hash, status=status)
+             for file_id, content_hash in content_hashes.items()],
+            update_conflicts=True, unique_fields=['vector_store_id', 'file_id'],
+            update_fields=['content_hash', 'status', 'updated_at'],
+        )
+
+
+class VectorStoreFile(models.Model):
+    """
+    Local manifest of the files added to the OpenAI vector stores, syncs only send the difference.
+    """
+    STATUS_IN_PROGRESS = 'in_progress'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_IN_PROGRESS, 'In progress'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    vector_store_id = models.CharField(max_length=255)
+    file_id = models.CharField(max_length=255)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=STATUS_IN_PROGRESS)
+    content_hash = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = VectorStoreFileManager()
+
+    class Meta:
+        unique_together = ('vector_store_id', 'file_id')
+
+    def __str__(self):
+        return f"{self.file_id} in {self.vector_store_id} ({self.status})"
+
+
+class PendingVectorStoreSyncManager(models.Manager):
+    def claim(self, vector_store_id: str, stale_after: int) -> bool:
+        """
+        Record that a sync of the vector store is queued, False if one already is. A claim older than
+        stale_after seconds belongs to a job that never ran and is taken over.
+        """
+        self.filter(vector_store_id=vector_store_id,
+                    claimed_at__lt=timezone.now() - timedelta(seconds=stale_after)).delete()
+        _, created = self.get_or_create(vector_store_id=vector_store_id)
+        return created
+
+    def release(self, vector_store_id: str) -> None:
+        self.filter(vector_store_id=vector_store_id).delete()
+
+
+class PendingVectorStoreSync(models.Model):
+    """
+    Sync job of a vector store that is queued but has not started, changes made until then share it.
+    Kept in the database so the web processes and the celery workers see the same claims.
+    """
+    vector_store_id = models.CharField(max_length=255, unique=True)
+    claimed_at = models.DateTimeField(auto_now_add=True)
+
+    objects = PendingVectorStoreSyncManager()
+
+    def __str__(self):
+        return f"Sync of {self.vector_store_id} pending since {self.claimed_at}"
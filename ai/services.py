@@ -1,9 +1,7 @@
-import json
-
-from django.conf import settings
 from django.contrib.auth import get_user_model
-from openai import OpenAI
+from openai.types.beta import Thread as OpenAIThread
 
+from assistant.usage import UsageLedger
 from common.models import Document
 from communication.services import NotificationService, ConversationService
 from communication.websocket_helper import WebSocketHelper
@@ -11,11 +9,11 @@ from honeycomb.honeycomb_service import HiveService, BeeService, NectarService,
 from honeycomb.serializers import BeeSerializer, BeeWithDetailSerializer, NectarSerializer
 from user.services import UserService
 from .helpers import AIBaseClass
+from .tool_executor import ToolCallExecutor, parse_tool_arguments
 from .models import Message, Thread
 from .serializers import HiveSerializer
 
 User = get_user_model()
-client = OpenAI(api_key=settings.OPEN_AI_API_KEY)
 
 
 def create_user(email, first_name, last_name, phone_number="", skills=None, certificates=None, education=None, bio=None,
@@ -56,19 +54,11 @@ class AIService:
         #             {[bee.convert_to_ai_readable() for bee in Bee.objects.all()]}
         #             """ + additional_instructions
 
-        self.last_message = Message.objects.create(content=message, user=self.user, thread_id=self.local_thread_id)
         hives = self.hive_service.get_user_hives(self.user)
         vector_stores = [self.ai.base_vector_store, ] if not vector_stores else vector_stores
-        thread = self.ai.get_or_create_thread(self.thread_id)
-
-        thread = client.beta.threads.update(
-            self.thread_id,
-            tool_resources={
-                "file_search": {"vector_store_ids": vector_stores}},
-            metadata=thread.metadata
-        )
+        thread = self.prepare_message(message, vector_stores)
         if ai_type == "backend_assistant":
-            thread = client.beta.threads.create(
+            thread = self.ai.client.beta.threads.create(
                 tool_resources={
                     "file_search": {"vector_store_ids": vector_stores}},
                 metadata=thread.metadata
@@ -77,57 +67,54 @@ class AIService:
         run = self.ai.run(self.ai.get_assistant(ai_type).id, thread.id, additional_instructions)
         return self.process_ai_response(run)
 
-    def review_document_with_file_id(self, file_id):
-        """Send a document for review to the specified assistant using its file_id."""
-        document = Document.objects.get(file_id=file_id)
-        isolated_vector_store = self.ai.get_or_create_vector_store("")
-        document.isolated_vector_store = isolated_vector_store.id
-        self.ai.add_documents_to_vector_store(isolated_vector_store.id, [document])
-
-        self.send_message(f"Review this file id: {file_id}", ai_type="backend_assistant",
-                          additional_instructions=f'you need to specifically look into the file id {file_id} and call create_user function with the required arguments. note that everything should be in English',
-                          vector_stores=[isolated_vector_store.id])
+    def prepare_message(self, message: str, vector_stores: [str] = None) -> OpenAIThread:
+        """
+        Store the user message locally and attach the vector stores to the user's thread.
+        """
+        self.last_message = Message.objects.create(content=message, user=self.user, thread_id=self.local_thread_id)
+        vector_stores = [self.ai.base_vector_store, ] if not vector_stores else vector_stores
+        return self.ai.update_thread_vector_stores(self.thread_id, vector_stores)
+
+    def save_response(self, response: str) -> str:
+        self.last_message.response = response
+        self.last_message.save()
+        print(self.last_message.response.encode('utf-8', errors='ignore'))
+        return self.last_message.response
+
+    def review_document_with_file_id(self, file_id, vector_store_id: str = None):
+        """Send a document for review to the specified assistant using its file_id.
+
+        The document is added to a new isolated vector store unless vector_store_id already holds it.
+        """
+        if not vector_store_id:
+            document = Document.objects.get(file_id=file_id)
+            vector_store_id = self.ai.get_or_create_vector_store("").id
+            document.isolated_vector_store = vector_store_id
+            document.save(update_fields=['isolated_vector_store'])
+            self.ai.add_documents_to_vector_store(vector_store_id, [document])
+
+        return self.send_message(f"Review this file id: {file_id}", ai_type="backend_assistant",
+                                 additional_instructions=f'you need to specifically look into the file id {file_id} and call create_user function with the required arguments. note that everything should be in English',
+                                 vector_stores=[vector_store_id])
 
     def process_ai_response(self, run):
-        print(run.status)
+        UsageLedger.record_run(self.user, run)
         if run.status == "requires_action":
-            print("here")
-            function_responses = list()
-            for tool in run.required_action.submit_tool_outputs.tool_calls:
-                arguments = tool.function.arguments
-                # parse string to dict
-                try:
-                    arguments = json.loads(arguments)
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing arguments: {e}")
-                    arguments = {}
-                _function = self.get_function_reference(tool.function.name)
-                try:
-                    function_response = _function(**arguments, user=self.user)
-                except Exception as e:
-                    print(f"Error processing function: {e}")
-                    function_response = "Error processing function"
-                if isinstance(function_response, str):
-                    function_responses.append({
-                        "tool_call_id": tool.id,
-                        "output": function_response
-                    })
-                else:
-                    function_responses.append({
-                        "tool_call_id": tool.id,
-                        "output": "Error processing function"
-                    })
+            function_responses = ToolCallExecutor(self.invoke_tool).execute(
+                run.required_action.submit_tool_outputs.tool_calls)
 
             return self.process_ai_response(
-                client.beta.threads.runs.submit_tool_outputs_and_poll(tool_outputs=function_responses, run_id=run.id,
-                                                                      thread_id=run.thread_id))
+                self.ai.client.beta.threads.runs.submit_tool_outputs_and_poll(tool_outputs=function_responses,
+                                                                              run_id=run.id,
+                                                                              thread_id=run.thread_id))
 
         elif run.status == "completed":
-            response = client.beta.threads.messages.list(thread_id=run.thread_id).data[0]
-            self.last_message.response = response.content[0].text.value
-            self.last_message.save()
-            print(self.last_message.response.encode('utf-8', errors='ignore'))
-            return self.last_message.response
+            response = self.ai.client.beta.threads.messages.list(thread_id=run.thread_id).data[0]
+            return self.save_response(response.content[0].text.value)
+
+    def invoke_tool(self, tool):
+        _function = self.get_function_reference(tool.function.name)
+        return _function(**parse_tool_arguments(tool), user=self.user)
 
     def show_bees_to_user(self, bees_id_list: [str],**kwargs) -> str:
         bees_queryset = self.bee_service.get_bee_queryset(bees_id_list)
@@ -0,0 +1,53 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+from taggit.models import TaggedItem
+
+from common.models import Document
+from honeycomb.models import Hive, Bee, Nectar, Contract, Report
+from .clients import OpenAIResourceCache
+from .context import bump_versions
+from .models import AssistantInfo
+
+User = get_user_model()
+
+DOCUMENT_OWNER_MODELS = (Hive, Bee, Nectar, Contract, Report)
+CONTEXT_MODELS = DOCUMENT_OWNER_MODELS + (User,)
+
+
+@receiver([post_save, post_delete], sender=AssistantInfo)
+def invalidate_assistant_info_cache(sender, **kwargs):
+    OpenAIResourceCache.invalidate_assistant_info()
+
+
+def invalidate_ai_context(sender, instance, **kwargs):
+    bump_versions(sender, [instance.pk])
+
+
+for context_model in CONTEXT_MODELS:
+    post_save.connect(invalidate_ai_context, sender=context_model, dispatch_uid=f'ai_context_{context_model.__name__}')
+    post_delete.connect(invalidate_ai_context, sender=context_model,
+                        dispatch_uid=f'ai_context_delete_{context_model.__name__}')
+
+
+def invalidate_ai_context_relations(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_versions(type(instance), [instance.pk])
+    elif pk_set and model in CONTEXT_MODELS:
+        bump_versions(model, pk_set)
+
+
+for owner_model in DOCUMENT_OWNER_MODELS:
+    m2m_changed.connect(invalidate_ai_context_relations, sender=owner_model.documents.through,
+                        dispatch_uid=f'ai_context_documents_{owner_model.__name__}')
+m2m_changed.connect(invalidate_ai_context_relations, sender=TaggedItem, dispatch_uid='ai_context_tags')
+
+
+@receiver(post_save, sender=Document)
+def invalidate_document_owners_ai_context(sender, instance, created, **kwargs):
+    if created:
+        return
+    for owner_model in DOCUMENT_OWNER_MODELS:
+        bump_versions(owner_model, owner_model.objects.filter(documents=instance).values_list('pk', flat=True))
@@ -0,0 +1,162 @@
+import asyncio
+import re
+from typing import Awaitable, Callable, Optional
+
+from asgiref.sync import sync_to_async
+
+from assistant.usage import UsageLedger
+from .clients import get_async_openai_client
+from .helpers import AIBaseClass
+from .tool_executor import ToolCallExecutor
+
+# Split the streamed text after a sentence end so speech can start before the answer is complete
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?؟。])\s+')
+MIN_SPEECH_CHUNK_LENGTH = 40
+RUN_STATUS_EVENTS = ('thread.run.created', 'thread.run.queued', 'thread.run.in_progress',
+                     'thread.run.requires_action', 'thread.run.completed', 'thread.run.failed',
+                     'thread.run.cancelled', 'thread.run.expired', 'thread.run.incomplete')
+
+
+class AssistantStreamPipeline:
+    """
+    Async version of AIService.send_message. The run is streamed with the async OpenAI client, text deltas and
+    run status changes are forwarded through send_event as they arrive, tool calls of a step run concurrently and
+    speech is synthesized per sentence while the rest of the answer is still being generated.
+    The speech of every sentence is passed to send_audio as one clip in the order of the text, or with
+    send_audio_chunk in chunks as the synthesis streams them, numbered per clip and flagged on the last chunk.
+    """
+
+    def __init__(self, user: 'User', send_event: Callable[[dict], Awaitable],
+                 send_audio: Callable[[bytes], Awaitable] = None, language: str = "English",
+                 assistant_type: str = 'backend_assistant', service: 'AIService' = None,
+                 send_audio_chunk: Callable[[int, int, bytes, bool], Awaitable] = None):
+        self.user = user
+        self.send_event = send_event
+        self.send_audio = send_audio
+        self.send_audio_chunk = send_audio_chunk
+        self.language = language
+        self.assistant_type = assistant_type
+        self.service = service
+        self.speech_buffer = ""
+        self.speech_queue = None
+
+    async def send_message(self, message: str, additional_instructions: str = "",
+                           ai_type: str = "general_assistant", vector_stores=None) -> Optional[str]:
+        from .services import AIService
+        if self.service is None:
+            self.service = await sync_to_async(AIService)(self.user, self.assistant_type)
+        thread = await sync_to_async(self.service.prepare_message)(message, vector_stores)
+        assistant = await sync_to_async(self.service.ai.get_assistant)(ai_type)
+
+        client = get_async_openai_client()
+        await client.beta.threads.messages.create(thread_id=thread.id, content=message, role="user")
+
+        audio_sender = None
+        if self.send_audio or self.send_audio_chunk:
+            self.speech_queue = asyncio.Queue()
+            audio_sender = asyncio.create_task(self.send_speech_in_order())
+        try:
+            stream = await client.beta.threads.runs.create(thread_id=thread.id, assistant_id=assistant.id,
+                                                           additional_instructions=additional_instructions,
+                                                           stream=True)
+            response = await self.consume(stream)
+        finally:
+            if audio_sender:
+                self.flush_speech(force=True)
+                self.speech_queue.put_nowait(None)
+                await audio_sender
+
+        if response is not None:
+            await sync_to_async(self.service.save_response)(response)
+        return response
+
+    async def consume(self, stream) -> Optional[str]:
+        client = get_async_openai_client()
+        text = []
+        while stream is not None:
+            run = None
+            async with stream:
+                async for event in stream:
+                    if event.event == 'thread.message.delta':
+                        for content in event.data.delta.content or []:
+                            if content.type == 'text' and content.text and content.text.value:
+                                text.append(content.text.value)
+                                await self.on_text_delta(content.text.value)
+                    elif event.event in RUN_STATUS_EVENTS:
+                        run = event.data
+                        await self.send_event({"type": "assistant_status", "message": {"status": run.status}})
+
+            stream = None
+            if run is None:
+                return None
+            await sync_to_async(UsageLedger.record_run)(self.user, run)
+            if run.status == "requires_action":
+                tool_outputs = await ToolCallExecutor(self.service.invoke_tool).execute_async(
+                    run.required_action.submit_tool_outputs.tool_calls)
+                stream = await client.beta.threads.runs.submit_tool_outputs(run_id=run.id, thread_id=run.thread_id,
+                                                                            tool_outputs=tool_outputs, stream=True)
+            elif run.status != "completed":
+                print(f"Assistant run {run.id} ended with status {run.status}")
+                return None
+        return "".join(text)
+
+    async def on_text_delta(self, delta: str):
+        await self.send_event({"type": "assistant_delta", "message": {"text": delta}})
+        if self.speech_queue is not None:
+            self.speech_buffer += delta
+            self.flush_speech()
+
+    def flush_speech(self, force: bool = False):
+        if force:
+            chunk, self.speech_buffer = self.speech_buffer, ""
+        else:
+            sentences = SENTENCE_BOUNDARY.split(self.speech_buffer)
+            if len(sentences) < 2:
+                return
+            chunk = self.speech_buffer[:len(self.speech_buffer) - len(sentences[-1])]
+            if len(chunk.strip()) < MIN_SPEECH_CHUNK_LENGTH:
+                return
+            self.speech_buffer = sentences[-1]
+        if chunk.strip():
+            # Clips are synthesized concurrently, their chunks wait in their own queue until the clip is sent
+            chunks = asyncio.Queue()
+            self.speech_queue.put_nowait((asyncio.create_task(self.synthesize(chunk.strip(), chunks)), chunks))
+
+    async def synthesize(self, text: str, chunks: asyncio.Queue):
+        try:
+            async for chunk in AIBaseClass.stream_audio_async(text, self.language, user=self.user):
+                chunks.put_nowait(chunk)
+        except Exception as e:
+            print(f"Failed to generate audio: {e}")
+        finally:
+            chunks.put_nowait(None)
+
+    async def send_speech_in_order(self):
+        clip = 0
+        while (speech := await self.speech_queue.get()) is not None:
+            task, chunks = speech
+            if self.send_audio_chunk:
+                clip += await self.send_clip_chunks(clip, chunks)
+            else:
+                audio = b"".join([chunk async for chunk in self.iter_chunks(chunks)])
+                if audio:
+                    await self.send_audio(audio)
+            await task
+
+    async def send_clip_chunks(self, clip: int, chunks: asyncio.Queue) -> int:
+        # Every chunk is held until the next one arrives so the last one can be flagged
+        index, previous = 0, None
+        async for chunk in self.iter_chunks(chunks):
+            if previous is not None:
+                await self.send_audio_chunk(clip, index, previous, False)
+                index += 1
+            previous = chunk
+        if previous is None:
+            return 0
+        await self.send_audio_chunk(clip, index, previous, True)
+        return 1
+
+    @staticmethod
+    async def iter_chunks(chunks: asyncio.Queue):
+        while (chunk := await chunks.get()) is not None:
+            yield chunk
@@ -0,0 +1,184 @@
+import json
+import re
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from django.test import override_settings
+
+from .clients import OpenAIResourceCache
+
+
+class FakeOpenAIServer:
+    """
+    Minimal local stand in for the OpenAI HTTP API, it records every request and answers the
+    assistant, thread, run and speech endpoints used by AIService. Each streamed run replays the next
+    list of (event, data) pairs of run_streams.
+    """
+
+    def __init__(self):
+        self.requests = []
+        self.bodies = []
+        self.threads = {}
+        self.run_streams = []
+        self.failed_file_ids = set()
+        self.batches = {}
+        self.batch_polls = 0
+        self.max_batches_in_progress = 0
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                self.respond(server.handle('GET', self.path, None))
+
+            def do_DELETE(self):
+                self.respond(server.handle('DELETE', self.path, None))
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                if not self.headers.get('Content-Type', '').startswith('multipart/'):
+                    body = json.loads(body or b'{}')
+                self.respond(server.handle('POST', self.path, body))
+
+            def respond(self, payload):
+                content_type = 'application/json'
+                if isinstance(payload, bytes):
+                    data, content_type = payload, 'audio/mpeg'
+                elif isinstance(payload, list):
+                    data = ''.join(f'event: {event}\ndata: {json.dumps(event_data)}\n\n'
+                                   for event, event_data in payload).encode()
+                    data += b'event: done\ndata: [DONE]\n\n'
+                    content_type = 'text/event-stream'
+                else:
+                    data = json.dumps(payload).encode()
+                self.send_response(200 if payload is not None else 404)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.base_url = f'http://127.0.0.1:{self.httpd.server_address[1]}/v1'
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def start_for(cls, test_case) -> 'FakeOpenAIServer':
+        """
+        Start a server, point the OpenAI clients of the test to it and start with empty resource and speech caches.
+        """
+        server = cls()
+        audio_cache_directory = tempfile.TemporaryDirectory()
+        test_case.addCleanup(audio_cache_directory.cleanup)
+        settings_override = override_settings(OPEN_AI_BASE_URL=server.base_url, OPEN_AI_API_KEY='test',
+                                              AI_AUDIO_CACHE_DIR=audio_cache_directory.name)
+        settings_override.enable()
+        test_case.addCleanup(settings_override.disable)
+        test_case.addCleanup(server.stop)
+        OpenAIResourceCache.clear()
+        test_case.addCleanup(OpenAIResourceCache.clear)
+        return server
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def calls(self, method: str, path: str) -> int:
+        return self.requests.count((method, path))
+
+    def create_batch(self, vector_store_id: str, file_ids: [str]) -> dict:
+        batch_id = f'batch_{len(self.batches) + 1}'
+        self.batches[batch_id] = {'vector_store_id': vector_store_id, 'file_ids': file_ids,
+                                  'polls_left': self.batch_polls}
+        in_progress = sum(1 for batch in self.batches.values() if batch['polls_left'])
+        self.max_batches_in_progress = max(self.max_batches_in_progress, in_progress)
+        return self.poll_batch(batch_id, polled=False)
+
+    def poll_batch(self, batch_id: str, polled: bool = True) -> dict:
+        batch = self.batches[batch_id]
+        if polled and batch['polls_left']:
+            batch['polls_left'] -= 1
+        total = len(batch['file_ids'])
+        failed = 0 if batch['polls_left'] else len(set(batch['file_ids']) & self.failed_file_ids)
+        return {'id': batch_id, 'object': 'vector_store.files_batch', 'vector_store_id': batch['vector_store_id'],
+                'status': 'in_progress' if batch['polls_left'] else 'completed', 'created_at': 0,
+                'file_counts': {'completed': 0 if batch['polls_left'] else total - failed, 'failed': failed,
+                                'in_progress': total if batch['polls_left'] else 0, 'cancelled': 0,
+                                'total': total}}
+
+    def handle(self, method: str, path: str, body):
+        path, _, query = path.partition('?')
+        path = path.removeprefix('/v1')
+        self.requests.append((method, path))
+        self.bodies.append(body)
+        if path == '/files' and method == 'POST':
+            return {'id': f'file_{len(self.requests)}', 'object': 'file', 'bytes': len(body), 'created_at': 0,
+                    'filename': 'upload', 'purpose': 'assistants', 'status': 'processed'}
+        if path == '/audio/speech':
+            return f"audio:{body['input']}".encode()
+        if path == '/audio/translations':
+            return {'text': 'What is new?', 'duration': 3}
+        if path == '/chat/completions':
+            return {'id': 'chatcmpl_1', 'object': 'chat.completion', 'created': 0, 'model': body['model'],
+                    'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {
+                        'role': 'assistant', 'content': f"translated:{body['messages'][-1]['content']}"}}]}
+        if re.fullmatch(r'/threads/\w+/messages', path):
+            return {'id': 'msg_1', 'object': 'thread.message', 'created_at': 0, 'role': 'user', 'content': []}
+        if re.fullmatch(r'/threads/\w+/runs(/\w+/submit_tool_outputs)?', path):
+            return self.run_streams.pop(0)
+        if match := re.fullmatch(r'/vector_stores/\w+/file_batches/(\w+)', path):
+            return self.poll_batch(match.group(1))
+        if match := re.fullmatch(r'/vector_stores/(\w+)/file_batches', path):
+            return self.create_batch(match.group(1), body['file_ids'])
+        if match := re.fullmatch(r'/vector_stores/(\w+)/file_batches/(\w+)/files', path):
+            # The client asks for the next page after the last file until it gets an empty one
+            batch_file_ids = [] if 'after=' in query else self.batches[match.group(2)]['file_ids']
+            return {'object': 'list', 'has_more': False, 'data': [
+                {'id': file_id, 'object': 'vector_store.file', 'vector_store_id': match.group(1), 'status': 'failed',
+                 'created_at': 0, 'usage_bytes': 0, 'last_error': {'code': 'parsing_error', 'message': 'Unreadable'}}
+                for file_id in batch_file_ids if file_id in self.failed_file_ids]}
+        if match := re.fullmatch(r'/vector_stores/(\w+)/files/(\w+)', path):
+            return {'id': match.group(2), 'object': 'vector_store.file.deleted', 'deleted': True}
+        if path == '/vector_stores' and method == 'POST':
+            path = f'/vector_stores/vs_new_{len(self.requests)}'
+        if match := re.fullmatch(r'/vector_stores/(\w+)', path):
+            return {'id': match.group(1), 'object': 'vector_store', 'created_at': 0, 'name': '', 'status': 'completed',
+                    'usage_bytes': 0, 'file_counts': {'completed': 0, 'failed': 0, 'in_progress': 0,
+                                                      'cancelled': 0, 'total': 0}}
+        if path == '/assistants' and method == 'POST':
+            path = f'/assistants/asst_new_{len(self.requests)}'
+        if match := re.fullmatch(r'/assistants/(\w+)', path):
+            return {'id': match.group(1), 'object': 'assistant', 'created_at': 0, 'model': 'gpt-4o', 'tools': []}
+        if path == '/threads' and method == 'POST':
+            thread_id = f'thread_{len(self.threads) + 1}'
+            return self.threads.setdefault(thread_id, self.build_thread(thread_id, body))
+        if match := re.fullmatch(r'/threads/(\w+)', path):
+            thread_id = match.group(1)
+            if method == 'POST':
+                self.threads[thread_id] = self.build_thread(thread_id, body)
+            return self.threads.setdefault(thread_id, self.build_thread(thread_id, {}))
+        return None
+
+    @staticmethod
+    def build_thread(thread_id: str, body: dict) -> dict:
+        return {'id': thread_id, 'object': 'thread', 'created_at': 0, 'metadata': body.get('metadata') or {},
+                'tool_resources': body.get('tool_resources') or {}}
+
+    @staticmethod
+    def run_event(status: str, required_action: dict = None) -> tuple:
+        return f'thread.run.{status}', {'id': 'run_1', 'object': 'thread.run', 'thread_id': 'thread_1',
+                                        'assistant_id': 'asst_1', 'status': status, 'created_at': 0,
+                                        'required_action': required_action}
+
+    @staticmethod
+    def text_delta_event(text: str) -> tuple:
+        return 'thread.message.delta', {'id': 'msg_2', 'object': 'thread.message.delta',
+                                        'delta': {'content': [{'index': 0, 'type': 'text', 'text': {'value': text}}]}}
+
+    @staticmethod
+    def tool_calls_action(*function_names: str) -> dict:
+        return {'type': 'submit_tool_outputs', 'submit_tool_outputs': {'tool_calls': [
+            {'id': f'call_{index}', 'type': 'function', 'function': {'name': name, 'arguments': '{}'}}
+            for index, name in enumerate(function_names)]}}
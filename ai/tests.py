@@ -1,3 +1,792 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from common.models import Document
+from communication.models import Notification
+from honeycomb.models import Hive, Bee, Contract, Nectar
+from honeycomb.tasks import schedule_vector_store_sync, sync_vector_store
+from .audio_cache import AudioCache
+from .clients import create_async_openai_client, get_openai_client
+from .context import AIContextBuilder, estimate_tokens
+from .helpers import AIBaseClass
+from .models import AssistantInfo, Thread, Message, PendingVectorStoreSync, VectorStoreFile
+from .services import AIService
+from .streaming import AssistantStreamPipeline
+from .testing import FakeOpenAIServer
+from .throttling import AssistantRunQueue, RunQueueBusy, TokenBucket, get_redis_client
+from .tool_executor import ToolCallExecutor, ToolCallStats
+from .uploader import VectorStoreUploader
+from .voice import unpack_audio_frame
+
+User = get_user_model()
+
+
+class OpenAIResourceCacheTests(TestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer.start_for(self)
+
+        self.user = User.objects.create_user(email='ai@example.com', password='pass')
+        self.assistant_info = AssistantInfo.objects.create(backend_assistant_id='asst_1', base_vector_store_id='vs_1')
+        Thread.objects.create(user=self.user, thread_id='thread_1')
+
+    def test_ai_service_reuses_client_and_remote_objects(self):
+        """
+        Test Scenario: AIService is constructed for every message of a user, the thread gets the same
+        vector stores attached each time and the backend assistant is changed in AssistantInfo afterwards.
+
+        This test ensures that the OpenAI client is shared, that assistants and threads are retrieved once,
+        that unchanged thread resources are not updated again, that resources changed by another process are
+        updated back and that AssistantInfo changes are picked up.
+        """
+        for _ in range(3):
+            service = AIService(self.user, 'backend_assistant')
+            service.ai.update_thread_vector_stores(service.thread_id, ['vs_1'])
+            self.assertEqual(service.ai.assistant.id, 'asst_1')
+
+        self.assertIs(service.ai.client, get_openai_client())
+        self.assertEqual(self.server.calls('GET', '/assistants/asst_1'), 1)
+        self.assertEqual(self.server.calls('GET', '/threads/thread_1'), 1)
+        self.assertEqual(self.server.calls('POST', '/threads/thread_1'), 1)
+
+        service.ai.update_thread_vector_stores(service.thread_id, ['vs_1', 'vs_2'])
+        self.assertEqual(self.server.calls('POST', '/threads/thread_1'), 2)
+
+        # Another process attached other vector stores, the thread cached here does not know about it
+        Thread.objects.filter(thread_id='thread_1').update(vector_store_ids=['vs_3'])
+        service.ai.update_thread_vector_stores(service.thread_id, ['vs_1', 'vs_2'])
+        self.assertEqual(self.server.calls('POST', '/threads/thread_1'), 3)
+
+        self.assistant_info.backend_assistant_id = 'asst_2'
+        self.assistant_info.save()
+        self.assertEqual(AIService(self.user, 'backend_assistant').ai.assistant.id, 'asst_2')
+        self.assertEqual(self.server.calls('GET', '/assistants/asst_2'), 1)
+
+
+class AssistantStreamPipelineTests(TransactionTestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer.start_for(self)
+
+        self.user = User.objects.create_user(email='stream@example.com', password='pass')
+        AssistantInfo.objects.create(general_assistant_id='asst_1', backend_assistant_id='asst_2')
+        Thread.objects.create(user=self.user, thread_id='thread_1')
+        Notification.objects.create(user=self.user, message='Your nectar was accepted')
+
+    def test_answer_is_streamed_with_tool_calls_and_speech(self):
+        """
+        Test Scenario: The assistant first asks for two tool calls and then streams an answer of several sentences.
+
+        This test ensures that the tool outputs are submitted together, that every text delta reaches the socket,
+        that speech is generated per sentence in order and that the complete answer is stored.
+        """
+        answer = ['You have one unread notification. ', 'Your nectar was accepted by the hive. ', 'Good luck!']
+        self.server.run_streams = [
+            [self.server.run_event('created'),
+             self.server.run_event('requires_action',
+                                   self.server.tool_calls_action('get_notifications', 'get_conversations'))],
+            [self.server.run_event('in_progress'), *[self.server.text_delta_event(part) for part in answer],
+             self.server.run_event('completed')],
+        ]
+        events, audio = [], []
+
+        async def send_event(data):
+            events.append(data)
+
+        async def send_audio(data):
+            audio.append(data)
+
+        pipeline = AssistantStreamPipeline(self.user, send_event, send_audio)
+        response = async_to_sync(pipeline.send_message)('What is new?')
+
+        self.assertEqual(response, ''.join(answer))
+        self.assertEqual([event['message']['text'] for event in events if event['type'] == 'assistant_delta'], answer)
+        self.assertEqual([event['message']['status'] for event in events if event['type'] == 'assistant_status'],
+                         ['created', 'requires_action', 'in_progress', 'completed'])
+        tool_outputs = self.server.bodies[self.server.requests.index(
+            ('POST', '/threads/thread_1/runs/run_1/submit_tool_outputs'))]['tool_outputs']
+        self.assertEqual([output['tool_call_id'] for output in tool_outputs], ['call_0', 'call_1'])
+        self.assertIn('Your nectar was accepted', tool_outputs[0]['output'])
+        self.assertEqual(audio, [b'audio:You have one unread notification. Your nectar was accepted by the hive.',
+                                 b'audio:Good luck!'])
+        self.assertEqual(Message.objects.get(user=self.user).response, ''.join(answer))
+
+
+@override_settings(AI_TOOL_CALL_TIMEOUT=1, AI_TOOL_CALL_TIMEOUTS={'slow': 0.2})
+class ToolCallExecutorTests(SimpleTestCase):
+
+    def setUp(self):
+        ToolCallStats.reset()
+        # The read calls only get past the barrier together, the barrier breaks if they run one after the other
+        self.barrier = threading.Barrier(2, timeout=0.9)
+
+    def invoke(self, tool_call):
+        arguments = json.loads(tool_call.function.arguments)
+        if tool_call.function.name == 'read':
+            self.barrier.wait()
+        time.sleep(arguments.get('sleep', 0))
+        if tool_call.function.name == 'broken':
+            raise ValueError('broken')
+        return arguments.get('output', 'done')
+
+    @staticmethod
+    def tool_call(index: int, name: str, **arguments):
+        return SimpleNamespace(id=f'call_{index}', function=SimpleNamespace(name=name, arguments=json.dumps(arguments)))
+
+    def test_tool_calls_run_concurrently_with_timeouts(self):
+        """
+        Test Scenario: A run step asks for several slow tool calls, one of them fails, one returns a non string
+        output and one exceeds its own timeout, once on the sync and once on the async path.
+
+        This test ensures that the calls overlap, that every call gets an output in the order of the calls
+        and that the latency of every function is recorded.
+        """
+        tool_calls = [self.tool_call(0, 'read', sleep=0.3, output='first'),
+                      self.tool_call(1, 'read', sleep=0.3, output='second'),
+                      self.tool_call(2, 'broken'),
+                      self.tool_call(3, 'invalid', output=3),
+                      self.tool_call(4, 'slow', sleep=0.6)]
+        expected = [{'tool_call_id': 'call_0', 'output': 'first'},
+                    {'tool_call_id': 'call_1', 'output': 'second'},
+                    {'tool_call_id': 'call_2', 'output': 'Error processing function'},
+                    {'tool_call_id': 'call_3', 'output': 'Error processing function'},
+                    {'tool_call_id': 'call_4', 'output': 'Error processing function'}]
+        executor = ToolCallExecutor(self.invoke)
+
+        for execute in (executor.execute, async_to_sync(executor.execute_async)):
+            self.assertEqual(execute(tool_calls), expected)
+            self.assertFalse(self.barrier.broken)
+
+        stats = ToolCallStats.get()
+        self.assertEqual(stats['read']['calls'], 4)
+        self.assertGreaterEqual(stats['read']['max_seconds'], 0.3)
+        self.assertEqual(stats['broken']['errors'], 2)
+        self.assertEqual(stats['invalid']['errors'], 2)
+        self.assertEqual(stats['slow']['timeouts'], 2)
+
+
+class AIContextBuilderTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='context@example.com', password='pass', first_name='Ada',
+                                             last_name='Bee')
+        self.document = Document.objects.create(user=self.user, description='Hive rules',
+                                                document=SimpleUploadedFile('rules.txt', b'rules'))
+        self.hives = [Hive.objects.create(name=f'Hive {i}', description='Builds   things\n together',
+                                          hive_type='queen', hive_requirements='None') for i in range(3)]
+        self.hives[0].documents.add(self.document)
+        self.hives[0].tags.add('python')
+        self.bee = Bee.objects.create(user=self.user, bee_bio='Writes code')
+        nectar = Nectar.objects.create(nectar_title='Build an API', nectar_description='REST', nectar_hive=self.hives[0])
+        self.contract = Contract.objects.create(nectar=nectar, bee=self.bee)
+
+    def test_context_is_batched_cached_and_invalidated(self):
+        """
+        Test Scenario: The hives are rendered twice, then a hive, a shared document and a user are changed
+        and the hives and contracts are rendered again.
+
+        This test ensures that rendering loads all rows in a fixed number of queries, that cached lines only
+        cost the id query and that every change reaches the texts that contain it.
+        """
+        with self.assertNumQueries(4):
+            first = AIContextBuilder().render(Hive.objects.order_by('id'))
+        self.assertEqual(first.splitlines()[0], f"Hive {self.hives[0].id}: Hive 0 | hive type: queen | "
+                                                f"description: Builds things together | requirements: None | "
+                                                f"tags: python | documents: file : Hive rules")
+        with self.assertNumQueries(1):
+            self.assertEqual(AIContextBuilder().render(Hive.objects.order_by('id')), first)
+
+        self.hives[1].description = 'Changed'
+        self.hives[1].save()
+        self.document.description = 'New rules'
+        self.document.save(update_fields=['description'])
+        rendered = AIContextBuilder().render(Hive.objects.order_by('id')).splitlines()
+        self.assertIn('description: Changed', rendered[1])
+        self.assertIn('documents: file : New rules', rendered[0])
+        self.assertEqual(rendered[2], first.splitlines()[2])
+
+        self.assertIn('name: Ada Bee', self.contract.convert_to_ai_readable())
+        self.user.first_name = 'Grace'
+        self.user.save()
+        self.assertIn('name: Grace Bee', self.contract.convert_to_ai_readable())
+
+    def test_token_budget_is_shared_between_sections(self):
+        """
+        Test Scenario: The hives and bees are rendered with a budget that only fits two hives.
+
+        This test ensures that rendering stops at the budget and tells how many objects were left out.
+        """
+        lines = AIContextBuilder().render(Hive.objects.order_by('id')).splitlines()
+        context = AIContextBuilder(token_budget=estimate_tokens(lines[0]) + estimate_tokens(lines[1]))
+        hives = context.render(Hive.objects.order_by('id')).splitlines()
+        self.assertEqual(len(hives), 3)
+        self.assertEqual(hives[-1], '... 1 more hives omitted')
+        self.assertEqual(context.render(Bee.objects.all()), '... 1 more bees omitted')
+
+
+class VectorStoreSyncTests(TestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer.start_for(self)
+        self.user = User.objects.create_user(email='files@example.com', password='pass')
+        self.hive = Hive.objects.create(name='Hive', description='Hive', hive_type='queen', vector_store_id='vs_1')
+        self.documents = [self.create_document(i) for i in range(3)]
+        self.hive.documents.add(*self.documents[:2])
+
+    def create_document(self, index: int) -> Document:
+        return Document.objects.create(user=self.user, file_id=f'file_{index}',
+                                       document=SimpleUploadedFile(f'doc{index}.txt', f'content {index}'.encode()))
+
+    def sync(self):
+        self.server.requests.clear()
+        self.server.bodies.clear()
+        with mock.patch.object(sync_vector_store, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                for _ in range(3):
+                    schedule_vector_store_sync('vs_1')
+        self.assertEqual(apply_async.call_count, 1)
+        # The worker runs the job once the debounce is over
+        sync_vector_store(**apply_async.call_args.kwargs['kwargs'])
+
+    def manifest(self) -> dict:
+        return dict(VectorStoreFile.objects.filter(vector_store_id='vs_1').values_list('file_id', 'status'))
+
+    def test_vector_store_is_synced_by_difference(self):
+        """
+        Test Scenario: The documents of a hive are synced, synced again without changes, then one document is
+        replaced by another one that fails to be processed and the sync runs twice more.
+
+        This test ensures that bursts of changes share one job, that the vector store is never listed remotely,
+        that only new files are sent and removed ones deleted, and that failed files are retried.
+        """
+        self.sync()
+        self.assertEqual(self.server.requests, [('POST', '/vector_stores/vs_1/file_batches')])
+        self.assertEqual(self.server.bodies[0]['file_ids'], ['file_0', 'file_1'])
+        self.assertEqual(self.manifest(), {'file_0': 'completed', 'file_1': 'completed'})
+
+        self.sync()
+        self.assertEqual(self.server.requests, [])
+
+        self.hive.documents.remove(self.documents[0])
+        self.hive.documents.add(self.documents[2])
+        self.server.failed_file_ids = {'file_2'}
+        self.sync()
+        self.assertEqual(self.server.requests, [('POST', '/vector_stores/vs_1/file_batches'),
+                                                ('GET', '/vector_stores/vs_1/file_batches/batch_2/files'),
+                                                ('GET', '/vector_stores/vs_1/file_batches/batch_2/files'),
+                                                ('DELETE', '/vector_stores/vs_1/files/file_0')])
+        self.assertEqual(self.server.bodies[0]['file_ids'], ['file_2'])
+        self.assertEqual(self.manifest(), {'file_1': 'completed', 'file_2': 'failed'})
+
+        self.server.failed_file_ids = set()
+        self.sync()
+        self.assertEqual(self.server.bodies[0]['file_ids'], ['file_2'])
+        self.assertEqual(self.manifest(), {'file_1': 'completed', 'file_2': 'completed'})
+
+    def test_upload_abandoned_in_progress_is_retried(self):
+        """
+        Test Scenario: A worker crashed while uploading a file, the manifest keeps it in progress. The vector store
+        is synced while the upload could still be running and again once it timed out.
+
+        This test ensures that a recent in progress file is not sent twice and that an abandoned one is retried.
+        """
+        VectorStoreFile.objects.mark('vs_1', {'file_0': self.documents[0].hash, 'file_1': self.documents[1].hash},
+                                     VectorStoreFile.STATUS_IN_PROGRESS)
+        self.sync()
+        self.assertEqual(self.server.requests, [])
+
+        VectorStoreFile.objects.filter(file_id='file_1').update(
+            updated_at=timezone.now() - timedelta(seconds=settings.VECTOR_STORE_FILE_IN_PROGRESS_TIMEOUT + 1))
+        self.sync()
+        self.assertEqual(self.server.bodies[0]['file_ids'], ['file_1'])
+        self.assertEqual(self.manifest(), {'file_0': 'in_progress', 'file_1': 'completed'})
+
+    def test_rolled_back_changes_do_not_claim_the_sync(self):
+        """
+        Test Scenario: A document change schedules a sync inside a transaction that is rolled back, then another
+        change is committed. A claim is also left behind by a job that never ran.
+
+        This test ensures that the sync is only claimed after commit, so the committed change is synced right away,
+        and that a stale claim does not block later syncs.
+        """
+        with mock.patch.object(sync_vector_store, 'apply_async') as apply_async:
+            with self.captureOnCommitCallbacks(execute=True):
+                try:
+                    with transaction.atomic():
+                        schedule_vector_store_sync('vs_1')
+                        raise ValueError('rolled back')
+                except ValueError:
+                    pass
+            self.assertFalse(PendingVectorStoreSync.objects.exists())
+
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_vector_store_sync('vs_1')
+            self.assertEqual(apply_async.call_count, 1)
+
+            PendingVectorStoreSync.objects.update(claimed_at=timezone.now() - timedelta(hours=1))
+            with self.captureOnCommitCallbacks(execute=True):
+                schedule_vector_store_sync('vs_1')
+            self.assertEqual(apply_async.call_count, 2)
+
+
+class VectorStoreUploaderTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer.start_for(self)
+
+    def test_batches_are_bounded_and_polled_until_done(self):
+        """
+        Test Scenario: Five files, one of them unreadable, are uploaded in batches of two with at most two
+        batches in flight, every batch is still processing for the first two polls.
+
+        This test ensures that no more batches than allowed run at once, that unfinished batches are polled
+        again and that every file gets its outcome in the result and through on_progress.
+        """
+        self.server.batch_polls = 2
+        self.server.failed_file_ids = {'file_3'}
+        progress = []
+        uploader = VectorStoreUploader(concurrency=2, batch_size=2, poll_timeout=30,
+                                       on_progress=lambda file_result: progress.append(file_result.file_id))
+
+        result = async_to_sync(uploader.upload)('vs_1', [f'file_{i}' for i in range(5)])
+
+        self.assertEqual(self.server.calls('POST', '/vector_stores/vs_1/file_batches'), 3)
+        self.assertEqual(self.server.max_batches_in_progress, 2)
+        self.assertEqual(self.server.calls('GET', '/vector_stores/vs_1/file_batches/batch_1'), 2)
+        self.assertEqual(sorted(result.completed_file_ids), ['file_0', 'file_1', 'file_2', 'file_4'])
+        self.assertEqual(result.failed_file_ids, ['file_3'])
+        self.assertEqual(result.files['file_3'].error, 'Unreadable')
+        self.assertEqual(sorted(progress), [f'file_{i}' for i in range(5)])
+
+    def test_every_upload_closes_its_client(self):
+        """
+        Test Scenario: Files are uploaded twice from sync code in batches of one, each upload on a new event loop.
+
+        This test ensures that the batches of an upload share one client and that it is closed when the upload ends.
+        """
+        clients = []
+
+        def create_client():
+            clients.append(create_async_openai_client())
+            return clients[-1]
+
+        with mock.patch('ai.uploader.create_async_openai_client', side_effect=create_client):
+            for _ in range(2):
+                result = async_to_sync(VectorStoreUploader(batch_size=1).upload)('vs_1', ['file_0', 'file_1'])
+                self.assertEqual(sorted(result.completed_file_ids), ['file_0', 'file_1'])
+
+        self.assertEqual(len(clients), 2)
+        self.assertTrue(all(client.is_closed() for client in clients))
+
+    def test_batch_that_does_not_finish_in_time_fails(self):
+        """
+        Test Scenario: The only batch is still processing when the poll timeout is reached.
+
+        This test ensures that its files are reported as failed so the next sync retries them.
+        """
+        self.server.batch_polls = 100
+        result = async_to_sync(VectorStoreUploader(poll_timeout=0.01).upload)('vs_1', ['file_0'])
+        self.assertEqual(result.failed_file_ids, ['file_0'])
+        self.assertIn('Not processed', result.files['file_0'].error)
+
+
+class AssistantThrottlingTests(TestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer.start_for(self)
+        client = get_redis_client()
+        for key in client.scan_iter(f"{settings.AI_THROTTLE_KEY_PREFIX}:*"):
+            client.delete(key)
+
+        self.user = User.objects.create_user(email='throttle@example.com', password='pass')
+        AssistantInfo.objects.create(hive_assistant_id='asst_1', base_vector_store_id='vs_1')
+        Thread.objects.create(user=self.user, thread_id='thread_1')
+
+    def test_token_bucket_limits_bursts(self):
+        """
+        Test Scenario: A user sends more messages at once than the capacity of the bucket.
+
+        This test ensures that the burst is allowed up to the capacity, that the next message is rejected with
+        the time until a token is back and that other users have their own bucket.
+        """
+        bucket = TokenBucket("test", capacity=2, refill_rate=0.5)
+        self.assertTrue(bucket.take(self.user.id).allowed)
+        self.assertTrue(bucket.take(self.user.id).allowed)
+
+        rejected = bucket.take(self.user.id)
+        self.assertFalse(rejected.allowed)
+        self.assertGreater(rejected.retry_after, 1)
+        self.assertLessEqual(rejected.retry_after, 2)
+        self.assertTrue(bucket.take(self.user.id + 1).allowed)
+
+    def test_messages_sent_during_a_run_are_coalesced(self):
+        """
+        Test Scenario: Two messages reach the thread from other processes while the first message is being run.
+
+        This test ensures that only the first submitter runs, that the other two are told their place in the queue,
+        that they are answered together in one next run and that the thread is free again afterwards.
+        """
+        runner = AssistantRunQueue('thread_1')
+        runs = []
+
+        def run(message):
+            if not runs:
+                self.assertEqual(AssistantRunQueue('thread_1').submit('second'), (False, 1))
+                self.assertEqual(AssistantRunQueue('thread_1').submit('third'), (False, 2))
+            runs.append(message)
+            return len(runs)
+
+        self.assertEqual(runner.submit('first'), (True, 1))
+        self.assertEqual(runner.drain(run), [1, 2])
+        self.assertEqual(runs, ['first', 'second\n\nthird'])
+        self.assertTrue(AssistantRunQueue('thread_1').submit('fourth')[0])
+
+    def test_failed_run_releases_the_thread(self):
+        """
+        Test Scenario: The run of a message raises.
+
+        This test ensures that the error reaches the caller and that the next message can start a run.
+        """
+        runner = AssistantRunQueue('thread_1')
+        runner.submit('first')
+
+        def run(message):
+            raise RuntimeError('OpenAI is down')
+
+        with self.assertRaises(RuntimeError):
+            runner.drain(run)
+        self.assertTrue(AssistantRunQueue('thread_1').submit('second')[0])
+
+    def test_exclusive_run_waits_and_leaves_the_queue_to_a_runner(self):
+        """
+        Test Scenario: A caller that needs its own answer runs while a run is active, then a message is
+        submitted during its exclusive run.
+
+        This test ensures that the exclusive caller waits for the lock instead of joining the active run,
+        that the message submitted during it is flagged to wait for the lock and that it is run once the
+        exclusive run is over.
+        """
+        active = AssistantRunQueue('thread_1')
+        self.assertEqual(active.submit('active'), (True, 1))
+        self.assertEqual(active.drain(lambda message: message), ['active'])
+        self.assertTrue(active.try_acquire())
+        with self.assertRaises(RunQueueBusy):
+            AssistantRunQueue('thread_1').run_exclusive(lambda: 'answer', timeout=0.3)
+        active.release()
+
+        waiting = AssistantRunQueue('thread_1')
+
+        def run():
+            self.assertEqual(waiting.submit('during'), (False, 1))
+            return 'answer'
+
+        self.assertEqual(AssistantRunQueue('thread_1').run_exclusive(run, timeout=1), 'answer')
+        self.assertTrue(waiting.behind_exclusive_run)
+        self.assertTrue(waiting.acquire(timeout=1))
+        self.assertEqual(waiting.drain(lambda message: message), ['during'])
+        self.assertTrue(AssistantRunQueue('thread_1').submit('next')[0])
+
+    @override_settings(AI_RATE_LIMIT_CAPACITY=2, AI_RUN_WAIT_TIMEOUT=0.3)
+    def test_view_answers_its_own_message_and_throttles(self):
+        """
+        Test Scenario: The user posts to the hive assistant while a run is active on their thread, then again
+        once the thread is free and a third time right away.
+
+        This test ensures that a request is never joined to another run, that it is rejected with a 409 if the
+        active run does not end in time, that it gets the answer of its own message once the thread is free and
+        that the message over the limit is rejected with a 429 and Retry-After.
+        """
+        active = AssistantRunQueue('thread_1')
+        active.submit('active')
+        client = APIClient()
+        client.force_authenticate(self.user)
+        data = {'message': 'Hello', 'additional_instructions': ''}
+
+        with mock.patch.object(AIService, 'send_message', return_value='Hi there') as send_message:
+            response = client.post('/ai/test-hive-assistant_info/', data, format='json')
+            self.assertEqual(response.status_code, 409)
+            active.release(force=True)
+
+            response = client.post('/ai/test-hive-assistant_info/', data, format='json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data, {'messages': 'Hi there'})
+            self.assertEqual([call.kwargs['message'] for call in send_message.call_args_list], ['Hello'])
+
+            response = client.post('/ai/test-hive-assistant_info/', data, format='json')
+            self.assertEqual(response.status_code, 429)
+            self.assertIn('Retry-After', response)
+
+
+class SpeechCacheTests(SimpleTestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer.start_for(self)
+        self.directory = settings.AI_AUDIO_CACHE_DIR
+        cache.clear()
+
+    def test_repeated_replies_are_not_translated_or_synthesized_again(self):
+        """
+        Test Scenario: The same short reply is spoken twice in French, then in another voice
+        and finally translated for a text only client.
+
+        This test ensures that the second clip comes from the cache without any call, that another voice only
+        needs a new synthesis and that the translation is shared by speech and text.
+        """
+        first = async_to_sync(AIBaseClass.generate_audio_async)('Data has been shown successfully.', 'French')
+        second = async_to_sync(AIBaseClass.generate_audio_async)('Data has been shown successfully.', 'French')
+
+        self.assertEqual(first, b'audio:translated:Data has been shown successfully.')
+        self.assertEqual(second, first)
+        self.assertEqual(self.server.calls('POST', '/audio/speech'), 1)
+        self.assertEqual(self.server.calls('POST', '/chat/completions'), 1)
+
+        self.assertEqual(AIBaseClass.generate_audio('Data has been shown successfully.', 'French', voice='nova'),
+                         first)
+        self.assertEqual(AIBaseClass.translate_text('Data has been shown successfully.', 'French'),
+                         'translated:Data has been shown successfully.')
+        self.assertEqual(self.server.calls('POST', '/audio/speech'), 2)
+        self.assertEqual(self.server.calls('POST', '/chat/completions'), 1)
+
+    def test_least_recently_used_clips_are_evicted(self):
+        """
+        Test Scenario: A third clip is stored in a cache that only has room for two,
+        the older of the first two clips was read since.
+
+        This test ensures that the least recently used clip is removed and that long texts are not cached.
+        """
+        audio_cache = AudioCache(directory=self.directory, max_bytes=100, max_text_length=20)
+        audio_cache.set('first', 'English', 'alloy', 'tts-1', b'1' * 40)
+        audio_cache.set('second', 'English', 'alloy', 'tts-1', b'2' * 40)
+        os.utime(audio_cache.get_path('first', 'English', 'alloy', 'tts-1'), (1, 1))
+        os.utime(audio_cache.get_path('second', 'English', 'alloy', 'tts-1'), (2, 2))
+        self.assertEqual(audio_cache.get('first', 'English', 'alloy', 'tts-1'), b'1' * 40)
+
+        audio_cache.set('third', 'English', 'alloy', 'tts-1', b'3' * 40)
+        audio_cache.set('a reply that is too long to repeat', 'English', 'alloy', 'tts-1', b'4')
+
+        self.assertIsNone(audio_cache.get('second', 'English', 'alloy', 'tts-1'))
+        self.assertEqual(audio_cache.get('third', 'English', 'alloy', 'tts-1'), b'3' * 40)
+        self.assertEqual(audio_cache.get('first', 'English', 'alloy', 'tts-1'), b'1' * 40)
+        self.assertIsNone(audio_cache.get('a reply that is too long to repeat', 'English', 'alloy', 'tts-1'))
+        self.assertEqual(audio_cache.get_size(), 80)
+
+
+@override_settings(AI_VOICE_FRAME_SIZE=8, AI_VOICE_SPOOL_SIZE=16)
+class VoiceStreamingTests(TransactionTestCase):
+
+    def setUp(self):
+        from djangoProject.consumers import FrontEndConsumer
+        self.consumer = FrontEndConsumer
+        self.server = FakeOpenAIServer.start_for(self)
+        client = get_redis_client()
+        for key in client.scan_iter(f"{settings.AI_THROTTLE_KEY_PREFIX}:*"):
+            client.delete(key)
+
+        self.user = User.objects.create_user(email='voice@example.com', password='pass')
+        AssistantInfo.objects.create(general_assistant_id='asst_1')
+        Thread.objects.create(user=self.user, thread_id='thread_1')
+
+    def test_voice_message_is_streamed_both_ways(self):
+        """
+        Test Scenario: A client connected for audio frames streams a voice message in chunks
+        and the assistant answers with one sentence.
+
+        This test ensures that the chunks are transcribed as one recording, that the answer is spoken back in
+        numbered frames of the configured size with the last one flagged and that the text answer follows.
+        """
+        answer = 'There is nothing new today.'
+        self.server.run_streams = [[self.server.run_event('in_progress'), self.server.text_delta_event(answer),
+                                    self.server.run_event('completed')]]
+        recording = [b'ID3' + b'a' * 10, b'b' * 10, b'c' * 10]
+
+        async def talk():
+            communicator = WebsocketCommunicator(self.consumer.as_asgi(), '/ws/ai/?audio=frames')
+            communicator.scope['user'] = self.user
+            self.assertTrue((await communicator.connect())[0])
+            await communicator.send_to(text_data=json.dumps({'type': 'voice_start'}))
+            for chunk in recording:
+                await communicator.send_to(bytes_data=chunk)
+            await communicator.send_to(text_data=json.dumps({'type': 'voice_end'}))
+            outputs = []
+            while not outputs or outputs[-1].get('text') != answer:
+                outputs.append(await communicator.receive_output(timeout=5))
+            await communicator.disconnect()
+            return outputs
+
+        outputs = async_to_sync(talk)()
+
+        events = [json.loads(output['text']) for output in outputs[:-1] if 'text' in output]
+        self.assertEqual([json.loads(event['message'])['status'] for event in events if event['type'] == 'voice_status'],
+                         ['receiving', 'received'])
+        transcription = self.server.bodies[self.server.requests.index(('POST', '/audio/translations'))]
+        self.assertIn(b''.join(recording), transcription)
+
+        frames = [unpack_audio_frame(output['bytes']) for output in outputs if 'bytes' in output]
+        self.assertEqual(b''.join(chunk for _, _, chunk, _ in frames), f'audio:{answer}'.encode())
+        self.assertEqual([(clip, index) for clip, index, _, _ in frames], [(0, index) for index in range(len(frames))])
+        self.assertTrue(all(len(chunk) == 8 for _, _, chunk, _ in frames[:-1]))
+        self.assertEqual([last for _, _, _, last in frames], [False] * (len(frames) - 1) + [True])
+        self.assertEqual(Message.objects.get(user=self.user).content, 'What is new?')
+
+    @override_settings(AI_VOICE_MAX_BYTES=20)
+    def test_oversized_voice_stream_is_dropped_until_its_end(self):
+        """
+        Test Scenario: A client streams a voice message that goes over the size limit and keeps sending
+        chunks until voice_end.
+
+        This test ensures that the message is rejected once, that none of the remaining chunks is taken
+        for a voice message of its own and that nothing is transcribed or run.
+        """
+        async def talk():
+            communicator = WebsocketCommunicator(self.consumer.as_asgi(), '/ws/ai/')
+            communicator.scope['user'] = self.user
+            self.assertTrue((await communicator.connect())[0])
+            await communicator.send_to(text_data=json.dumps({'type': 'voice_start'}))
+            for chunk in [b'ID3' + b'a' * 10, b'b' * 10, b'c' * 10, b'd' * 10]:
+                await communicator.send_to(bytes_data=chunk)
+            await communicator.send_to(text_data=json.dumps({'type': 'voice_end'}))
+            outputs = [await communicator.receive_output(timeout=5) for _ in range(2)]
+            self.assertTrue(await communicator.receive_nothing(timeout=0.5))
+            await communicator.disconnect()
+            return outputs
+
+        outputs = async_to_sync(talk)()
+
+        statuses = [json.loads(json.loads(output['text'])['message'])['status'] for output in outputs]
+        self.assertEqual(statuses, ['receiving', 'rejected'])
+        self.assertEqual(self.server.calls('POST', '/audio/translations'), 0)
+        self.assertFalse(Message.objects.filter(user=self.user).exists())
+
+
+class AssistantSocketRunTests(TransactionTestCase):
+
+    def setUp(self):
+        from djangoProject.consumers import FrontEndConsumer
+        self.consumer = FrontEndConsumer
+        self.server = FakeOpenAIServer.start_for(self)
+        client = get_redis_client()
+        for key in client.scan_iter(f"{settings.AI_THROTTLE_KEY_PREFIX}:*"):
+            client.delete(key)
+
+        self.user = User.objects.create_user(email='sockets@example.com', password='pass')
+        AssistantInfo.objects.create(general_assistant_id='asst_1')
+        Thread.objects.create(user=self.user, thread_id='thread_1')
+        self.messages = []
+        self.first_run_started = asyncio.Event()
+        self.first_run_done = asyncio.Event()
+
+    def replace_assistant(self):
+        async def send_to_assistant(consumer, message, user_language, service=None):
+            return await self.send_to_assistant(message)
+        return mock.patch.object(self.consumer, 'send_to_assistant', send_to_assistant)
+
+    async def send_to_assistant(self, message: str) -> str:
+        self.messages.append(message)
+        if len(self.messages) == 1:
+            self.first_run_started.set()
+            try:
+                await self.first_run_done.wait()
+            except asyncio.CancelledError:
+                self.messages.append('cancelled')
+                raise
+        if message == 'broken':
+            raise RuntimeError('OpenAI is down')
+        return f'answer to {message}'
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(self.consumer.as_asgi(), '/ws/ai/')
+        communicator.scope['user'] = self.user
+        self.assertTrue((await communicator.connect())[0])
+        return communicator
+
+    async def receive_texts(self, communicator, count: int) -> [str]:
+        return [(await communicator.receive_output(timeout=5))['text'] for _ in range(count)]
+
+    def test_coalesced_message_is_answered_on_its_own_socket(self):
+        """
+        Test Scenario: The user is connected on two sockets, the second one sends a message while the run of
+        the first one is active.
+
+        This test ensures that the second message is queued and answered by the run of the first socket, and that
+        both answers reach both sockets.
+        """
+        async def talk():
+            runner, other = await self.connect(), await self.connect()
+            await runner.send_to(text_data='first')
+            await self.first_run_started.wait()
+            await other.send_to(text_data='second')
+            queued = json.loads((await other.receive_output(timeout=5))['text'])
+            self.first_run_done.set()
+            outputs = [await self.receive_texts(communicator, 2) for communicator in (runner, other)]
+            for communicator in (runner, other):
+                await communicator.disconnect()
+            return queued, outputs
+
+        with self.replace_assistant():
+            queued, outputs = async_to_sync(talk)()
+
+        self.assertEqual(json.loads(queued['message']), {'status': 'queued', 'pending': 1})
+        self.assertEqual(self.messages, ['first', 'second'])
+        self.assertEqual(outputs, [['answer to first', 'answer to second']] * 2)
+
+    def test_closed_socket_stops_its_run_and_frees_the_thread(self):
+        """
+        Test Scenario: The socket that runs the queue of the thread is closed during its run.
+
+        This test ensures that the run is cancelled and that the run lock is released for the next message.
+        """
+        async def talk():
+            runner = await self.connect()
+            await runner.send_to(text_data='first')
+            await self.first_run_started.wait()
+            await runner.disconnect()
+            return self.messages[:], await sync_to_async(AssistantRunQueue('thread_1').submit)('next')
+
+        with self.replace_assistant():
+            messages, submitted = async_to_sync(talk)()
+
+        self.assertEqual(messages, ['first', 'cancelled'])
+        self.assertEqual(submitted, (True, 1))
+
+    def test_failed_run_is_reported_to_the_sockets(self):
+        """
+        Test Scenario: The run of a message raises.
+
+        This test ensures that the error is logged and that every socket of the user receives a failed status.
+        """
+        self.first_run_done.set()
+
+        async def talk():
+            runner, other = await self.connect(), await self.connect()
+            await runner.send_to(text_data='broken')
+            outputs = [await communicator.receive_output(timeout=5) for communicator in (runner, other)]
+            for communicator in (runner, other):
+                await communicator.disconnect()
+            return outputs
+
+        with self.replace_assistant(), \
+                self.assertLogs('djangoProject.consumers', 'ERROR') as logs:
+            outputs = async_to_sync(talk)()
+
+        self.assertIn('OpenAI is down', logs.output[0])
+        for output in outputs:
+            event = json.loads(output['text'])
+            self.assertEqual((event['type'], json.loads(event['message'])), ('assistant_status', {'status': 'failed'}))
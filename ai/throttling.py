@@ -0,0 +1,252 @@
+import asyncio
+import json
+import time
+import uuid
+from typing import Awaitable, Callable, List, Optional, Tuple
+
+import redis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+_redis_client = None
+
+# Refill the bucket for the time passed since the last take, then take cost tokens if there are enough.
+# The redis clock is used so every process sees the same time.
+TAKE_TOKENS_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local time = redis.call('TIME')
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(bucket[1]) or capacity
+local updated_at = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate)
+local allowed = 0
+local retry_after = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    retry_after = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+return {allowed, tostring(retry_after)}
+"""
+
+# Queue the message and take the run lock if no run is active, returns 1 for the caller that has to run.
+# The last value tells if the active run is an exclusive one, it does not take the queued messages.
+SUBMIT_SCRIPT = """
+redis.call('RPUSH', KEYS[1], ARGV[1])
+if redis.call('SET', KEYS[2], ARGV[2], 'NX', 'EX', ARGV[3]) then
+    return {1, redis.call('LLEN', KEYS[1]), 0}
+end
+local holder = redis.call('GET', KEYS[2]) or ''
+return {0, redis.call('LLEN', KEYS[1]), string.sub(holder, 1, string.len(ARGV[4])) == ARGV[4] and 1 or 0}
+"""
+
+# Pop all queued messages while the lock is still held by the runner and extend it for the next run
+TAKE_MESSAGES_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return false
+end
+redis.call('EXPIRE', KEYS[2], ARGV[2])
+local messages = redis.call('LRANGE', KEYS[1], 0, -1)
+redis.call('DEL', KEYS[1])
+return messages
+"""
+
+# Give up the run lock unless messages arrived during the run, those are taken by the next run of the same runner.
+# force drops the lock in any case, the queued messages then wait for the next submit.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[2]) ~= ARGV[1] then
+    return 1
+end
+if ARGV[2] == '0' and redis.call('LLEN', KEYS[1]) > 0 then
+    return 0
+end
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+
+def get_redis_client() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.AI_THROTTLE_REDIS_URL)
+    return _redis_client
+
+
+class RateLimitResult:
+    def __init__(self, allowed: bool, retry_after: float):
+        self.allowed = allowed
+        self.retry_after = retry_after
+
+    def as_event(self) -> dict:
+        return {"type": "assistant_status", "message": {"status": "rate_limited",
+                                                        "retry_after": round(self.retry_after, 1)}}
+
+
+class TokenBucket:
+    """
+    Token bucket kept in a redis hash per key so the limit is shared by every worker and consumer.
+    The bucket holds at most capacity tokens and gets refill_rate tokens per second back.
+    """
+
+    def __init__(self, name: str, capacity: float = None, refill_rate: float = None):
+        self.name = name
+        self.capacity = capacity or settings.AI_RATE_LIMIT_CAPACITY
+        self.refill_rate = refill_rate or settings.AI_RATE_LIMIT_REFILL_RATE
+        self.client = get_redis_client()
+        self.script = self.client.register_script(TAKE_TOKENS_SCRIPT)
+
+    def get_key(self, key) -> str:
+        return f"{settings.AI_THROTTLE_KEY_PREFIX}:bucket:{self.name}:{key}"
+
+    def take(self, key, cost: float = 1) -> RateLimitResult:
+        allowed, retry_after = self.script(keys=[self.get_key(key)],
+                                           args=[self.capacity, self.refill_rate, cost])
+        return RateLimitResult(bool(allowed), float(retry_after))
+
+    def reset(self, key) -> None:
+        self.client.delete(self.get_key(key))
+
+
+def get_assistant_rate_limiter() -> TokenBucket:
+    return TokenBucket("assistant_messages")
+
+
+class RunQueueBusy(Exception):
+    pass
+
+
+class AssistantRunQueue:
+    """
+    Serializes the runs on one OpenAI thread across processes. Every message is pushed to a redis list, the
+    submitter that gets the run lock becomes the runner and keeps running until the list is empty. Messages that
+    arrive while a run is active are joined into the next run instead of starting a run of their own.
+    Callers that need the answer of their own message use run_exclusive instead, it waits for the lock and runs
+    only that message. Messages submitted during an exclusive run are left to a runner that waits for the lock.
+    The lock expires after AI_RUN_LOCK_TIMEOUT seconds so a crashed runner does not block the thread for good.
+    """
+    SEPARATOR = "\n\n"
+    EXCLUSIVE_PREFIX = "exclusive:"
+    POLL_INTERVAL = 0.2
+
+    def __init__(self, thread_id: str, lock_timeout: int = None):
+        self.thread_id = thread_id
+        self.lock_timeout = lock_timeout or settings.AI_RUN_LOCK_TIMEOUT
+        self.token = uuid.uuid4().hex
+        # Set by submit when the active run is exclusive, the submitter has to wait for the lock and run the queue
+        self.behind_exclusive_run = False
+        self.client = get_redis_client()
+        prefix = f"{settings.AI_THROTTLE_KEY_PREFIX}:run:{thread_id}"
+        self.keys = [f"{prefix}:messages", f"{prefix}:lock"]
+        self.submit_script = self.client.register_script(SUBMIT_SCRIPT)
+        self.take_script = self.client.register_script(TAKE_MESSAGES_SCRIPT)
+        self.release_script = self.client.register_script(RELEASE_SCRIPT)
+
+    def submit(self, message: str) -> Tuple[bool, int]:
+        """
+        Queue the message, returns whether the caller has to run the queue and the number of queued messages.
+        """
+        is_runner, pending, behind_exclusive_run = self.submit_script(
+            keys=self.keys, args=[json.dumps(message), self.token, self.lock_timeout, self.EXCLUSIVE_PREFIX])
+        self.behind_exclusive_run = bool(behind_exclusive_run)
+        return bool(is_runner), pending
+
+    def try_acquire(self) -> bool:
+        return bool(self.client.set(self.keys[1], self.token, nx=True, ex=self.lock_timeout))
+
+    def acquire(self, timeout: float) -> bool:
+        """
+        Wait up to timeout seconds for the run lock, False if it is still held by another run.
+        """
+        deadline = time.monotonic() + timeout
+        while not self.try_acquire():
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(self.POLL_INTERVAL)
+        return True
+
+    async def acquire_async(self, timeout: float) -> bool:
+        deadline = time.monotonic() + timeout
+        while not await sync_to_async(self.try_acquire)():
+            if time.monotonic() >= deadline:
+                return False
+            await asyncio.sleep(self.POLL_INTERVAL)
+        return True
+
+    def run_exclusive(self, run: Callable[[], object], timeout: float):
+        """
+        Wait for the run lock and call run alone, the queued messages are not part of it.
+        Raises RunQueueBusy if the lock is not free within timeout seconds.
+        """
+        self.token = f"{self.EXCLUSIVE_PREFIX}{uuid.uuid4().hex}"
+        if not self.acquire(timeout):
+            raise RunQueueBusy(f"A run is still active on thread {self.thread_id}")
+        try:
+            return run()
+        finally:
+            self.release(force=True)
+
+    def take(self) -> Optional[List[str]]:
+        messages = self.take_script(keys=self.keys, args=[self.token, self.lock_timeout])
+        if messages is None:
+            # The lock expired and another runner took over
+            return None
+        return [json.loads(message) for message in messages]
+
+    def release(self, force: bool = False) -> bool:
+        return bool(self.release_script(keys=self.keys, args=[self.token, int(force)]))
+
+    def next_message(self) -> Optional[str]:
+        """
+        The queued messages joined into one, None once the queue is drained and the lock released.
+        """
+        while True:
+            messages = self.take()
+            if messages:
+                return self.SEPARATOR.join(messages)
+            if messages is None or self.release():
+                return None
+
+    def drain(self, run: Callable[[str], object]) -> list:
+        """
+        Run the queued messages until the queue is empty, only the runner returned by submit may call it.
+        """
+        results = []
+        try:
+            while (message := self.next_message()) is not None:
+                results.append(run(message))
+        except BaseException:
+            self.release(force=True)
+            raise
+        return results
+
+    async def drain_async(self, run: Callable[[str], Awaitable]) -> list:
+        results = []
+        try:
+            while (message := await sync_to_async(self.next_message)()) is not None:
+                results.append(await run(message))
+        except BaseException:
+            await sync_to_async(self.release)(force=True)
+            raise
+        return results
+
+
+class AssistantMessageThrottle(BaseThrottle):
+    """
+    DRF throttle sharing the token bucket of the assistant websocket, rejected requests get a 429 with Retry-After.
+    """
+
+    def allow_request(self, request, view) -> bool:
+        if not request.user.is_authenticated:
+            return True
+        self.result = get_assistant_rate_limiter().take(request.user.id)
+        return self.result.allowed
+
+    def wait(self) -> Optional[float]:
+        return self.result.retry_after
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Any, Callable
+
+from django.conf import settings
+from django.db import close_old_connections
+
+ERROR_OUTPUT = "Error processing function"
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tool_call_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=settings.AI_TOOL_CALL_WORKERS, thread_name_prefix='ai-tool')
+    return _pool
+
+
+def parse_tool_arguments(tool_call) -> dict:
+    # parse string to dict
+    try:
+        return json.loads(tool_call.function.arguments or "{}")
+    except json.JSONDecodeError as e:
+        print(f"Error parsing arguments: {e}")
+        return {}
+
+
+class ToolCallResult:
+    def __init__(self, tool_call, output: str, latency: float, status: str):
+        self.tool_call_id = tool_call.id
+        self.name = tool_call.function.name
+        self.output = output
+        self.latency = latency
+        self.status = status
+
+    def to_tool_output(self) -> dict:
+        return {"tool_call_id": self.tool_call_id, "output": self.output}
+
+
+class ToolCallStats:
+    """
+    Latency of the tool calls handled by this process, aggregated per function name.
+    """
+    _stats = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def record(cls, result: ToolCallResult) -> None:
+        with cls._lock:
+            stats = cls._stats.setdefault(result.name, {'calls': 0, 'errors': 0, 'timeouts': 0,
+                                                        'total_seconds': 0.0, 'max_seconds': 0.0})
+            stats['calls'] += 1
+            stats['errors'] += result.status == 'error'
+            stats['timeouts'] += result.status == 'timeout'
+            stats['total_seconds'] += result.latency
+            stats['max_seconds'] = max(stats['max_seconds'], result.latency)
+
+    @classmethod
+    def get(cls) -> dict:
+        with cls._lock:
+            return {name: dict(stats) for name, stats in cls._stats.items()}
+
+    @classmethod
+    def reset(cls) -> None:
+        with cls._lock:
+            cls._stats.clear()
+
+
+class ToolCallExecutor:
+    """
+    Runs the tool calls of a run step on a bounded thread pool and returns their outputs in the order of the calls,
+    ready to be submitted together. invoke receives a tool call and returns the output of the function, a call that
+    raises, returns something else than a string or exceeds its timeout gets the error output instead.
+    A call that timed out keeps running in its worker, only its output is dropped.
+    """
+
+    def __init__(self, invoke: Callable[[Any], Any]):
+        self.invoke = invoke
+
+    @staticmethod
+    def get_timeout(name: str) -> float:
+        return settings.AI_TOOL_CALL_TIMEOUTS.get(name, settings.AI_TOOL_CALL_TIMEOUT)
+
+    def run_one(self, tool_call, close_connections: bool = False) -> ToolCallResult:
+        start = time.perf_counter()
+        try:
+            output = self.invoke(tool_call)
+            status = 'ok' if isinstance(output, str) else 'error'
+        except Exception as e:
+            print(f"Error processing function {tool_call.function.name}: {e}")
+            output, status = ERROR_OUTPUT, 'error'
+        finally:
+            if close_connections:
+                close_old_connections()
+        return ToolCallResult(tool_call, output if status == 'ok' else ERROR_OUTPUT, time.perf_counter() - start,
+                              status)
+
+    def run_in_pool(self, tool_call) -> ToolCallResult:
+        close_old_connections()
+        return self.run_one(tool_call, close_connections=True)
+
+    def timed_out(self, tool_call, start: float) -> ToolCallResult:
+        print(f"Tool call {tool_call.function.name} timed out after {self.get_timeout(tool_call.function.name)}s")
+        return ToolCallResult(tool_call, ERROR_OUTPUT, time.perf_counter() - start, 'timeout')
+
+    def execute(self, tool_calls) -> [dict]:
+        tool_calls = list(tool_calls)
+        start = time.perf_counter()
+        if len(tool_calls) == 1:
+            # Nothing to overlap, a single call runs in the calling thread
+            results = [self.run_one(tool_calls[0])]
+        else:
+            futures = [get_tool_call_pool().submit(self.run_in_pool, tool_call) for tool_call in tool_calls]
+            results = []
+            for tool_call, future in zip(tool_calls, futures):
+                remaining = start + self.get_timeout(tool_call.function.name) - time.perf_counter()
+                try:
+                    results.append(future.result(timeout=max(remaining, 0)))
+                except FutureTimeoutError:
+                    results.append(self.timed_out(tool_call, start))
+        return self.finish(results, start)
+
+    async def execute_async(self, tool_calls) -> [dict]:
+        tool_calls = list(tool_calls)
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+
+        async def run(tool_call):
+            future = loop.run_in_executor(get_tool_call_pool(), self.run_in_pool, tool_call)
+            try:
+                return await asyncio.wait_for(future, self.get_timeout(tool_call.function.name))
+            except asyncio.TimeoutError:
+                return self.timed_out(tool_call, start)
+
+        results = await asyncio.gather(*[run(tool_call) for tool_call in tool_calls])
+        return self.finish(results, start)
+
+    @staticmethod
+    def finish(results: [ToolCallResult], start: float) -> [dict]:
+        for result in results:
+            ToolCallStats.record(result)
+        timings = ', '.join(f"{result.name} {result.latency * 1000:.0f}ms ({result.status})"
+                            for result in sorted(results, key=lambda result: result.latency, reverse=True))
+        print(f"Tool calls finished in {(time.perf_counter() - start) * 1000:.0f}ms: {timings}")
+        return [result.to_tool_output() for result in results]
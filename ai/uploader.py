@@ -0,0 +1,133 @@
+import asyncio
+import random
+import time
+from typing import Callable, Optional
+
+import openai
+from django.conf import settings
+from openai import AsyncOpenAI
+
+from .clients import create_async_openai_client
+
+POLL_INITIAL_DELAY = 0.5
+POLL_MAX_DELAY = 10
+# Vector store file batches accept at most 500 files
+MAX_BATCH_SIZE = 500
+
+
+def get_poll_delay(attempt: int) -> float:
+    # Exponential backoff with full jitter so concurrent batches do not poll in lockstep
+    return random.uniform(0, min(POLL_MAX_DELAY, POLL_INITIAL_DELAY * 2 ** attempt))
+
+
+class FileUploadResult:
+    def __init__(self, file_id: str, status: str, error: str = "", batch_id: str = ""):
+        self.file_id = file_id
+        self.status = status
+        self.error = error
+        self.batch_id = batch_id
+
+    @property
+    def is_completed(self) -> bool:
+        return self.status == 'completed'
+
+
+class UploadResult:
+    """
+    Outcome of adding files to a vector store, one FileUploadResult per file.
+    """
+
+    def __init__(self, vector_store_id: str):
+        self.vector_store_id = vector_store_id
+        self.files = {}
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+
+    def add(self, file_result: FileUploadResult) -> None:
+        self.files[file_result.file_id] = file_result
+
+    @property
+    def completed_file_ids(self) -> [str]:
+        return [file_id for file_id, result in self.files.items() if result.is_completed]
+
+    @property
+    def failed_file_ids(self) -> [str]:
+        return [file_id for file_id, result in self.files.items() if not result.is_completed]
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def __str__(self):
+        return (f"Added {len(self.completed_file_ids)} file(s) to vector store {self.vector_store_id}, "
+                f"{len(self.failed_file_ids)} failed in {self.seconds:.1f}s")
+
+
+class VectorStoreUploader:
+    """
+    Adds files to a vector store through the file batch API. The files are split in batches of batch_size, at most
+    concurrency batches are in flight at once and each one is polled with exponential backoff until it finishes or
+    poll_timeout seconds passed. on_progress is called with the FileUploadResult of every file as soon as its outcome
+    is known. The batches of an upload share one async client that is closed when the upload ends, sync callers run
+    every upload on a new event loop.
+    """
+
+    def __init__(self, concurrency: int = None, batch_size: int = None, poll_timeout: float = None,
+                 on_progress: Optional[Callable[[FileUploadResult], None]] = None):
+        self.concurrency = concurrency or settings.AI_UPLOAD_CONCURRENCY
+        self.batch_size = min(batch_size or settings.AI_UPLOAD_BATCH_SIZE, MAX_BATCH_SIZE)
+        self.poll_timeout = poll_timeout or settings.AI_UPLOAD_POLL_TIMEOUT
+        self.on_progress = on_progress
+
+    async def upload(self, vector_store_id: str, file_ids: [str]) -> UploadResult:
+        result = UploadResult(vector_store_id)
+        file_ids = list(dict.fromkeys(file_ids))
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async with create_async_openai_client() as client:
+            async def upload_batch(batch_file_ids):
+                async with semaphore:
+                    for file_result in await self.upload_batch(client, vector_store_id, batch_file_ids):
+                        result.add(file_result)
+                        if self.on_progress:
+                            self.on_progress(file_result)
+
+            await asyncio.gather(*[upload_batch(file_ids[start:start + self.batch_size])
+                                   for start in range(0, len(file_ids), self.batch_size)])
+        result.finished_at = time.perf_counter()
+        return result
+
+    async def upload_batch(self, client: AsyncOpenAI, vector_store_id: str, file_ids: [str]) -> [FileUploadResult]:
+        try:
+            batch = await client.beta.vector_stores.file_batches.create(vector_store_id=vector_store_id,
+                                                                        file_ids=file_ids)
+            batch = await self.wait_for_batch(client, vector_store_id, batch)
+            if batch.status == 'in_progress':
+                return [FileUploadResult(file_id, 'failed', f"Not processed after {self.poll_timeout}s", batch.id)
+                        for file_id in file_ids]
+
+            errors = {}
+            if batch.file_counts.failed or batch.status != 'completed':
+                async for file in client.beta.vector_stores.file_batches.list_files(
+                        batch_id=batch.id, vector_store_id=vector_store_id, filter='failed'):
+                    errors[file.id] = file.last_error.message if file.last_error else 'failed'
+        except openai.OpenAIError as e:
+            return [FileUploadResult(file_id, 'failed', str(e)) for file_id in file_ids]
+
+        # Files of a cancelled batch that did not fail were not processed either
+        return [FileUploadResult(file_id, 'failed', errors[file_id], batch.id) if file_id in errors else
+                FileUploadResult(file_id, 'completed' if batch.status == 'completed' else batch.status,
+                                 batch_id=batch.id)
+                for file_id in file_ids]
+
+    async def wait_for_batch(self, client: AsyncOpenAI, vector_store_id: str, batch):
+        deadline = time.monotonic() + self.poll_timeout
+        attempt = 0
+        while batch.status == 'in_progress':
+            delay = get_poll_delay(attempt)
+            if time.monotonic() + delay > deadline:
+                return batch
+            await asyncio.sleep(delay)
+            batch = await client.beta.vector_stores.file_batches.retrieve(batch.id, vector_store_id=vector_store_id)
+            attempt += 1
+        return batch
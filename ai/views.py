@@ -1,4 +1,5 @@
 # views.py
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from drf_yasg.utils import swagger_auto_schema
 from rest_framework.exceptions import ValidationError
@@ -7,14 +8,17 @@ from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from honeycomb.models import Hive, Bee
+from .context import AIContextBuilder
 from .serializers import HiveAssistantRequestSerializer
 from .services import AIService
+from .throttling import AssistantMessageThrottle, AssistantRunQueue, RunQueueBusy
 
 User = get_user_model()
 
 
 class TestHiveAssistantView(APIView):
     permission_classes = [IsAuthenticated]
+    throttle_classes = [AssistantMessageThrottle]
 
     @swagger_auto_schema(
         request_body=HiveAssistantRequestSerializer,
@@ -25,19 +29,28 @@ class TestHiveAssistantView(APIView):
         if serializer.is_valid():
             message = serializer.validated_data['message']
             additional_instructions = serializer.validated_data['additional_instructions']
+            context = AIContextBuilder(token_budget=settings.AI_CONTEXT_TOKEN_BUDGET)
             final_additional_instructions = f"""
             hives information:
-            {[hive.convert_to_ai_readable() for hive in Hive.objects.all()]}
+            {context.render(Hive.objects.order_by('id'))}
             bees information:
-            {[bee.convert_to_ai_readable() for bee in Bee.objects.all()]}
+            {context.render(Bee.objects.order_by('id'))}
             """ + additional_instructions
 
             print(final_additional_instructions.encode('utf-8', errors='ignore'))
             try:
                 ai_service = AIService(user=request.user, assistant_type="hive_assistant")
-                messages = ai_service.send_message(message=message, additional_instructions=str(final_additional_instructions.encode('utf-8', errors='ignore')),
-                                                   ai_type="hive_assistant")
+                # The answer is returned with the response, the request waits for the active run of the thread
+                # instead of joining its message to it
+                messages = AssistantRunQueue(ai_service.thread_id).run_exclusive(
+                    lambda: ai_service.send_message(
+                        message=message,
+                        additional_instructions=str(final_additional_instructions.encode('utf-8', errors='ignore')),
+                        ai_type="hive_assistant"),
+                    timeout=settings.AI_RUN_WAIT_TIMEOUT)
                 return Response({'messages': messages})
+            except RunQueueBusy as e:
+                return Response({'error': str(e)}, status=409)
             except ValidationError as e:
                 return Response({'error': str(e)}, status=400)
             except Exception as e:
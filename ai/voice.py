@@ -0,0 +1,76 @@
+import struct
+import tempfile
+import threading
+
+import magic
+from django.conf import settings
+
+# Bytes libmagic needs to recognize the common audio containers
+MIME_SNIFF_LENGTH = 2048
+# Binary frame of a speech chunk: b"AF", clip number, chunk number in the clip and 1 on the last chunk of the clip
+AUDIO_FRAME_HEADER = struct.Struct(">2sHIB")
+AUDIO_FRAME_MAGIC = b"AF"
+
+_mime_detector = None
+_mime_detector_lock = threading.Lock()
+
+
+def get_mime_type(data: bytes) -> str:
+    """
+    MIME type of the start of a file with one libmagic handle for the process, opening one loads the whole
+    magic database. The handle is not thread safe so it is used under a lock.
+    """
+    global _mime_detector
+    with _mime_detector_lock:
+        if _mime_detector is None:
+            _mime_detector = magic.Magic(mime=True)
+        return _mime_detector.from_buffer(data[:MIME_SNIFF_LENGTH])
+
+
+def pack_audio_frame(clip: int, index: int, chunk: bytes, last: bool) -> bytes:
+    return AUDIO_FRAME_HEADER.pack(AUDIO_FRAME_MAGIC, clip, index, int(last)) + chunk
+
+
+def unpack_audio_frame(frame: bytes) -> (int, int, bytes, bool):
+    magic_bytes, clip, index, last = AUDIO_FRAME_HEADER.unpack_from(frame)
+    if magic_bytes != AUDIO_FRAME_MAGIC:
+        raise ValueError("Not an audio frame")
+    return clip, index, frame[AUDIO_FRAME_HEADER.size:], bool(last)
+
+
+class VoiceUploadError(Exception):
+    pass
+
+
+class VoiceUpload:
+    """
+    Voice message received in chunks. The chunks are written to a spooled file that moves to disk past
+    AI_VOICE_SPOOL_SIZE bytes, so a long recording is never held in the memory of the consumer.
+    The MIME type is detected on the first chunk.
+    """
+
+    def __init__(self, max_bytes: int = None):
+        self.max_bytes = max_bytes or settings.AI_VOICE_MAX_BYTES
+        self.file = tempfile.SpooledTemporaryFile(max_size=settings.AI_VOICE_SPOOL_SIZE)
+        self.size = 0
+        self.mime_type = None
+
+    def write(self, chunk: bytes) -> None:
+        if self.size + len(chunk) > self.max_bytes:
+            raise VoiceUploadError(f"Voice messages are limited to {self.max_bytes} bytes")
+        if self.mime_type is None:
+            self.mime_type = get_mime_type(chunk)
+        self.file.write(chunk)
+        self.size += len(chunk)
+
+    def open(self):
+        """
+        The recorded file from its start, it is closed with the upload.
+        """
+        if not self.size:
+            raise VoiceUploadError("The voice message is empty")
+        self.file.seek(0)
+        return self.file
+
+    def close(self) -> None:
+        self.file.close()
@@ -1,6 +1,14 @@
 from django.contrib import admin
-from .models import Usage, ModelPrice
+from .models import Usage, ModelPrice, PersistentAssistant, UsageRollup
 # Register your models here.
 
 admin.site.register(Usage)
-admin.site.register(ModelPrice)
\ No newline at end of file
+admin.site.register(ModelPrice)
+admin.site.register(PersistentAssistant)
+
+
+@admin.register(UsageRollup)
+class UsageRollupAdmin(admin.ModelAdmin):
+    list_display = ('user', 'model', 'period', 'period_start', 'runs', 'prompt_tokens', 'completion_tokens', 'cost')
+    search_fields = ('user__email', 'model')
+    list_filter = ('period', 'model')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncHour
+
+from assistant.models import Usage, UsageRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the hourly and daily usage rollups from the recorded Usage rows.'
+
+    def handle(self, *args, **options):
+        sums = {field: Sum(field) for field in UsageRollup.COUNTER_FIELDS if field != 'runs'}
+        rollups = []
+        for period, trunc in ((UsageRollup.PERIOD_HOUR, TruncHour), (UsageRollup.PERIOD_DAY, TruncDay)):
+            rows = Usage.objects.annotate(period_start=trunc('created_at')).values(
+                'user_id', 'model', 'period_start').annotate(runs=Count('id'), **sums).order_by()
+            rollups += [UsageRollup(period=period, **row) for row in rows]
+
+        with transaction.atomic():
+            UsageRollup.objects.all().delete()
+            UsageRollup.objects.bulk_create(rollups, batch_size=1000)
+        self.stdout.write(self.style.SUCCESS(f'{len(rollups)} usage rollup(s) rebuilt'))
@@ -0,0 +1,67 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('assistant', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='assistant',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_assistants', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_messages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='assistant',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='assistant_runs', to='assistant.assistant'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='run',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='run_messages', to='assistant.run'),
+        ),
+        migrations.AddField(
+            model_name='usage',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_usages', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='usagerollup',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='usage_rollups', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='userthread',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_threads', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='run',
+            name='thread',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thread_runs', to='assistant.userthread'),
+        ),
+        migrations.AddField(
+            model_name='message',
+            name='thread',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thread_messages', to='assistant.userthread'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='usagerollup',
+            unique_together={('user', 'period', 'period_start', 'model')},
+        ),
+    ]
@@ -8,21 +8,25 @@ class Usage(models.Model):
     completion_tokens = models.IntegerField(default=0)
     prompt_tokens = models.IntegerField(default=0)
     duration = models.IntegerField(default=0)
+    characters = models.IntegerField(default=0)
+    cost = models.FloatField(default=0.0)
     model = models.CharField(max_length=255, blank=True)
     run_id = models.CharField(max_length=255, blank=True)
     type = models.CharField(max_length=255, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        price_model = self.get_model_price()
-        total_price = self.completion_tokens * price_model.output + self.prompt_tokens * price_model.prompt
-        return self.user.first_name + " " + self.user.last_name + " - " + str(total_price) + "$"
+        return self.user.first_name + " " + self.user.last_name + " - " + str(self.cost) + "$"
 
     def get_model_price(self):
         return ModelPrice.objects.filter(model=self.model).first()
 
 
 class ModelPrice(models.Model):
+    """
+    Price per token of a model. Audio models are priced per input character (speech) or per minute
+    (transcription) in prompt.
+    """
     model = models.CharField(max_length=255, blank=True)
     output = models.FloatField(default=0.0)
     prompt = models.FloatField(default=0.0)
@@ -32,6 +36,38 @@ class ModelPrice(models.Model):
         return self.model
 
 
+class UsageRollup(models.Model):
+    """
+    Usage of a user and model summed per hour and per day, kept current by UsageLedger on every recorded usage.
+    """
+    PERIOD_HOUR = 'hour'
+    PERIOD_DAY = 'day'
+    PERIOD_CHOICES = [
+        (PERIOD_HOUR, 'Hour'),
+        (PERIOD_DAY, 'Day'),
+    ]
+
+    user = models.ForeignKey('user.User', on_delete=models.CASCADE, related_name='usage_rollups')
+    model = models.CharField(max_length=255, blank=True)
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_start = models.DateTimeField()
+    runs = models.IntegerField(default=0)
+    prompt_tokens = models.IntegerField(default=0)
+    completion_tokens = models.IntegerField(default=0)
+    characters = models.IntegerField(default=0)
+    duration = models.IntegerField(default=0)
+    cost = models.FloatField(default=0.0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    COUNTER_FIELDS = ('runs', 'prompt_tokens', 'completion_tokens', 'characters', 'duration', 'cost')
+
+    class Meta:
+        unique_together = ('user', 'period', 'period_start', 'model')
+
+    def __str__(self):
+        return f"{self.user_id} {self.model} {self.period} {self.period_start:%Y-%m-%d %H:%M} - {self.cost}$"
+
+
 class Instruction(models.Model):
     name = models.CharField(max_length=255, blank=True)
     text = models.TextField()
@@ -77,4 +113,17 @@ class UserThread(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
-        return self.user.first_name + " " + self.user.last_name + " - " + self.thread_id
\ No newline at end of file
+        return self.user.first_name + " " + self.user.last_name + " - " + self.thread_id
+
+class PersistentAssistant(models.Model):
+    """
+    Remote assistant shared by every Assistant with the same instruction, tools and model.
+    """
+    fingerprint = models.CharField(max_length=64, unique=True)
+    assistant_id = models.CharField(max_length=255)
+    model = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.model} - {self.assistant_id}"
@@ -0,0 +1,123 @@
+import hashlib
+import inspect
+import json
+import re
+import threading
+import typing
+from typing import Callable
+
+EXCLUDED_PARAMETERS = ("user",)
+PARAM_PATTERN = re.compile(r":param (\w+): (.+)")
+
+
+def format_type_hint(type_hint):
+    if hasattr(type_hint, '__origin__'):
+        origin = type_hint.__origin__
+        if origin is typing.Union:
+            # Assuming Union types are used for Optional fields mostly, which means one type and None
+            types = [format_type_hint(t) for t in type_hint.__args__ if t is not type(None)]
+            return types[0] if len(types) == 1 else ' | '.join(types)
+        elif origin in [list, set, tuple]:
+            return "array"
+        elif origin is dict:
+            key_type, value_type = type_hint.__args__
+            return {
+                "type": "object",
+                "properties": {
+                    "key": format_type_hint(key_type),
+                    "value": format_type_hint(value_type)
+                }
+            }
+    elif type_hint in [int]:
+        return "integer"
+    elif type_hint in [float, complex]:
+        return "number"
+    elif type_hint is type(None):  # Specifically for Optional hints
+        return "null"
+    elif type_hint is bool:
+        return "boolean"
+    return "string"  # Default to string if no explicit mapping exists
+
+
+def parse_docstring(docstring: str) -> dict:
+    """
+    Parse the docstring to extract parameter descriptions.
+    Assumes docstring parameter documentation follows the format:
+    :param <name>: <description>
+    """
+    return {name: desc.strip() for name, desc in PARAM_PATTERN.findall(docstring)}
+
+
+def function_to_json(func: Callable) -> dict:
+    # Extracting the function's name and docstring
+    docstring = inspect.getdoc(func) or ""
+    params = inspect.signature(func).parameters
+    type_hints = typing.get_type_hints(func)
+    param_descriptions = parse_docstring(docstring)
+
+    # Creating the JSON structure for parameters
+    parameters_dict = {
+        "type": "object",
+        "properties": {},
+        "required": []
+    }
+    for name, param in params.items():
+        if name in EXCLUDED_PARAMETERS:
+            continue  # Skip serialization of excluded variables
+        type_hint = type_hints.get(name, str)  # Default to str if unspecified
+        param_type = format_type_hint(type_hint)
+        param_description = param_descriptions.get(name, "No description provided.")
+
+        # Parameter properties
+        if param_type == "array":
+            item_types = [format_type_hint(t) for t in type_hint.__args__]
+            parameters_dict["properties"][name] = {
+                "type": param_type,
+                "description": param_description,
+                "items": {"type": item_types[0] if len(item_types) == 1 else item_types}
+            }
+        else:
+            parameters_dict["properties"][name] = {
+                "type": param_type,
+                "description": param_description
+            }
+        if param.default is param.empty:
+            parameters_dict["required"].append(name)
+
+    return {
+        "name": func.__name__,
+        "description": docstring.split('\n')[0] if docstring else "No detailed description.",
+        "parameters": parameters_dict
+    }
+
+
+class FunctionSchemaRegistry:
+    """
+    OpenAI function tool schemas compiled once per function for the life of the process.
+    The schemas are shared, callers must not change them.
+    """
+    _schemas = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, func: Callable) -> dict:
+        schema = cls._schemas.get(func)
+        if schema is None:
+            schema = function_to_json(func)
+            with cls._lock:
+                schema = cls._schemas.setdefault(func, schema)
+        return schema
+
+    @classmethod
+    def get_tools(cls, functions: [Callable]) -> [dict]:
+        return [{"type": "file_search"}] + [{"type": "function", "function": cls.get(func)} for func in functions]
+
+    @classmethod
+    def clear(cls) -> None:
+        with cls._lock:
+            cls._schemas.clear()
+
+
+def get_assistant_fingerprint(instruction: str, tools: [dict], model: str) -> str:
+    payload = json.dumps({"instruction": instruction, "tools": tools, "model": model}, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=32).hexdigest()
@@ -1,3 +1,164 @@
-from django.test import TestCase
+import typing
+from io import StringIO
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase
+
+from ai.testing import FakeOpenAIServer
+from common.models import Document
+from .models import ModelPrice, PersistentAssistant, Usage, UsageRollup
+from .schemas import FunctionSchemaRegistry
+from .tools import Assistant
+from .usage import UsageLedger
+
+User = get_user_model()
+
+
+def rate_skills(skills: typing.List[str], years: int, note: typing.Optional[str] = None, user=None):
+    """
+    Rate the skills of the user.
+
+    :param skills: Names of the skills.
+    :param years: Years of experience.
+    """
+    return "rated"
+
+
+class FunctionSchemaRegistryTests(SimpleTestCase):
+
+    def test_schema_is_compiled_once_per_function(self):
+        """
+        Test Scenario: The schema of a function is requested twice.
+
+        This test ensures that the same compiled schema is returned and that it describes the parameters,
+        without the user parameter, from the type hints and the docstring.
+        """
+        FunctionSchemaRegistry.clear()
+        schema = FunctionSchemaRegistry.get(rate_skills)
+        self.assertIs(FunctionSchemaRegistry.get(rate_skills), schema)
+        self.assertEqual(schema['name'], 'rate_skills')
+        self.assertEqual(schema['description'], 'Rate the skills of the user.')
+        self.assertEqual(schema['parameters']['required'], ['skills', 'years'])
+        self.assertEqual(schema['parameters']['properties'], {
+            'skills': {'type': 'array', 'description': 'Names of the skills.', 'items': {'type': 'string'}},
+            'years': {'type': 'integer', 'description': 'Years of experience.'},
+            'note': {'type': 'string', 'description': 'No description provided.'},
+        })
+
+
+class PersistentAssistantTests(TestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer.start_for(self)
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def create_user_with_cv(self, email: str, file_id: str) -> User:
+        user = User.objects.create_user(email=email, password='pass')
+        Document.objects.create(user=user, file_id=file_id, purpose='cv',
+                                document=SimpleUploadedFile(f'{file_id}.pdf', file_id.encode()))
+        return user
+
+    def test_assistant_is_shared_and_documents_go_to_the_thread(self):
+        """
+        Test Scenario: Assistants with the same instruction and tools are prepared for two users, twice for the
+        first one, then one with another instruction.
+
+        This test ensures that one remote assistant is created per instruction, tools and model, that each set
+        of documents gets one vector store and that the documents are attached to the thread of the user.
+        """
+        first_user = self.create_user_with_cv('first@example.com', 'file_a')
+        second_user = self.create_user_with_cv('second@example.com', 'file_b')
+
+        assistants = [Assistant(user=user, document_query=user.user_documents.all(), instruction="read the cv",
+                                functions=[rate_skills], reuse_assistant=True)
+                      for user in (first_user, second_user, first_user)]
+
+        self.assertEqual(self.server.calls('POST', '/assistants'), 1)
+        self.assertEqual(len({assistant.assistant_id for assistant in assistants}), 1)
+        self.assertEqual(PersistentAssistant.objects.count(), 1)
+        self.assertEqual(self.server.calls('POST', '/vector_stores'), 2)
+        self.assertEqual(assistants[0].vector_store_id, assistants[2].vector_store_id)
+        self.assertNotEqual(assistants[0].vector_store_id, assistants[1].vector_store_id)
+        thread_bodies = [body for (method, path), body in zip(self.server.requests, self.server.bodies)
+                         if (method, path) == ('POST', '/threads')]
+        self.assertEqual([body['tool_resources']['file_search']['vector_store_ids'] for body in thread_bodies],
+                         [[assistant.vector_store_id] for assistant in assistants])
+
+        Assistant(user=first_user, document_query=None, instruction="another instruction", reuse_assistant=True)
+        self.assertEqual(self.server.calls('POST', '/assistants'), 2)
+
+    def test_incomplete_vector_store_is_not_reused(self):
+        """
+        Test Scenario: The documents of a user are prepared while one of them fails to be added to the
+        vector store, then twice more once it can be added.
+
+        This test ensures that the failure is reported through upload_result, that the incomplete vector store
+        is not reused and that the complete one is.
+        """
+        user = self.create_user_with_cv('partial@example.com', 'file_a')
+        self.server.failed_file_ids = {'file_a'}
+
+        def prepare() -> Assistant:
+            return Assistant(user=user, document_query=user.user_documents.all(), instruction="read the cv",
+                             functions=[rate_skills], reuse_assistant=True)
+
+        incomplete = prepare()
+        self.assertEqual(incomplete.upload_result.failed_file_ids, ['file_a'])
+        self.server.failed_file_ids = set()
+        complete = prepare()
+        self.assertEqual(complete.upload_result.completed_file_ids, ['file_a'])
+        self.assertNotEqual(complete.vector_store_id, incomplete.vector_store_id)
+
+        reused = prepare()
+        self.assertIsNone(reused.upload_result)
+        self.assertEqual(reused.vector_store_id, complete.vector_store_id)
+        self.assertEqual(self.server.calls('POST', '/vector_stores'), 2)
+
+
+class UsageLedgerTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='usage@example.com', password='pass')
+        ModelPrice.objects.create(model='gpt-4o', prompt=0.001, output=0.002)
+        ModelPrice.objects.create(model='tts-1', prompt=0.0001)
+
+    @staticmethod
+    def build_run(run_id: str, status: str, prompt_tokens: int, completion_tokens: int) -> SimpleNamespace:
+        return SimpleNamespace(id=run_id, status=status, model='gpt-4o', usage=SimpleNamespace(
+            prompt_tokens=prompt_tokens, completion_tokens=completion_tokens))
+
+    def rollups(self) -> list:
+        return sorted(UsageRollup.objects.values_list('period', 'model', 'runs', 'prompt_tokens',
+                                                      'completion_tokens', 'characters'))
+
+    def test_usage_is_rolled_up_incrementally(self):
+        """
+        Test Scenario: Two assistant runs end, one of them after a tool call round, and speech is generated.
+        The rollups are then rebuilt from the recorded usage.
+
+        This test ensures that each run is recorded once with its cost, that the hourly and daily rollups of each
+        model are kept current, that the totals come from the rollups and that a rebuild gives the same rollups.
+        """
+        self.assertIsNone(UsageLedger.record_run(self.user, self.build_run('run_1', 'requires_action', 0, 0)))
+        UsageLedger.record_run(self.user, self.build_run('run_1', 'completed', 100, 10))
+        UsageLedger.record_run(self.user, self.build_run('run_2', 'failed', 50, 0))
+        UsageLedger.record(self.user, 'tts-1', 'tts', characters=1000)
+
+        self.assertEqual(Usage.objects.count(), 3)
+        self.assertAlmostEqual(Usage.objects.get(run_id='run_1').cost, 0.12)
+        expected = [('day', 'gpt-4o', 2, 150, 10, 0), ('day', 'tts-1', 1, 0, 0, 1000),
+                    ('hour', 'gpt-4o', 2, 150, 10, 0), ('hour', 'tts-1', 1, 0, 0, 1000)]
+        self.assertEqual(self.rollups(), expected)
+
+        with self.assertNumQueries(1):
+            totals = UsageLedger.get_totals(self.user)
+        self.assertEqual(totals['runs'], 3)
+        self.assertAlmostEqual(totals['cost'], 0.12 + 0.05 + 0.1)
+
+        call_command('rebuild_usage_rollups', stdout=StringIO())
+        self.assertEqual(self.rollups(), expected)
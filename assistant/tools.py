@@ -1,23 +1,34 @@
-import inspect
+import hashlib
 import json
-import re
 import typing
 from typing import Callable
 
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import IntegrityError
 from django.db.models import QuerySet
-from openai import OpenAI
+from openai import NOT_GIVEN, OpenAI
 from openai.types.beta import AssistantResponseFormatParam
 
-from assistant.models import Usage, UserThread
+from ai.clients import get_openai_client
+from ai.tool_executor import ToolCallExecutor, parse_tool_arguments
+from ai.uploader import VectorStoreUploader
+from assistant.models import UserThread, PersistentAssistant
+from assistant.schemas import FunctionSchemaRegistry, get_assistant_fingerprint
+from assistant.usage import UsageLedger
 from common.models import Document
 
 User = get_user_model()
 
 
 class Assistant:
-    client = OpenAI(api_key=settings.OPEN_AI_API_KEY)
+    """
+    Runs an instruction with a set of function tools over the documents of a user.
+    With reuse_assistant the remote assistant is shared by every Assistant with the same instruction, tools and
+    model and the documents are attached to the thread, otherwise every Assistant creates its own.
+    """
 
     def __init__(self, user: User, document_query: QuerySet[Document] or None, instruction: str,
                  functions: [Callable] = None,
@@ -45,20 +56,28 @@ class Assistant:
                      "gpt-3.5-turbo-0125",
                      "gpt-3.5-turbo-16k-0613",
                  ] = "gpt-4o",
+                 reuse_assistant: bool = None,
                  ):
         self.user = user
         self.document_query = document_query
         self.instruction = instruction
         self.functions = functions if functions else []
         self.vector_store_id = ""
+        # Outcome of adding the documents to the vector store, None if nothing was uploaded
+        self.upload_result = None
         self.thread_id = tread_id
         self.format_type = format_type
         self.assistant_id = ""
         self.model = model
         self.json_schema = json.dumps(expected_dictionary) if expected_dictionary else None
+        self.reuse_assistant = settings.ASSISTANT_REUSE_ASSISTANTS if reuse_assistant is None else reuse_assistant
         self.__tools = list()
         self.__prepare()
 
+    @property
+    def client(self) -> OpenAI:
+        return get_openai_client()
+
     def send_message(self, message: str, additional_instructions: str = "") -> str or dict:
         self.client.beta.threads.messages.create(
             thread_id=self.thread_id,
@@ -95,34 +114,68 @@ class Assistant:
             self.__prepare_thread()
 
     def __prepare_assistant(self):
-        print(self.__tools)
+        if self.reuse_assistant:
+            self.assistant_id = self.__get_or_create_persistent_assistant()
+            return
         assistant = self.client.beta.assistants.create(
             instructions=self.instruction,
             name="Talent buzz assistant",
             tools=self.__tools,
             model=self.model,
-            tool_resources={"file_search": {"vector_store_ids": [self.vector_store_id]}}
+            tool_resources=self.__get_tool_resources()
         )
         self.assistant_id = assistant.id
 
+    def __get_or_create_persistent_assistant(self) -> str:
+        fingerprint = get_assistant_fingerprint(self.instruction, self.__tools, self.model)
+        persistent_assistant = PersistentAssistant.objects.filter(fingerprint=fingerprint).first()
+        if persistent_assistant:
+            return persistent_assistant.assistant_id
+
+        assistant = self.client.beta.assistants.create(
+            instructions=self.instruction,
+            name="Talent buzz assistant",
+            tools=self.__tools,
+            model=self.model,
+            metadata={"fingerprint": fingerprint}
+        )
+        try:
+            PersistentAssistant.objects.create(fingerprint=fingerprint, assistant_id=assistant.id, model=self.model)
+        except IntegrityError:
+            # Another process created it first, keep theirs
+            self.client.beta.assistants.delete(assistant.id)
+            return PersistentAssistant.objects.get(fingerprint=fingerprint).assistant_id
+        return assistant.id
+
+    def __get_tool_resources(self) -> dict:
+        return {"file_search": {"vector_store_ids": [self.vector_store_id]}} if self.vector_store_id else {}
+
     def __prepare_files(self):
+        file_ids = sorted({document.file_id for document in self.document_query or [] if document.file_id})
+        if not file_ids:
+            return
+        cache_key = None
+        if self.reuse_assistant:
+            # The same documents are searched through the same vector store
+            digest = hashlib.blake2b(','.join(file_ids).encode(), digest_size=16).hexdigest()
+            cache_key = f"assistant_vector_store:{digest}"
+            self.vector_store_id = cache.get(cache_key) or ""
+            if self.vector_store_id:
+                return
         self.vector_store_id = self.client.beta.vector_stores.create().id
-        [self.client.beta.vector_stores.files.create(vector_store_id=self.vector_store_id, file_id=document.file_id) for
-         document in self.document_query if document.file_id]
+        self.upload_result = async_to_sync(VectorStoreUploader().upload)(self.vector_store_id, file_ids)
+        # A store missing some of the files is only used by this assistant, the next one uploads them again
+        if cache_key and not self.upload_result.failed_file_ids:
+            cache.set(cache_key, self.vector_store_id, timeout=settings.ASSISTANT_VECTOR_STORE_CACHE_TIMEOUT)
 
     def __prepare_tools(self):
-        tools = [{"type": "file_search"}]
-        for func in self.functions:
-            func_json = self.__function_to_json(func)
-            tools.append({
-                "type": "function",
-                "function": func_json
-            })
-        self.__tools = tools
+        self.__tools = FunctionSchemaRegistry.get_tools(self.functions)
 
     def __prepare_thread(self):
         self.thread_id = self.client.beta.threads.create(
-            metadata={"assistant_id": self.assistant_id, "user_id": str(self.user.id)}
+            metadata={"assistant_id": self.assistant_id, "user_id": str(self.user.id)},
+            # A shared assistant has no files of its own, the thread brings the documents of this user
+            tool_resources=self.__get_tool_resources() if self.reuse_assistant else NOT_GIVEN
         ).id
 
         self.client.beta.threads.messages.create(
@@ -131,132 +184,13 @@ class Assistant:
             role="user"
         )
 
-    def __function_to_json(self, func: Callable):
-        exclude_vars = ["user"]
-        # Extracting the function's name and docstring
-        func_name = func.__name__
-        docstring = inspect.getdoc(func)
-        docstring = docstring if docstring else ""
-
-        # Analyzing the function's signature
-        sig = inspect.signature(func)
-        params = sig.parameters
-
-        # Creating the JSON structure for parameters
-        parameters_dict = {
-            "type": "object",
-            "properties": {},
-            "required": []
-        }
-
-        param_descriptions = self.__parse_docstring(docstring)
-
-        for name, param in params.items():
-            if name in exclude_vars:
-                continue  # Skip serialization of excluded variables
-            # Type hints extraction
-            type_hint = typing.get_type_hints(func).get(name, str)  # Default to str if unspecified
-            param_type = self.__format_type_hint(type_hint)
-            param_description = param_descriptions.get(name, "No description provided.")
-
-            # Parameter properties
-            if param_type == "array":
-                item_types = [self.__format_type_hint(t) for t in type_hint.__args__]
-                parameters_dict["properties"][name] = {
-                    "type": param_type,
-                    "description": param_description,
-                    "items": {"type": item_types[0] if len(item_types) == 1 else item_types}
-                }
-
-            else:
-                parameters_dict["properties"][name] = {
-                    "type": param_type,
-                    "description": param_description
-                }
-            if param.default is param.empty:
-                parameters_dict["required"].append(name)
-
-        # Complete JSON structure
-        func_json = {
-            "name": func_name,
-            "description": docstring.split('\n')[0] if docstring else "No detailed description.",
-            "parameters": parameters_dict
-        }
-
-        return func_json
-
-    def __format_type_hint(self, type_hint):
-        if hasattr(type_hint, '__origin__'):
-            origin = type_hint.__origin__
-            if origin is typing.Union:
-                # Assuming Union types are used for Optional fields mostly, which means one type and None
-                types = [self.__format_type_hint(t) for t in type_hint.__args__ if t is not type(None)]
-                return types[0] if len(types) == 1 else ' | '.join(types)
-            elif origin in [list, set, tuple]:
-                return "array"
-            elif origin is dict:
-                key_type, value_type = type_hint.__args__
-                return {
-                    "type": "object",
-                    "properties": {
-                        "key": self.__format_type_hint(key_type),
-                        "value": self.__format_type_hint(value_type)
-                    }
-                }
-        elif type_hint in [int]:
-            return "integer"
-        elif type_hint in [float, complex]:
-            return "number"
-        elif type_hint is type(None):  # Specifically for Optional hints
-            return "null"
-        elif type_hint is bool:
-            return "boolean"
-        return "string"  # Default to string if no explicit mapping exists
-
-    @staticmethod
-    def __parse_docstring(docstring):
-        """
-        Parse the docstring to extract parameter descriptions.
-        Assumes docstring parameter documentation follows the format:
-        :param <name>: <description>
-        """
-        param_pattern = r":param (\w+): (.+)"
-        params = re.findall(param_pattern, docstring)
-        return {name: desc.strip() for name, desc in params}
-
     def __process_ai_response(self, run, retry_count=2):
         print(run.status)
+        UsageLedger.record_run(self.user, run)
         if run.status == "requires_action":
             print("here")
-            function_responses = list()
-            for tool in run.required_action.submit_tool_outputs.tool_calls:
-                arguments = tool.function.arguments
-                # parse string to dict
-                try:
-                    arguments = json.loads(arguments)
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing arguments: {e}")
-                    arguments = {}
-                _function = self.__get_function_reference(tool.function.name)
-                try:
-                    # print(arguments, self.user)
-                    arguments['user'] = self.user
-                    print(arguments)
-                    function_response = _function(**arguments)
-                    print(function_response)
-                except Exception as e:
-                    print(f"Error processing function: {e}")
-                    function_response = "Error processing function"
-                if isinstance(function_response, str):
-                    function_responses.append({
-                        "tool_call_id": tool.id,
-                        "output": function_response
-                    })
-                else:
-                    function_responses.append({
-                        "tool_call_id": tool.id,
-                        "output": "Error processing function"
-                    })
+            function_responses = ToolCallExecutor(self.__invoke_tool).execute(
+                run.required_action.submit_tool_outputs.tool_calls)
 
             return self.__process_ai_response(
                 self.client.beta.threads.runs.submit_tool_outputs_and_poll(tool_outputs=function_responses,
@@ -282,17 +216,14 @@ class Assistant:
                     else:
                         raise ValueError("Failed to get valid JSON response after retries")
                 return response_data
-            print(run.usage)
-            run_usage = run.usage
-            if run_usage:
-                Usage.objects.create(
-                    user=self.user, model=self.model, type="txt",
-                    completion_tokens=run_usage.completion_tokens,
-                    prompt_tokens=run_usage.prompt_tokens,
-                    run_id=run.id
-                )
             return response.content[0].text.value
 
+    def __invoke_tool(self, tool):
+        _function = self.__get_function_reference(tool.function.name)
+        arguments = parse_tool_arguments(tool)
+        arguments['user'] = self.user
+        return _function(**arguments)
+
     def __get_function_reference(self, name: str):
         """Retrieve a function reference from the stored list by function name.
 
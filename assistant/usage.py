@@ -0,0 +1,93 @@
+from datetime import datetime
+from typing import Optional
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from ai.clients import TTLCache
+from .models import ModelPrice, Usage, UsageRollup
+
+TERMINAL_RUN_STATUSES = ('completed', 'failed', 'cancelled', 'expired', 'incomplete')
+
+_prices = TTLCache(ttl=300)
+
+
+def get_model_price(model: str) -> Optional[ModelPrice]:
+    # Missing prices are cached as False so unpriced models do not query on every record
+    price = _prices.get_or_set(model, lambda: ModelPrice.objects.filter(model=model).first() or False)
+    return price or None
+
+
+def get_period_starts(moment: datetime) -> {str: datetime}:
+    hour = moment.replace(minute=0, second=0, microsecond=0)
+    return {UsageRollup.PERIOD_HOUR: hour, UsageRollup.PERIOD_DAY: hour.replace(hour=0)}
+
+
+class UsageLedger:
+    """
+    Single entry point for the OpenAI usage of the platform. Every call is written to Usage with its cost and
+    added to the hourly and daily UsageRollup of its user and model, so reports and quota checks read rollups.
+    """
+
+    @staticmethod
+    def record(user: 'User', model: str, usage_type: str, prompt_tokens: int = 0, completion_tokens: int = 0,
+               characters: int = 0, duration: int = 0, run_id: str = "") -> Optional[Usage]:
+        if user is None or not user.is_authenticated:
+            return None
+        price = get_model_price(model)
+        cost = 0.0
+        if price:
+            cost = (prompt_tokens * price.prompt + completion_tokens * price.output +
+                    characters * price.prompt + duration / 60 * price.prompt)
+        with transaction.atomic():
+            usage = Usage.objects.create(user=user, model=model, type=usage_type, prompt_tokens=prompt_tokens,
+                                         completion_tokens=completion_tokens, characters=characters,
+                                         duration=duration, cost=cost, run_id=run_id)
+            UsageLedger.add_to_rollups(usage)
+        return usage
+
+    @staticmethod
+    def record_run(user: 'User', run) -> Optional[Usage]:
+        """
+        Record the usage of an assistant run once it ended, it covers all its tool call rounds.
+        """
+        if run.status not in TERMINAL_RUN_STATUSES or not run.usage:
+            return None
+        return UsageLedger.record(user, run.model, "txt", prompt_tokens=run.usage.prompt_tokens,
+                                  completion_tokens=run.usage.completion_tokens, run_id=run.id)
+
+    @staticmethod
+    def record_completion(user: 'User', completion) -> Optional[Usage]:
+        if not completion.usage:
+            return None
+        return UsageLedger.record(user, completion.model, "txt", prompt_tokens=completion.usage.prompt_tokens,
+                                  completion_tokens=completion.usage.completion_tokens)
+
+    @staticmethod
+    def add_to_rollups(usage: Usage) -> None:
+        values = {field: getattr(usage, field) for field in UsageRollup.COUNTER_FIELDS if field != 'runs'}
+        values['runs'] = 1
+        for period, period_start in get_period_starts(usage.created_at).items():
+            rollup = UsageRollup.objects.filter(user_id=usage.user_id, model=usage.model, period=period,
+                                                period_start=period_start)
+            increments = {field: F(field) + value for field, value in values.items()}
+            if rollup.update(**increments):
+                continue
+            try:
+                with transaction.atomic():
+                    UsageRollup.objects.create(user_id=usage.user_id, model=usage.model, period=period,
+                                               period_start=period_start, **values)
+            except IntegrityError:
+                # Created by a concurrent record between the update and the insert
+                rollup.update(**increments)
+
+    @staticmethod
+    def get_totals(user: 'User', period: str = UsageRollup.PERIOD_DAY, since: datetime = None) -> dict:
+        """
+        Sum the rollups of the user from the period that contains since (default now) on.
+        """
+        period_start = get_period_starts(since or timezone.now())[period]
+        totals = UsageRollup.objects.filter(user=user, period=period, period_start__gte=period_start).aggregate(
+            **{field: Sum(field) for field in UsageRollup.COUNTER_FIELDS})
+        return {field: value or 0 for field, value in totals.items()}
@@ -0,0 +1,353 @@
+import contextlib
+import json
+import platform
+import random
+import statistics
+import subprocess
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, Optional
+
+import django
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from .instrumentation import collect_queries, get_collector
+
+# Rows seeded per scale, memberships and conversations follow from the hives and bees
+SCALES = {
+    'small': {'hives': 10, 'bees': 50, 'nectars': 30, 'contracts': 60, 'messages': 500, 'notifications': 200,
+              'tasks': 60},
+    'medium': {'hives': 100, 'bees': 500, 'nectars': 300, 'contracts': 600, 'messages': 5000,
+               'notifications': 2000, 'tasks': 600},
+    'large': {'hives': 500, 'bees': 5000, 'nectars': 2000, 'contracts': 5000, 'messages': 50000,
+              'notifications': 20000, 'tasks': 5000},
+}
+MEMBERSHIPS_PER_BEE = 3
+BENCHMARK_PASSWORD = 'benchmark'
+ASSISTANT_ANSWER = 'There is nothing new today.'
+
+
+def get_percentile(values: List[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+def get_commit() -> Optional[str]:
+    try:
+        result = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True,
+                                timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return result.stdout.strip() or None
+
+
+def get_consumer_application(consumer):
+    """
+    ASGI application of the consumer whose queries are recorded with the current run. Communicators start the
+    application in an empty context, the collector of the run is set again inside it.
+    """
+    application = consumer.as_asgi()
+    collector = get_collector()
+
+    async def collecting_application(scope, receive, send):
+        if collector is None:
+            return await application(scope, receive, send)
+        with collect_queries(collector):
+            return await application(scope, receive, send)
+
+    return collecting_application
+
+
+class BenchmarkData:
+    """
+    Rows the scenarios request, the user is a bee of the first hive and takes part in its conversation.
+    """
+
+    def __init__(self, user, hive, conversation, counts: dict, seed: int):
+        self.user = user
+        self.hive = hive
+        self.conversation = conversation
+        self.counts = counts
+        self.seed = seed
+
+
+def seed_benchmark_data(counts: Dict[str, int], seed: int = 0) -> BenchmarkData:
+    """
+    Create the synthetic rows of a scale with bulk inserts. The rows only depend on the counts and the seed so
+    every run of the same scale measures the same data. Signals are not sent, the notifications and
+    conversations they would create are seeded directly.
+    """
+    from ai.models import AssistantInfo, Thread
+    from communication.models import Conversation, Message, Notification
+    from honeycomb.models import Bee, Contract, Hive, Membership, Nectar
+    from task.models import Task
+
+    User = get_user_model()
+    rng = random.Random(seed)
+    password = make_password(BENCHMARK_PASSWORD)
+
+    User.objects.bulk_create(
+        User(email=f'benchmark{index}@example.com', password=password, first_name=f'Bee {index}')
+        for index in range(counts['bees'] + counts['hives']))
+    users = list(User.objects.filter(email__startswith='benchmark').order_by('id'))
+    bee_users, admins = users[:counts['bees']], users[counts['bees']:]
+
+    Hive.objects.bulk_create(
+        Hive(name=f'Hive {index}', description=f'Synthetic hive {index}',
+             hive_type=rng.choice(['queen', 'no_queen']), hive_requirements='Python, Django', is_public=index % 2 == 0)
+        for index in range(counts['hives']))
+    hives = list(Hive.objects.order_by('id'))
+    Hive.admins.through.objects.bulk_create(
+        Hive.admins.through(hive_id=hive.id, user_id=admin.id) for hive, admin in zip(hives, admins))
+
+    Bee.objects.bulk_create(Bee(user=user, bee_bio=f'Synthetic bee {user.id}') for user in bee_users)
+    bees = list(Bee.objects.order_by('id'))
+    hive_bees = {hive.id: [] for hive in hives}
+    for index, bee in enumerate(bees):
+        joined = {hives[0]} if index == 0 else set()
+        joined.update(rng.sample(hives, min(MEMBERSHIPS_PER_BEE, len(hives)) - len(joined)))
+        for hive in joined:
+            hive_bees[hive.id].append(bee)
+    Membership.objects.bulk_create(
+        Membership(hive_id=hive_id, bee=bee, is_accepted=True, honey_points=rng.randint(0, 1000))
+        for hive_id, members in hive_bees.items() for bee in members)
+
+    Nectar.objects.bulk_create(
+        Nectar(nectar_title=f'Nectar {index}', nectar_description=f'Synthetic nectar {index}',
+               nectar_hive=rng.choice(hives), price=rng.randint(100, 10000), required_bees=rng.randint(1, 5))
+        for index in range(counts['nectars']))
+    nectars = list(Nectar.objects.order_by('id'))
+    Contract.objects.bulk_create(
+        Contract(nectar=rng.choice(nectars), bee=rng.choice(bees), accepted_rate=rng.randint(10, 100),
+                 is_accepted=rng.random() < 0.5)
+        for _ in range(counts['contracts']))
+    contracts = list(Contract.objects.order_by('id'))
+    task_contracts = [rng.choice(contracts) for _ in range(counts['tasks'])]
+    Task.objects.bulk_create(
+        Task(title=f'Task {index}', description=f'Synthetic task {index}', contract=contract,
+             nectar_id=contract.nectar_id, priority=rng.randint(1, 5), urgency=rng.randint(1, 5))
+        for index, contract in enumerate(task_contracts))
+
+    Conversation.objects.bulk_create(Conversation(hive=hive, tag=f'hive {hive.id}') for hive in hives)
+    conversations = list(Conversation.objects.order_by('id'))
+    Conversation.participants.through.objects.bulk_create(
+        Conversation.participants.through(conversation_id=conversation.id, user_id=bee.user_id)
+        for conversation in conversations for bee in hive_bees[conversation.hive_id])
+    # Half of the messages go to the conversation of the user, the others are spread over the hives
+    message_conversations = [conversations[0] if index % 2 == 0 else rng.choice(conversations)
+                             for index in range(counts['messages'])]
+    Message.objects.bulk_create(
+        Message(conversation=conversation, sender_id=rng.choice(hive_bees[conversation.hive_id] or bees).user_id,
+                content=f'Synthetic message {index}')
+        for index, conversation in enumerate(message_conversations))
+    Notification.objects.bulk_create(
+        Notification(user=bee_users[0] if index % 2 == 0 else rng.choice(users), message=f'Notification {index}',
+                     notification_type='benchmark', notification_channel='web')
+        for index in range(counts['notifications']))
+
+    AssistantInfo.objects.create(general_assistant_id='asst_1', backend_assistant_id='asst_1')
+    Thread.objects.create(user=bee_users[0], thread_id='thread_1')
+    return BenchmarkData(bee_users[0], hives[0], conversations[0], counts, seed)
+
+
+class BenchmarkSuite:
+    """
+    Drives the DRF viewsets through an in-process client and the websocket consumers through a communicator,
+    with OpenAI answered by a local fake server. Every scenario is measured over iterations after warmup runs:
+    latency percentiles, the queries and serializer time of the run and, on one extra run, the peak of the
+    memory allocated by Python.
+    """
+
+    def __init__(self, data: BenchmarkData, iterations: int = 30, warmup: int = 3):
+        self.data = data
+        self.iterations = iterations
+        self.warmup = warmup
+        self.client = APIClient()
+        self.client.force_authenticate(data.user)
+        self.cleanups = contextlib.ExitStack()
+
+    def addCleanup(self, function, *args, **kwargs):
+        # The fake OpenAI server registers its cleanups like on a test case
+        self.cleanups.callback(function, *args, **kwargs)
+
+    def get_scenarios(self) -> Dict[str, Callable[[], bool]]:
+        hive, conversation = self.data.hive, self.data.conversation
+        scenarios = {name: self.get_request(path) for name, path in (
+            ('hives_list', '/honeycomb/hives/'),
+            ('hives_public_list', '/honeycomb/hives/?is_public=true'),
+            ('hive_detail', f'/honeycomb/hives/{hive.id}/'),
+            ('bees_list', '/honeycomb/bees/'),
+            ('memberships_list', '/honeycomb/memberships/'),
+            ('nectars_list', '/honeycomb/nectars/'),
+            ('contracts_list', '/honeycomb/contracts/'),
+            ('tasks_list', '/task/tasks/'),
+            ('conversations_list', '/comunication/conversations/'),
+            ('messages_list', f'/comunication/messages/?conversation={conversation.id}'),
+            ('notifications_list', '/comunication/notification/'),
+        )}
+        scenarios['ws_conversation_replay'] = self.replay_conversation
+        scenarios['ws_assistant_message'] = self.send_assistant_message
+        return scenarios
+
+    def get_request(self, path: str) -> Callable[[], bool]:
+        def request():
+            return self.client.get(path).status_code == 200
+
+        return request
+
+    def queue_assistant_answer(self):
+        self.server.run_streams.append([self.server.run_event('in_progress'),
+                                        self.server.text_delta_event(ASSISTANT_ANSWER),
+                                        self.server.run_event('completed')])
+
+    def replay_conversation(self) -> bool:
+        from communication.pagination import encode_cursor
+        from djangoProject.consumers import ConversationConsumer
+        conversation = self.data.conversation
+        first_message = conversation.messages.order_by('timestamp', 'id').first()
+        expected = min(conversation.messages.count() - 1, ConversationConsumer.REPLAY_LIMIT)
+
+        async def replay():
+            communicator = WebsocketCommunicator(
+                get_consumer_application(ConversationConsumer),
+                f'/ws/conversation/{conversation.id}/?cursor={encode_cursor(first_message)}')
+            communicator.scope['user'] = self.data.user
+            communicator.scope['url_route'] = {'kwargs': {'conversation_id': str(conversation.id)}}
+            connected, _ = await communicator.connect()
+            received = 0
+            while connected and received < expected:
+                await communicator.receive_output(timeout=10)
+                received += 1
+            await communicator.disconnect()
+            return connected
+
+        return async_to_sync(replay)()
+
+    def send_assistant_message(self) -> bool:
+        from djangoProject.consumers import FrontEndConsumer
+        self.queue_assistant_answer()
+
+        async def talk():
+            communicator = WebsocketCommunicator(get_consumer_application(FrontEndConsumer), '/ws/ai/')
+            communicator.scope['user'] = self.data.user
+            connected, _ = await communicator.connect()
+            if connected:
+                await communicator.send_to(text_data='What is new?')
+                while (await communicator.receive_output(timeout=10)).get('text') != ASSISTANT_ANSWER:
+                    pass
+            await communicator.disconnect()
+            return connected
+
+        return async_to_sync(talk)()
+
+    def measure(self, run: Callable[[], bool]) -> dict:
+        for _ in range(self.warmup):
+            run()
+
+        latencies, queries, sql_seconds, serializer_seconds, errors = [], [], [], [], 0
+        for _ in range(self.iterations):
+            with collect_queries() as collector:
+                start = time.perf_counter()
+                try:
+                    ok = run()
+                except Exception as e:
+                    print(f"Benchmark run failed: {e}")
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+            errors += not ok
+            queries.append(collector.queries)
+            sql_seconds.append(collector.sql_seconds)
+            serializer_seconds.append(collector.serializer_seconds)
+
+        tracemalloc.start()
+        try:
+            run()
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {
+            'iterations': self.iterations,
+            'errors': errors,
+            'p50_ms': round(statistics.median(latencies) * 1000, 3),
+            'p95_ms': round(get_percentile(latencies, 95) * 1000, 3),
+            'mean_ms': round(statistics.mean(latencies) * 1000, 3),
+            'queries': statistics.median(queries),
+            'max_queries': max(queries),
+            'sql_ms': round(statistics.median(sql_seconds) * 1000, 3),
+            'serializer_ms': round(statistics.median(serializer_seconds) * 1000, 3),
+            'peak_memory_bytes': peak_memory,
+        }
+
+    def run(self, names: Iterable[str] = None, report: Callable[[str, dict], None] = None) -> dict:
+        """
+        Measure the scenarios, all of them by default, and return the results with what they were measured on.
+        Responses are cached in memory, the assistant limits are lifted and instrumentation is off so the
+        metrics middleware does not take the queries of the scenarios.
+        """
+        from ai.testing import FakeOpenAIServer
+        from ai.throttling import get_redis_client
+        scenarios = self.get_scenarios()
+        names = list(names or scenarios)
+        unknown = set(names) - set(scenarios)
+        if unknown:
+            raise ValueError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+        results = {}
+        # The cleanups undo the settings of the fake OpenAI server, they run before these are restored
+        with override_settings(
+                CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+                CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}},
+                INSTRUMENTATION_ENABLED=False, AI_THROTTLE_KEY_PREFIX='benchmark_ai',
+                AI_RATE_LIMIT_CAPACITY=10 ** 9), self.cleanups:
+            self.server = FakeOpenAIServer.start_for(self)
+            # A run lock left by an interrupted benchmark would queue the assistant messages
+            client = get_redis_client()
+            for key in client.scan_iter(f"{settings.AI_THROTTLE_KEY_PREFIX}:*"):
+                client.delete(key)
+            for name in names:
+                results[name] = self.measure(scenarios[name])
+                if report:
+                    report(name, results[name])
+
+        return {
+            'commit': get_commit(),
+            'created_at': datetime.now(timezone.utc).isoformat(),
+            'counts': self.data.counts,
+            'seed': self.data.seed,
+            'warmup': self.warmup,
+            'environment': {'python': platform.python_version(), 'django': django.get_version(),
+                            'database': connection.vendor},
+            'scenarios': results,
+        }
+
+
+def compare_results(previous: dict, current: dict, tolerance: float = 0.2) -> List[str]:
+    """
+    Regressions of current against previous: a p95 latency or peak memory more than tolerance above the previous
+    one, or more queries. Scenarios missing from one of the runs are skipped.
+    """
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = previous['scenarios'].get(name)
+        if before is None:
+            continue
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: {before['queries']} -> {result['queries']} queries")
+        for key, unit in (('p95_ms', 'ms p95'), ('peak_memory_bytes', 'bytes peak memory')):
+            if result[key] > before[key] * (1 + tolerance):
+                regressions.append(f"{name}: {before[key]} -> {result[key]} {unit}")
+    return regressions
+
+
+def load_results(path: str) -> dict:
+    with open(path) as file:
+        return json.load(file)
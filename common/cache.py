@@ -0,0 +1,108 @@
+import functools
+import hashlib
+import uuid
+from typing import Callable, Iterable, Optional
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from rest_framework.response import Response
+
+ModelReference = type[Model] | str
+
+
+def get_model_label(model: ModelReference) -> str:
+    return model.lower() if isinstance(model, str) else model._meta.label_lower
+
+
+def get_model_version_key(model: ModelReference) -> str:
+    return f"model_version:{get_model_label(model)}"
+
+
+def get_model_versions(models: Iterable[ModelReference]) -> [str]:
+    """
+    Current version of every model, models without one get it here. Keys that embed the versions are not
+    used anymore once one of the models changes.
+    """
+    keys = [get_model_version_key(model) for model in models]
+    versions = cache.get_many(keys)
+    missing = {key: uuid.uuid4().hex for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump_model_versions(*models: ModelReference) -> None:
+    cache.set_many({get_model_version_key(model): uuid.uuid4().hex for model in models}, timeout=None)
+
+
+def invalidate_model_version(sender, **kwargs):
+    bump_model_versions(sender)
+
+
+def invalidate_model_relations_version(sender, instance, action, model, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # The rows on both sides of the relation embed it
+    bump_model_versions(type(instance), model)
+
+
+def connect_model_versions(app_label: str) -> None:
+    """
+    Bump the version of every model of the app when one of its rows or many to many relations changes.
+    """
+    for model in apps.get_app_config(app_label).get_models():
+        dispatch_uid = f'model_version_{model._meta.label_lower}'
+        post_save.connect(invalidate_model_version, sender=model, dispatch_uid=dispatch_uid)
+        post_delete.connect(invalidate_model_version, sender=model, dispatch_uid=f'{dispatch_uid}_delete')
+        for field in model._meta.local_many_to_many:
+            through = field.remote_field.through
+            m2m_changed.connect(invalidate_model_relations_version, sender=through,
+                                dispatch_uid=f'model_version_relations_{through._meta.label_lower}')
+
+
+def get_permission_scope(request) -> str:
+    user = request.user
+    if not user.is_authenticated:
+        return "anonymous"
+    if user.is_superuser:
+        return "superuser"
+    return "staff" if user.is_staff else "user"
+
+
+def cache_response(models: Iterable[ModelReference], timeout: int = None, per_user: bool = False,
+                   condition: Optional[Callable[['Request'], bool]] = None):
+    """
+    Cache the successful responses of a viewset list or retrieve method. The key is made of the view, the
+    action, the url with its query, the versions of models and the permission scope of the user, or the user
+    itself with per_user for views whose data depends on who asks. Requests for which condition returns False
+    are not cached.
+    """
+    models = tuple(models)
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            if condition is not None and not condition(request):
+                return method(self, request, *args, **kwargs)
+
+            scope = f"user:{request.user.pk}" if per_user and request.user.is_authenticated else \
+                get_permission_scope(request)
+            parts = [type(self).__module__, type(self).__qualname__, method.__name__, request.get_full_path(), scope,
+                     *get_model_versions(models)]
+            key = f"response:{hashlib.blake2b('|'.join(parts).encode(), digest_size=16).hexdigest()}"
+            cached = cache.get(key)
+            if cached is not None:
+                return Response(cached)
+
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout or settings.VIEW_CACHE_TIMEOUT)
+            return response
+
+        return wrapper
+
+    return decorator
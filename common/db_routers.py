@@ -0,0 +1,41 @@
+import contextvars
+
+from django.conf import settings
+
+REPLICA_DATABASE = 'replica'
+
+_replica_reads = contextvars.ContextVar('replica_reads', default=False)
+
+
+def is_replica_read() -> bool:
+    return _replica_reads.get()
+
+
+def start_replica_reads() -> contextvars.Token:
+    return _replica_reads.set(True)
+
+
+def stop_replica_reads(token: contextvars.Token) -> None:
+    _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of the read only viewset actions (see ReplicaReadViewSetMixin) to the replica database when
+    one is configured. Everything else, writes included, uses default. Both databases hold the same rows so
+    relations between them are allowed, migrations only run on default.
+    """
+
+    def db_for_read(self, model, **hints):
+        if is_replica_read() and REPLICA_DATABASE in settings.DATABASES:
+            return REPLICA_DATABASE
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA_DATABASE
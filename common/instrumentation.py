@@ -0,0 +1,376 @@
+import contextlib
+import contextvars
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import Counter as SignatureCounter
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+METRIC_PREFIX = 'talent_buzz'
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Placeholders of IN clauses and bulk inserts, their number changes the SQL but not the query
+REPEATED_PLACEHOLDERS = re.compile(r'%s(?:\s*,\s*%s)+')
+
+_collector = contextvars.ContextVar('query_collector', default=None)
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label_value(value)}"' for name, value in labels.items()) + '}'
+
+
+class Metric:
+    """
+    Metric of the process with one value per set of label values, rendered in the Prometheus text format.
+    Every daphne process exposes its own values, Prometheus adds them up over the scraped processes.
+    """
+    type = None
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = ()):
+        self.name = f"{METRIC_PREFIX}_{name}"
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def get_label_values(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def render_samples(self) -> [str]:
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def render(self) -> [str]:
+        with self.lock:
+            samples = self.render_samples()
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}", *samples]
+
+    def clear(self) -> None:
+        with self.lock:
+            self.values.clear()
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self.get_label_values(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render_samples(self) -> [str]:
+        return [f"{self.name}{format_labels(dict(zip(self.label_names, key)))} {value}"
+                for key, value in sorted(self.values.items())]
+
+
+class Gauge(Counter):
+    type = 'gauge'
+
+    def set(self, value: float, **labels) -> None:
+        with self.lock:
+            self.values[self.get_label_values(labels)] = value
+
+
+class Histogram(Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, label_names: Iterable[str] = (), buckets=SECONDS_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self.get_label_values(labels)
+        with self.lock:
+            # Count per bucket, sum and count of the observations
+            observations = self.values.setdefault(key, [[0] * len(self.buckets), 0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    observations[0][index] += 1
+            observations[1] += value
+            observations[2] += 1
+
+    def render_samples(self) -> [str]:
+        samples = []
+        for key, (counts, total, count) in sorted(self.values.items()):
+            labels = dict(zip(self.label_names, key))
+            for bound, bucket_count in zip(self.buckets, counts):
+                samples.append(f"{self.name}_bucket{format_labels({**labels, 'le': bound})} {bucket_count}")
+            samples.append(f"{self.name}_bucket{format_labels({**labels, 'le': '+Inf'})} {count}")
+            samples.append(f"{self.name}_sum{format_labels(labels)} {total}")
+            samples.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return samples
+
+
+ENDPOINT_LABELS = ('endpoint', 'method')
+
+REQUESTS = Counter('requests_total', 'Requests and websocket events of the instrumented endpoints',
+                   (*ENDPOINT_LABELS, 'status'))
+REQUEST_DURATION = Histogram('request_duration_seconds', 'Time to handle the request', ENDPOINT_LABELS)
+SAMPLED_REQUESTS = Counter('sampled_requests_total', 'Requests whose queries and serializers were recorded',
+                           ENDPOINT_LABELS)
+QUERIES = Histogram('request_queries', 'Database queries of a sampled request', ENDPOINT_LABELS, QUERY_BUCKETS)
+DUPLICATE_QUERIES = Histogram('request_duplicate_queries', 'Queries of a sampled request that repeat an earlier '
+                              'one with other parameters', ENDPOINT_LABELS, QUERY_BUCKETS)
+SQL_DURATION = Histogram('request_sql_seconds', 'Time spent in database queries by a sampled request',
+                         ENDPOINT_LABELS)
+SERIALIZER_DURATION = Histogram('request_serializer_seconds', 'Time spent turning instances into data by a sampled '
+                                'request', ENDPOINT_LABELS)
+DUPLICATE_QUERY_SIGNATURES = Counter('duplicate_queries_total', 'Repetitions of a query signature within sampled '
+                                     'requests, see query_signature_info for the SQL',
+                                     (*ENDPOINT_LABELS, 'signature'))
+QUERY_SIGNATURES = Gauge('query_signature_info', 'SQL of the duplicated query signatures', ('signature', 'sql'))
+SAMPLE_RATE = Gauge('sample_rate', 'Current sample rate of the endpoint', ENDPOINT_LABELS)
+
+METRICS = (REQUESTS, REQUEST_DURATION, SAMPLED_REQUESTS, QUERIES, DUPLICATE_QUERIES, SQL_DURATION,
+           SERIALIZER_DURATION, DUPLICATE_QUERY_SIGNATURES, QUERY_SIGNATURES, SAMPLE_RATE)
+
+
+def render_metrics() -> str:
+    return '\n'.join(line for metric in METRICS for line in metric.render()) + '\n'
+
+
+def get_query_signature(sql: str) -> (str, str):
+    """
+    Short hash and normalized SQL of a query. Parameters are not part of the SQL, queries that only differ
+    in them share the signature, which is what a N+1 looks like.
+    """
+    normalized = REPEATED_PLACEHOLDERS.sub('%s, ...', sql)
+    return hashlib.blake2b(normalized.encode(), digest_size=8).hexdigest(), normalized
+
+
+class QueryCollector:
+    """
+    Queries and serializer time of one sampled request. Queries of the request can run in other threads
+    (sync_to_async copies the context), so the counts are updated under a lock.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.signatures = SignatureCounter()
+        self.sql = {}
+        self.lock = threading.Lock()
+
+    def add_query(self, sql: str, seconds: float) -> None:
+        signature, normalized = get_query_signature(sql)
+        with self.lock:
+            self.queries += 1
+            self.sql_seconds += seconds
+            self.signatures[signature] += 1
+            self.sql.setdefault(signature, normalized)
+
+    def add_serializer_time(self, seconds: float) -> None:
+        with self.lock:
+            self.serializer_seconds += seconds
+
+    def get_duplicates(self) -> dict:
+        return {signature: count - 1 for signature, count in self.signatures.items() if count > 1}
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper installed on every connection (see common.signals), it only measures the queries
+    run while a sampled request is active.
+    """
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.add_query(sql, time.perf_counter() - start)
+
+
+def time_serializer(serializer):
+    """
+    Measure the to_representation of the serializer when a request is sampled. Only the outer serializer is
+    wrapped so nested serializers are not counted twice.
+    """
+    collector = _collector.get()
+    if collector is None:
+        return serializer
+    to_representation = serializer.to_representation
+
+    def timed_to_representation(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return to_representation(*args, **kwargs)
+        finally:
+            collector.add_serializer_time(time.perf_counter() - start)
+
+    serializer.to_representation = timed_to_representation
+    return serializer
+
+
+class AdaptiveSampler:
+    """
+    Sample rate per endpoint. Endpoints start fully sampled, every sampled request without duplicate queries
+    and under the slow threshold multiplies the rate by decay down to min_rate, one with a N+1 or over the
+    threshold brings it back to 1. Healthy endpoints cost a fraction of their requests while the ones that
+    fan out keep being recorded.
+    """
+
+    def __init__(self, min_rate: float = None, decay: float = 0.9, duplicate_threshold: int = None,
+                 slow_seconds: float = None):
+        self.min_rate = settings.INSTRUMENTATION_MIN_SAMPLE_RATE if min_rate is None else min_rate
+        self.decay = decay
+        self.duplicate_threshold = duplicate_threshold or settings.INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD
+        self.slow_seconds = slow_seconds or settings.INSTRUMENTATION_SLOW_REQUEST_SECONDS
+        self.rates = {}
+        self.lock = threading.Lock()
+
+    def get_rate(self, endpoint: str, method: str) -> float:
+        return self.rates.get((endpoint, method), 1.0)
+
+    def should_sample(self, endpoint: str, method: str) -> bool:
+        return random.random() < self.get_rate(endpoint, method)
+
+    def is_suspicious(self, collector: QueryCollector, seconds: float) -> bool:
+        return seconds >= self.slow_seconds or any(
+            duplicates >= self.duplicate_threshold for duplicates in collector.get_duplicates().values())
+
+    def update(self, endpoint: str, method: str, collector: QueryCollector, seconds: float) -> float:
+        with self.lock:
+            if self.is_suspicious(collector, seconds):
+                rate = 1.0
+            else:
+                rate = max(self.min_rate, self.get_rate(endpoint, method) * self.decay)
+            self.rates[(endpoint, method)] = rate
+        return rate
+
+
+_sampler = None
+
+
+def get_sampler() -> AdaptiveSampler:
+    global _sampler
+    if _sampler is None:
+        _sampler = AdaptiveSampler()
+    return _sampler
+
+
+class RequestRecord:
+    def __init__(self, endpoint: str, method: str, collector: Optional[QueryCollector]):
+        self.endpoint = endpoint
+        self.method = method
+        self.collector = collector
+        self.status = 'ok'
+
+
+def record_metrics(record: RequestRecord, seconds: float) -> None:
+    labels = {'endpoint': record.endpoint, 'method': record.method}
+    REQUESTS.inc(status=record.status, **labels)
+    REQUEST_DURATION.observe(seconds, **labels)
+    collector = record.collector
+    if collector is None:
+        return
+
+    SAMPLED_REQUESTS.inc(**labels)
+    QUERIES.observe(collector.queries, **labels)
+    SQL_DURATION.observe(collector.sql_seconds, **labels)
+    SERIALIZER_DURATION.observe(collector.serializer_seconds, **labels)
+    duplicates = collector.get_duplicates()
+    DUPLICATE_QUERIES.observe(sum(duplicates.values()), **labels)
+    for signature, count in duplicates.items():
+        DUPLICATE_QUERY_SIGNATURES.inc(count, signature=signature, **labels)
+        QUERY_SIGNATURES.set(1, signature=signature, sql=collector.sql[signature][:500])
+    SAMPLE_RATE.set(get_sampler().update(record.endpoint, record.method, collector, seconds), **labels)
+
+
+def get_collector() -> Optional[QueryCollector]:
+    return _collector.get()
+
+
+@contextlib.contextmanager
+def collect_queries(collector: QueryCollector = None):
+    """
+    Record the queries and serializer time of the block whatever the sampler decides, used by the benchmarks.
+    An existing collector can be passed to go on with it in another context.
+    """
+    collector = collector or QueryCollector()
+    token = _collector.set(collector)
+    try:
+        yield collector
+    finally:
+        _collector.reset(token)
+
+
+@contextlib.contextmanager
+def instrument(endpoint: str, method: str):
+    """
+    Measure the block as a request of the endpoint. Its queries and serializer time are only recorded when the
+    adaptive sampler picks it, the duration and status of every request are.
+    """
+    collector = QueryCollector() if get_sampler().should_sample(endpoint, method) else None
+    record = RequestRecord(endpoint, method, collector)
+    token = _collector.set(collector)
+    start = time.perf_counter()
+    try:
+        yield record
+    except BaseException:
+        record.status = 'error'
+        raise
+    finally:
+        _collector.reset(token)
+        record_metrics(record, time.perf_counter() - start)
+
+
+def get_endpoint(path: str) -> str:
+    try:
+        return resolve(path).view_name or 'unnamed'
+    except Resolver404:
+        return 'unmatched'
+
+
+class QueryInstrumentationMiddleware:
+    """
+    Records the query count, duplicate queries, SQL and serializer time of the requests under
+    INSTRUMENTATION_PATHS, labelled with the name of their url. The metrics are served by common.views.metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.paths = tuple(settings.INSTRUMENTATION_PATHS)
+
+    def __call__(self, request):
+        if not settings.INSTRUMENTATION_ENABLED or not request.path_info.startswith(self.paths):
+            return self.get_response(request)
+
+        with instrument(get_endpoint(request.path_info), request.method) as record:
+            response = self.get_response(request)
+            record.status = response.status_code
+        return response
+
+
+class InstrumentedConsumerMixin:
+    """
+    Records the connection and every received frame of a websocket consumer like a request, the queries its
+    sync_to_async calls make are counted with it.
+    """
+
+    def get_instrumented_endpoint(self) -> str:
+        return f"ws:{type(self).__name__}"
+
+    async def websocket_connect(self, message):
+        if not settings.INSTRUMENTATION_ENABLED:
+            return await super().websocket_connect(message)
+        with instrument(self.get_instrumented_endpoint(), 'CONNECT'):
+            return await super().websocket_connect(message)
+
+    async def websocket_receive(self, message):
+        if not settings.INSTRUMENTATION_ENABLED:
+            return await super().websocket_receive(message)
+        with instrument(self.get_instrumented_endpoint(), 'RECEIVE'):
+            return await super().websocket_receive(message)
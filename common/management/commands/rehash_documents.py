@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, transaction
+
+from ai.models import VectorStoreFile
+from common.models import Document, HASH_DIGEST_SIZE
+
+
+class Command(BaseCommand):
+    help = 'Replace the MD5 hashes of the documents uploaded before BLAKE2b hashing with their BLAKE2b hash.'
+
+    def handle(self, *args, **options):
+        rehashed = 0
+        for document in Document.objects.exclude(document='').iterator():
+            if len(document.hash) == HASH_DIGEST_SIZE * 2:
+                continue
+            try:
+                file_hash = Document.calculate_hash(document.document)
+            except FileNotFoundError:
+                self.stdout.write(self.style.WARNING(f'File of document {document.id} is missing'))
+                continue
+
+            try:
+                with transaction.atomic():
+                    Document.objects.filter(pk=document.pk).update(hash=file_hash)
+                    # Keep the vector store manifest in step so the files are not sent again
+                    VectorStoreFile.objects.filter(file_id=document.file_id, content_hash=document.hash).update(
+                        content_hash=file_hash)
+            except IntegrityError:
+                self.stdout.write(self.style.WARNING(f'Document {document.id} has the same content as another one'))
+                continue
+            rehashed += 1
+        self.stdout.write(self.style.SUCCESS(f'{rehashed} document(s) rehashed'))
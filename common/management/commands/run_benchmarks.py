@@ -0,0 +1,67 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from common.benchmarks import SCALES, BenchmarkSuite, compare_results, load_results, seed_benchmark_data
+
+
+class Command(BaseCommand):
+    help = ('Seed synthetic data of a scale in a throwaway test database, measure the core API endpoints and '
+            'websocket consumers and save the results as JSON. --compare fails on regressions against the results '
+            'of another commit.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=sorted(SCALES), default='small', help='Rows seeded per model')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of the synthetic data')
+        parser.add_argument('--iterations', type=int, default=30, help='Measured runs per scenario')
+        parser.add_argument('--warmup', type=int, default=3, help='Runs per scenario before the measured ones')
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Scenario to measure, can be repeated. All of them by default')
+        parser.add_argument('--output', help='JSON file of the results, benchmark_results/<commit>-<scale>.json '
+                                             'by default')
+        parser.add_argument('--compare', help='JSON file of earlier results to compare with')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Share of p95 latency and peak memory growth reported as a regression')
+
+    def handle(self, *args, **options):
+        previous = load_results(options['compare']) if options['compare'] else None
+
+        setup_test_environment()
+        runner = DiscoverRunner(interactive=False, verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            data = seed_benchmark_data(SCALES[options['scale']], options['seed'])
+            suite = BenchmarkSuite(data, options['iterations'], options['warmup'])
+            results = suite.run(options['scenarios'], report=self.report)
+        except ValueError as e:
+            raise CommandError(str(e))
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+        results['scale'] = options['scale']
+
+        commit = (results['commit'] or 'uncommitted')[:12]
+        output = options['output'] or os.path.join(settings.BASE_DIR, 'benchmark_results',
+                                                   f"{commit}-{options['scale']}.json")
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, 'w') as file:
+            json.dump(results, file, indent=2)
+        self.stdout.write(f"Results saved to {output}")
+
+        if previous is not None:
+            regressions = compare_results(previous, results, options['tolerance'])
+            for regression in regressions:
+                self.stdout.write(self.style.WARNING(regression))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS(f"No regression against {options['compare']}"))
+
+    def report(self, name: str, result: dict):
+        style = self.style.SUCCESS if not result['errors'] else self.style.WARNING
+        self.stdout.write(style(f"{name}: p50 {result['p50_ms']}ms, p95 {result['p95_ms']}ms, "
+                                f"{result['queries']} queries, {result['peak_memory_bytes']} bytes peak, "
+                                f"{result['errors']} error(s)"))
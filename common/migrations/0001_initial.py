@@ -0,0 +1,37 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Document',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('document', models.FileField(upload_to='documents')),
+                ('file_id', models.CharField(blank=True, max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('purpose', models.CharField(blank=True, max_length=255)),
+                ('isolated_vector_store', models.CharField(blank=True, max_length=255)),
+                ('hash', models.CharField(blank=True, max_length=255, unique=True)),
+                ('is_ai_sync', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Photo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('photo', models.ImageField(upload_to='photos')),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,12 +1,33 @@
 import hashlib
+import os
 
 from django.conf import settings
-from django.db import models
+from django.core.files import File
+from django.db import models, transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
-from openai import OpenAI
 
-client = OpenAI(api_key=settings.OPEN_AI_API_KEY)
+from ai.clients import get_openai_client
+
+HASH_DIGEST_SIZE = 32
+
+
+class HashingFile(File):
+    """
+    Wraps the uploaded content so its hash is computed while the storage reads it to write the file.
+    """
+
+    def __init__(self, file, name=None):
+        super().__init__(file, name)
+        self.hasher = hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
+
+    def chunks(self, chunk_size=None):
+        for chunk in super().chunks(chunk_size):
+            self.hasher.update(chunk)
+            yield chunk
+
+    def hexdigest(self) -> str:
+        return self.hasher.hexdigest()
 
 
 # Create your models here.
@@ -21,19 +42,25 @@ class Document(models.Model):
     is_ai_sync = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    # Callers that upload the file themselves right after saving, like the CV ingestion, turn this off
+    upload_in_background = True
+
     def __str__(self):
         return self.user.first_name + " " + self.user.last_name + " - " + self.document.name
 
     def save(self, force_insert=False, force_update=False, using=None, update_fields=None):
 
-        if self.document:  # Check if there is a document to process
-            file_hash = self.calculate_hash(self.document)  # Calculate hash
-            existing_document = Document.objects.filter(hash=file_hash).first()
+        if self.document and (not self.document._committed or not self.hash):  # Check if there is new content
+            file_hash = self.store_document()  # Write the file and calculate its hash in the same pass
+            existing_document = Document.objects.filter(hash=file_hash).exclude(pk=self.pk).first()
             if existing_document:
                 # If an existing document is found, point the current instance to it
+                if self.document.name != existing_document.document.name:
+                    self.document.delete(save=False)  # Drop the copy that was just written
                 self.id = existing_document.id  # Set the current object's ID to the existing one
                 self.document = existing_document.document  # Re-use the existing document file
                 self.file_id = existing_document.file_id  # Re-use the existing file_id
+                self.hash = file_hash
                 if update_fields:
                     # Only update fields that are explicitly listed
                     super().save(force_insert, force_update, using, update_fields)
@@ -41,16 +68,37 @@ class Document(models.Model):
             else:
                 self.hash = file_hash  # Set the new hash if no document is found
 
-        if self.is_ai_sync and not self.file_id:
-            # Upload file and set file_id only if it's a new file and no existing document was found
-            uploaded_file = client.files.create(
-                file=(self.document.file.name, self.document.file.open('rb').read()), purpose="assistants"
-            )
-            self.file_id = uploaded_file.id
-
-            # Proceed with saving as a new document
+        # The file is uploaded to OpenAI in the background once the row is committed, see schedule_upload
         super().save(force_insert, force_update, using, update_fields)
 
+    def store_document(self) -> str:
+        """
+        Write new content to the storage and return its hash, the content is read only once.
+        """
+        if self.document._committed:
+            # Already in the storage, e.g. saved through FieldFile.save
+            return self.calculate_hash(self.document)
+        content = self.document.file
+        if hasattr(content, 'temporary_file_path'):
+            # Large uploads are moved into the storage instead of copied, hashing is their only read
+            file_hash = self.calculate_hash(content)
+            self.document.save(self.document.name, content, save=False)
+            return file_hash
+        content = HashingFile(content, self.document.name)
+        self.document.save(self.document.name, content, save=False)
+        return content.hexdigest()
+
+    def upload_to_ai(self) -> str:
+        """
+        Upload the stored file to the OpenAI file API, streamed from the storage, and record its file_id.
+        """
+        with self.document.open('rb') as file:
+            uploaded_file = get_openai_client().files.create(file=(os.path.basename(self.document.name), file),
+                                                             purpose="assistants")
+        self.file_id = uploaded_file.id
+        self.save(update_fields=['file_id'])
+        return self.file_id
+
     def convert_to_ai_readable(self):
         return f"""
         representetive file_id in vectore store is : {self.file_id}, user document description is : {self.description}
@@ -59,23 +107,21 @@ class Document(models.Model):
     @staticmethod
     def calculate_hash(file_field):
         """
-        Calculate MD5 hash of a file.
+        Calculate the BLAKE2b hash of a file.
         """
-        md5_hash = hashlib.md5()
+        blake2_hash = hashlib.blake2b(digest_size=HASH_DIGEST_SIZE)
         for chunk in file_field.chunks():
-            md5_hash.update(chunk)
-        return md5_hash.hexdigest()
+            blake2_hash.update(chunk)
+        return blake2_hash.hexdigest()
 
 
 @receiver(post_save, sender=Document)
-def set_file_id(sender, instance, **kwargs):
+def schedule_upload(sender, instance, **kwargs):
     if settings.IS_TEST:
         return  # Skip signal handling during tests
-    if not instance.file_id and instance.document:
-        uploaded_file = client.files.create(
-            file=(instance.document.file.name, instance.document.file.open('rb').read()), purpose="assistants"
-        )
-        instance.file_id = uploaded_file.id
+    if not instance.file_id and instance.document and instance.upload_in_background:
+        from .tasks import upload_document
+        transaction.on_commit(lambda: upload_document.delay(instance.pk))
 
 
 class Photo(models.Model):
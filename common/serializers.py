@@ -1,8 +1,77 @@
+from django.db.models import QuerySet
 from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField
+from taggit.serializers import TagListSerializerField
 
 from .models import Document, Photo
 
 
+def get_eager_loading_plan(serializer, prefix: str = '', many: bool = False) -> (set, set):
+    """
+    Walk the serializer graph and collect the select_related/prefetch_related lookups it needs.
+    Nested serializers are followed, relations below a to-many relation can only be prefetched.
+    Serializers can declare extra lookups used by method fields with EagerLoadingMixin.
+    """
+    select_related, prefetch_related = set(), set()
+
+    def lookup(name):
+        return f"{prefix}__{name}" if prefix else name
+
+    for name in getattr(serializer, 'select_related_fields', ()):
+        (prefetch_related if many else select_related).add(lookup(name))
+    for name in getattr(serializer, 'prefetch_related_fields', ()):
+        prefetch_related.add(lookup(name))
+    for name, serializer_class in getattr(serializer, 'method_field_serializers', {}).items():
+        (prefetch_related if many else select_related).add(lookup(name))
+        nested = get_eager_loading_plan(serializer_class(), lookup(name), many)
+        select_related |= nested[0]
+        prefetch_related |= nested[1]
+
+    for field in serializer.fields.values():
+        if field.write_only or field.source == '*':
+            continue
+        path = lookup(field.source.replace('.', '__'))
+        if isinstance(field, serializers.ListSerializer):
+            prefetch_related.add(path)
+            nested = get_eager_loading_plan(field.child, path, many=True)
+        elif isinstance(field, serializers.BaseSerializer):
+            (prefetch_related if many else select_related).add(path)
+            nested = get_eager_loading_plan(field, path, many)
+        elif isinstance(field, (ManyRelatedField, TagListSerializerField)):
+            prefetch_related.add(path)
+            continue
+        else:
+            continue
+        select_related |= nested[0]
+        prefetch_related |= nested[1]
+
+    return select_related, prefetch_related - select_related
+
+
+def setup_eager_loading(queryset: QuerySet, serializer_class) -> QuerySet:
+    select_related, prefetch_related = get_eager_loading_plan(serializer_class())
+    if select_related:
+        queryset = queryset.select_related(*sorted(select_related))
+    if prefetch_related:
+        queryset = queryset.prefetch_related(*sorted(prefetch_related))
+    return queryset
+
+
+class EagerLoadingMixin:
+    """
+    Declares the relations a serializer reads outside of its declared fields, e.g. in method fields.
+    method_field_serializers maps a to-one relation to the serializer class a method field renders it with.
+    Nested serializers and relational fields are discovered by get_eager_loading_plan.
+    """
+    select_related_fields = ()
+    prefetch_related_fields = ()
+    method_field_serializers = {}
+
+    @classmethod
+    def setup_eager_loading(cls, queryset: QuerySet) -> QuerySet:
+        return setup_eager_loading(queryset, cls)
+
+
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
@@ -12,4 +81,4 @@ class DocumentSerializer(serializers.ModelSerializer):
 class PhotoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Photo
-        fields = "__all__"
\ No newline at end of file
+        fields = "__all__"
@@ -0,0 +1,11 @@
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .instrumentation import record_query
+
+
+@receiver(connection_created)
+def install_query_instrumentation(sender, connection, **kwargs):
+    # The wrappers are kept when the connection reconnects
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
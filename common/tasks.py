@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from .models import Document
+
+
+@shared_task
+def upload_document(document_id):
+    document = Document.objects.filter(pk=document_id).first()
+    if document is None or document.file_id or not document.document:
+        return
+    file_id = document.upload_to_ai()
+    print(f"Uploaded document {document_id} as {file_id}")
@@ -1,3 +1,251 @@
-from django.test import TestCase
+import hashlib
+import json
+import shutil
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ai.testing import FakeOpenAIServer
+from djangoProject.middlewares import JWTAuthMiddleware
+from user.services import UserCache
+from . import instrumentation
+from .benchmarks import BenchmarkSuite, compare_results, seed_benchmark_data
+from .instrumentation import AdaptiveSampler, QueryCollector, instrument, render_metrics
+from .models import Document
+from .tasks import upload_document
+
+User = get_user_model()
+
+
+class DocumentUploadTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.user = User.objects.create_user(email='docs@example.com', password='pass')
+
+    def create_document(self, name: str, content: bytes) -> Document:
+        return Document.objects.create(user=self.user, document=SimpleUploadedFile(name, content))
+
+    def test_content_is_hashed_while_stored_and_deduplicated(self):
+        """
+        Test Scenario: A file is uploaded twice under different names.
+
+        This test ensures that the stored file gets the BLAKE2b hash of its content and that the second upload
+        reuses the first document and does not leave its copy in the storage.
+        """
+        content = b'curriculum vitae ' * 1000
+        document = self.create_document('cv.pdf', content)
+        self.assertEqual(document.hash, hashlib.blake2b(content, digest_size=32).hexdigest())
+        with document.document.open('rb') as file:
+            self.assertEqual(file.read(), content)
+
+        duplicate = Document(user=self.user, document=SimpleUploadedFile('copy.pdf', content))
+        duplicate.save()
+        self.assertEqual(duplicate.id, document.id)
+        self.assertEqual(Document.objects.count(), 1)
+        storage = document.document.storage
+        self.assertEqual(storage.listdir('documents')[1], [document.document.name.split('/')[-1]])
+
+    def test_upload_task_streams_the_stored_file(self):
+        """
+        Test Scenario: The background upload of a stored document runs.
+
+        This test ensures that the stored content is sent to the file API and that the file_id is saved.
+        """
+        server = FakeOpenAIServer.start_for(self)
+        document = self.create_document('cv.txt', b'stored content')
+        upload_document(document.id)
+
+        document.refresh_from_db()
+        self.assertEqual(server.requests, [('POST', '/files')])
+        self.assertIn(b'stored content', server.bodies[0])
+        self.assertTrue(document.file_id)
+
+
+class QueryInstrumentationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        for metric in instrumentation.METRICS:
+            metric.clear()
+        sampler_patch = mock.patch.object(instrumentation, '_sampler', AdaptiveSampler(min_rate=0.05))
+        self.sampler = sampler_patch.start()
+        self.addCleanup(sampler_patch.stop)
+        self.user = User.objects.create_user(email='metrics@example.com', password='pass', is_staff=True)
+
+    def test_repeated_queries_are_reported_with_their_signature(self):
+        """
+        Test Scenario: A sampled block runs the same query for several users, like a N+1 does.
+
+        This test ensures that the queries, their duplicates and the SQL of the duplicated signature are in the
+        metrics and that the endpoint stays fully sampled.
+        """
+        users = [User.objects.create_user(email=f'user{index}@example.com', password='pass') for index in range(4)]
+        with instrument('user-list', 'GET'):
+            for user in users:
+                User.objects.filter(pk=user.pk).exists()
+
+        metrics = render_metrics()
+        labels = 'endpoint="user-list",method="GET"'
+        self.assertIn(f'talent_buzz_request_queries_sum{{{labels}}} 4', metrics)
+        self.assertIn(f'talent_buzz_request_duplicate_queries_sum{{{labels}}} 3', metrics)
+        signature_info = next(line for line in metrics.splitlines()
+                              if line.startswith('talent_buzz_query_signature_info{'))
+        self.assertIn('user_user', signature_info)
+        self.assertEqual(self.sampler.get_rate('user-list', 'GET'), 1.0)
+
+    def test_honeycomb_requests_are_measured_by_the_middleware(self):
+        """
+        Test Scenario: An authenticated user lists the hives.
+
+        This test ensures that the request is counted under the name of its url with its status, its queries
+        and the time of its serializer, and that the metrics endpoint serves them to staff users.
+        """
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.get('/honeycomb/hives/').status_code, 200)
+
+        client.force_login(self.user)
+        response = client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        metrics = response.content.decode()
+        labels = 'endpoint="hive-list",method="GET"'
+        self.assertIn(f'talent_buzz_requests_total{{{labels},status="200"}} 1', metrics)
+        self.assertIn(f'talent_buzz_request_queries_count{{{labels}}} 1', metrics)
+        self.assertIn(f'talent_buzz_request_serializer_seconds_count{{{labels}}} 1', metrics)
+
+        with override_settings(METRICS_AUTH_TOKEN='scraper'):
+            self.assertEqual(APIClient().get('/metrics').status_code, 403)
+            self.assertEqual(APIClient().get('/metrics', HTTP_AUTHORIZATION='Bearer scraper').status_code, 200)
+
+    def test_sample_rate_adapts_to_the_health_of_the_endpoint(self):
+        """
+        Test Scenario: An endpoint answers healthy requests for a while, then one with a N+1.
+
+        This test ensures that the sample rate of the endpoint decays down to the minimum rate and that the
+        N+1 brings it back to recording every request.
+        """
+        for _ in range(100):
+            self.sampler.update('hive-list', 'GET', QueryCollector(), 0.01)
+        self.assertEqual(self.sampler.get_rate('hive-list', 'GET'), 0.05)
+
+        collector = QueryCollector()
+        for _ in range(4):
+            collector.add_query('SELECT * FROM honeycomb_bee WHERE id = %s', 0.001)
+        self.assertEqual(self.sampler.update('hive-list', 'GET', collector, 0.01), 1.0)
+        self.assertEqual(self.sampler.get_rate('bee-list', 'GET'), 1.0)
+
+
+class BenchmarkSuiteTests(TestCase):
+
+    def test_scenarios_are_measured_on_seeded_data(self):
+        """
+        Test Scenario: A tiny scale is seeded and a list endpoint, the conversation replay and an assistant
+        message are benchmarked.
+
+        This test ensures that the seeded user can use every scenario without errors, that the queries of the
+        consumers are counted and that the results are JSON with what they were measured on.
+        """
+        counts = {'hives': 2, 'bees': 4, 'nectars': 2, 'contracts': 3, 'messages': 6, 'notifications': 4, 'tasks': 2}
+        data = seed_benchmark_data(counts, seed=1)
+        suite = BenchmarkSuite(data, iterations=2, warmup=1)
+        results = suite.run(['hives_list', 'ws_conversation_replay', 'ws_assistant_message'])
+
+        json.dumps(results)
+        self.assertEqual(results['counts'], counts)
+        self.assertEqual(set(results['scenarios']), {'hives_list', 'ws_conversation_replay', 'ws_assistant_message'})
+        for result in results['scenarios'].values():
+            self.assertEqual(result['errors'], 0)
+            self.assertGreater(result['queries'], 0)
+            self.assertLessEqual(result['p50_ms'], result['p95_ms'])
+            self.assertGreater(result['peak_memory_bytes'], 0)
+
+    def test_regressions_are_found_between_results(self):
+        """
+        Test Scenario: The results of a commit are compared with the ones of the previous commit.
+
+        This test ensures that more queries and a p95 above the tolerance are reported and that small latency
+        changes and new scenarios are not.
+        """
+        def result(queries, p95_ms):
+            return {'queries': queries, 'p95_ms': p95_ms, 'peak_memory_bytes': 1000}
+
+        previous = {'scenarios': {'hives_list': result(5, 10.0), 'bees_list': result(4, 10.0)}}
+        current = {'scenarios': {'hives_list': result(6, 10.5), 'bees_list': result(4, 13.0),
+                                 'tasks_list': result(100, 100.0)}}
+        self.assertEqual(compare_results(previous, current, tolerance=0.2),
+                         ['hives_list: 5 -> 6 queries', 'bees_list: 10.0 -> 13.0 ms p95'])
+
+
+class JWTAuthMiddlewareTests(TransactionTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email="socket@example.com", password="password123", first_name="Ada")
+
+        async def app(scope, receive, send):
+            self.scope_user = scope['user']
+
+        self.middleware = JWTAuthMiddleware(app)
+
+    def connect(self, token: str):
+        scope = {'type': 'websocket', 'query_string': f'token={token}'.encode()}
+        async_to_sync(self.middleware)(scope, None, None)
+        return self.scope_user
+
+    def test_only_the_authentication_state_is_cached(self):
+        """
+        Test Scenario: A user opens several sockets with their token, their row is changed behind the
+        cache and later they are deactivated.
+
+        This test ensures that only the authentication state of the user is cached, without the password hash,
+        that the sockets get the current user, that saving the user drops the cached state and that an inactive
+        user or an invalid token is anonymous.
+        """
+        token = str(AccessToken.for_user(self.user))
+        self.assertEqual(self.connect(token), self.user)
+        state = UserCache.get(self.user.id)
+        self.assertEqual(set(state), {'id', 'is_active', 'revoke_marker'})
+        self.assertNotIn(self.user.password, state.values())
+
+        User.objects.filter(pk=self.user.pk).update(first_name="Changed")
+        self.assertEqual(self.connect(token).first_name, "Changed")
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertIsNone(UserCache.get(self.user.id))
+        self.assertFalse(self.connect(token).is_authenticated)
+        self.assertFalse(self.connect('invalid').is_authenticated)
+
+    def test_tokens_issued_before_a_password_change_are_revoked(self):
+        """
+        Test Scenario: A user changes their password, opens a socket with a new token and then
+        one with a token issued before the change.
+
+        This test ensures that the change drops the cached user and that the old token is rejected even though
+        the user is now read from the cache.
+        """
+        with mock.patch.object(jwt_settings, 'CHECK_REVOKE_TOKEN', True):
+            old_token = str(AccessToken.for_user(self.user))
+            self.assertEqual(self.connect(old_token), self.user)
+
+            self.user.set_password("changed123")
+            self.user.save()
+            self.assertIsNone(UserCache.get(self.user.id))
+
+            self.assertEqual(self.connect(str(AccessToken.for_user(self.user))), self.user)
+            self.assertIsNotNone(UserCache.get(self.user.id))
+            self.assertFalse(self.connect(old_token).is_authenticated)
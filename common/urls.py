@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import download_document, download_avatar
+from .views import download_document, download_avatar, metrics
 
 urlpatterns = [
     path('download/<int:document_id>', download_document, name='download_document'),
     path('avatars/<str:file_name>', download_avatar, name='download_avatar'),
+    path('metrics', metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -1,5 +1,70 @@
-from django.http import FileResponse
+import hmac
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden
+
+from .db_routers import start_replica_reads, stop_replica_reads
+from .instrumentation import render_metrics, time_serializer
 from .models import Document
+from .serializers import setup_eager_loading
+
+
+class EagerLoadingViewSetMixin:
+    """
+    Applies the select_related/prefetch_related plan of the serializer class to the viewset queryset.
+    """
+    eager_loading_actions = ('list', 'retrieve')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.eager_loading_actions:
+            queryset = setup_eager_loading(queryset, self.get_serializer_class())
+        return queryset
+
+
+class ReplicaReadViewSetMixin:
+    """
+    Runs the read only actions on the replica database through ReplicaRouter. The replica can lag behind,
+    actions that read what the request wrote have to stay out of replica_actions.
+    """
+    replica_actions = ('list', 'retrieve')
+    replica_reads_token = None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if self.action in self.replica_actions:
+            self.replica_reads_token = start_replica_reads()
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self.replica_reads_token is not None:
+            stop_replica_reads(self.replica_reads_token)
+            self.replica_reads_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class InstrumentedViewSetMixin:
+    """
+    Adds the time the serializers of the viewset take to the metrics of sampled requests, see
+    common.instrumentation.QueryInstrumentationMiddleware.
+    """
+
+    def get_serializer(self, *args, **kwargs):
+        return time_serializer(super().get_serializer(*args, **kwargs))
+
+
+def metrics(request):
+    """
+    Metrics of the process in the Prometheus text format. Scrapers send METRICS_AUTH_TOKEN as a bearer token,
+    without one configured only staff users can read them.
+    """
+    authorization = request.headers.get('Authorization', '')
+    if settings.METRICS_AUTH_TOKEN:
+        allowed = hmac.compare_digest(authorization, f"Bearer {settings.METRICS_AUTH_TOKEN}")
+    else:
+        allowed = request.user.is_authenticated and request.user.is_staff
+    if not allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 
 def download_document(request, document_id):
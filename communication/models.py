@@ -30,6 +30,12 @@ class Message(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     change_history = HistoricalRecords()
 
+    class Meta:
+        indexes = [
+            # Keyset pagination of the conversation history
+            models.Index(fields=['conversation', 'timestamp', 'id']),
+        ]
+
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         WebSocketHelper.send_message_to_conversation(self)
@@ -50,6 +56,11 @@ class Notification(models.Model):
     timestamp = models.DateTimeField(auto_now_add=True)
     change_history = HistoricalRecords()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp']),
+        ]
+
     def read_notification(self):
         self.read = True
         self.save()
@@ -0,0 +1,76 @@
+import base64
+from datetime import datetime
+
+from django.db.models import Q, QuerySet
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+INVALID_CURSOR = "Invalid cursor"
+
+
+def encode_cursor(message: 'Message') -> str:
+    position = f"{message.timestamp.isoformat()}|{message.id}"
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> (datetime, int):
+    try:
+        timestamp, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValidationError({"cursor": INVALID_CURSOR})
+
+
+def messages_before(queryset: QuerySet, cursor: str) -> QuerySet:
+    """Messages older than the cursor, newest first. Served by the (conversation, timestamp, id) index."""
+    timestamp, message_id = decode_cursor(cursor)
+    return queryset.filter(
+        Q(timestamp__lt=timestamp) | Q(timestamp=timestamp, id__lt=message_id)
+    ).order_by('-timestamp', '-id')
+
+
+def messages_after(queryset: QuerySet, cursor: str) -> QuerySet:
+    """Messages newer than the cursor, oldest first. Served by the (conversation, timestamp, id) index."""
+    timestamp, message_id = decode_cursor(cursor)
+    return queryset.filter(
+        Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, id__gt=message_id)
+    ).order_by('timestamp', 'id')
+
+
+class MessageKeysetPagination(BasePagination):
+    """
+    Pages through messages from the newest to the oldest one, "next" is the cursor of the following older page.
+    """
+    page_size = 50
+    max_page_size = 200
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request) -> int:
+        try:
+            page_size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            return self.page_size
+        return min(max(page_size, 1), self.max_page_size)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        cursor = request.query_params.get(self.cursor_query_param)
+        queryset = messages_before(queryset, cursor) if cursor else queryset.order_by('-timestamp', '-id')
+
+        page = list(queryset[:page_size + 1])
+        self.next_cursor = encode_cursor(page[page_size - 1]) if len(page) > page_size else None
+        return page[:page_size]
+
+    def get_paginated_response(self, data):
+        return Response({'next': self.next_cursor, 'results': data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
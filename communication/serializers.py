@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from .models import Conversation, Message, Notification
+from .pagination import MessageKeysetPagination, encode_cursor
 
 
 class MessageSerializer(serializers.ModelSerializer):
@@ -16,12 +17,34 @@ class ConversationListSerializer(serializers.ModelSerializer):
 
 
 class ConversationDetailSerializer(serializers.ModelSerializer):
-    messages = MessageSerializer(many=True, read_only=True)
+    """
+    Embeds only the latest page of messages, older ones are fetched from the messages endpoint
+    with messages_cursor.
+    """
+    messages = serializers.SerializerMethodField()
+    messages_cursor = serializers.SerializerMethodField()
 
     class Meta:
         model = Conversation
         fields = "__all__"
 
+    @staticmethod
+    def get_latest_messages(obj) -> [Message]:
+        if not hasattr(obj, '_latest_messages'):
+            page_size = MessageKeysetPagination.page_size
+            obj._latest_messages = list(obj.messages.order_by('-timestamp', '-id')[:page_size + 1])
+        return obj._latest_messages
+
+    def get_messages(self, obj):
+        latest_messages = self.get_latest_messages(obj)[:MessageKeysetPagination.page_size]
+        return MessageSerializer(reversed(latest_messages), many=True, context=self.context).data
+
+    def get_messages_cursor(self, obj):
+        latest_messages = self.get_latest_messages(obj)
+        if len(latest_messages) > MessageKeysetPagination.page_size:
+            return encode_cursor(latest_messages[MessageKeysetPagination.page_size - 1])
+        return None
+
 
 class NotificationSerializer(serializers.ModelSerializer):
     class Meta:
@@ -1,8 +1,21 @@
 
+from django.db import transaction
+from django.db.models import Q
 
 
 class NotificationService:
 
+    @staticmethod
+    def notify_users(user_ids, message: str, notification_type: str = 'info'):
+        """
+        Create the same notification for many users from a celery task once the current transaction commits.
+        Notifications are bulk inserted, deduplicated and pushed to the websocket in batches.
+        """
+        from communication.tasks import fan_out_notifications
+        user_ids = list(set(user_ids))
+        if user_ids:
+            transaction.on_commit(lambda: fan_out_notifications.delay(user_ids, message, notification_type))
+
     @staticmethod
     def get_unread_notifications_AI_readable(user):
         from communication.models import Notification
@@ -16,3 +29,28 @@ class ConversationService:
         from communication.models import Conversation
         return [conversation.convert_to_ai_readable() for conversation in Conversation.objects.filter(participants=user)]
 
+    @staticmethod
+    def get_accessible_conversations(user):
+        from communication.models import Conversation
+        return Conversation.objects.filter(Q(participants=user) | Q(hive__is_public=True))
+
+
+class MessageService:
+
+    @staticmethod
+    def get_accessible_messages(user):
+        from communication.models import Message
+        # A subquery on the conversation ids avoids joining every message with the participants
+        conversation_ids = ConversationService.get_accessible_conversations(user).values('id')
+        return Message.objects.filter(conversation_id__in=conversation_ids)
+
+    @staticmethod
+    def get_messages_since(user, conversation_id: int, cursor: str = None, limit: int = 200) -> ['Message']:
+        """
+        Return up to limit + 1 messages of the conversation newer than the cursor, oldest first.
+        The extra message tells the caller whether more messages are waiting.
+        """
+        from communication.pagination import messages_after
+        messages = MessageService.get_accessible_messages(user).filter(conversation_id=conversation_id)
+        messages = messages_after(messages, cursor) if cursor else messages.order_by('timestamp', 'id')
+        return list(messages.select_related('document')[:limit + 1])
@@ -0,0 +1,25 @@
+from celery import shared_task
+from django.conf import settings
+from django.utils import timezone
+from simple_history.utils import bulk_create_with_history
+
+from communication.models import Notification
+from communication.websocket_helper import WebSocketHelper
+
+
+@shared_task
+def fan_out_notifications(user_ids, message, notification_type='info'):
+    # Skip users that already received the same notification within the deduplication window
+    window_start = timezone.now() - settings.NOTIFICATION_DEDUPLICATION_WINDOW
+    duplicated_user_ids = set(Notification.objects.filter(
+        user_id__in=user_ids, message=message, notification_type=notification_type, timestamp__gte=window_start
+    ).values_list('user_id', flat=True))
+
+    notifications = bulk_create_with_history([
+        Notification(user_id=user_id, message=message, notification_type=notification_type)
+        for user_id in sorted(set(user_ids) - duplicated_user_ids)
+    ], Notification, batch_size=settings.NOTIFICATION_BATCH_SIZE)
+
+    for start in range(0, len(notifications), settings.NOTIFICATION_BATCH_SIZE):
+        WebSocketHelper.send_notifications(notifications[start:start + settings.NOTIFICATION_BATCH_SIZE])
+    return len(notifications)
@@ -0,0 +1,142 @@
+import json
+
+import msgpack
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from djangoProject.consumers import ConversationConsumer, NotificationConsumer
+from .models import Conversation, Message, Notification
+from .pagination import encode_cursor
+from .websocket_helper import WebSocketHelper
+
+User = get_user_model()
+
+
+@override_settings(CHANNEL_LAYERS={'default': {'BACKEND': 'channels.layers.InMemoryChannelLayer'}})
+class WebSocketHelperTests(TestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create_user(email=f'listener{i}@example.com', password='pass') for i in range(3)]
+
+    def test_batch_reaches_every_group(self):
+        """
+        Test Scenario: Notifications of three users are sent as one batch.
+
+        This test ensures that every notification group receives its own event.
+        """
+        notifications = [Notification(user=user, message=f'Hello {user.id}') for user in self.users]
+
+        async def deliver():
+            channel_layer = get_channel_layer()
+            channels = []
+            for user in self.users:
+                channels.append(await channel_layer.new_channel())
+                await channel_layer.group_add(f'user_notification_{user.id}', channels[-1])
+            await sync_to_async(WebSocketHelper.send_notifications)(notifications)
+            return [await channel_layer.receive(channel) for channel in channels]
+
+        received = async_to_sync(deliver)()
+
+        self.assertEqual(received, [{'type': 'send_notification', 'message': {'message': f'Hello {user.id}'}}
+                                    for user in self.users])
+
+    def test_msgpack_clients_receive_binary_frames(self):
+        """
+        Test Scenario: The same user listens to notifications from a JSON client and from a client
+        connected with ?encoding=msgpack.
+
+        This test ensures that the msgpack client receives a binary frame that decodes to the event
+        the JSON client receives as text.
+        """
+        user = self.users[0]
+
+        async def listen():
+            json_client = WebsocketCommunicator(NotificationConsumer.as_asgi(), '/ws/notification/')
+            msgpack_client = WebsocketCommunicator(NotificationConsumer.as_asgi(),
+                                                   '/ws/notification/?encoding=msgpack')
+            for communicator in (json_client, msgpack_client):
+                communicator.scope['user'] = user
+                self.assertTrue((await communicator.connect())[0])
+            await sync_to_async(WebSocketHelper.send_notification)(user, 'Your contract was accepted')
+            outputs = [await json_client.receive_output(timeout=5), await msgpack_client.receive_output(timeout=5)]
+            for communicator in (json_client, msgpack_client):
+                await communicator.disconnect()
+            return outputs
+
+        json_output, msgpack_output = async_to_sync(listen)()
+
+        self.assertIsNone(msgpack_output.get('text'))
+        event = msgpack.unpackb(msgpack_output['bytes'], raw=False)
+        self.assertEqual(event, {'type': 'send_notification', 'message': {'message': 'Your contract was accepted'}})
+        json_event = json.loads(json_output['text'])
+        self.assertEqual({**json_event, 'message': json.loads(json_event['message'])}, event)
+
+
+class ConversationHistoryTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(email='talker@example.com', password='pass')
+        self.conversation = Conversation.objects.create(tag='history')
+        self.conversation.participants.add(self.user)
+        self.messages = [Message.objects.create(conversation=self.conversation, sender=self.user, content=f'm{i}')
+                         for i in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def test_messages_are_paginated_by_cursor(self):
+        """
+        Test Scenario: A participant walks the message history two messages at a time and then asks
+        for the messages sent after the last one seen.
+
+        This test ensures that the pages are newest first without gaps or duplicates and that the
+        since endpoint only returns the newer messages.
+        """
+        seen = []
+        url = '/comunication/messages/?page_size=2'
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(message['content'] for message in response.data['results'])
+            url = response.data['next'] and f"/comunication/messages/?page_size=2&cursor={response.data['next']}"
+        self.assertEqual(seen, ['m4', 'm3', 'm2', 'm1', 'm0'])
+
+        first_page = self.client.get('/comunication/messages/?page_size=3').data
+        oldest_seen = first_page['results'][-1]
+        self.assertEqual(oldest_seen['content'], 'm2')
+        since = self.client.get('/comunication/messages/since/',
+                                {'conversation': self.conversation.id, 'page_size': 1,
+                                 'cursor': first_page['next']}).data
+        self.assertEqual([message['content'] for message in since['results']], ['m3'])
+        self.assertTrue(since['has_more'])
+
+        response = self.client.get('/comunication/messages/', {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reconnecting_socket_replays_missed_messages(self):
+        """
+        Test Scenario: A participant reconnects to the conversation socket with the cursor of the
+        last message it received.
+
+        This test ensures that the messages sent after the cursor are replayed oldest first before the live ones.
+        """
+        cursor = encode_cursor(self.messages[2])
+
+        async def reconnect():
+            communicator = WebsocketCommunicator(ConversationConsumer.as_asgi(),
+                                                 f'/ws/conversation/{self.conversation.id}/?cursor={cursor}')
+            communicator.scope['user'] = self.user
+            communicator.scope['url_route'] = {'kwargs': {'conversation_id': str(self.conversation.id)}}
+            self.assertTrue((await communicator.connect())[0])
+            outputs = [await communicator.receive_json_from(timeout=5) for _ in range(2)]
+            self.assertTrue(await communicator.receive_nothing())
+            await communicator.disconnect()
+            return outputs
+
+        outputs = async_to_sync(reconnect)()
+
+        self.assertEqual([json.loads(output['message'])['message'] for output in outputs], ['m3', 'm4'])
+
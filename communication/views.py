@@ -1,19 +1,23 @@
 from django.core.exceptions import PermissionDenied
 from django.db.models import Q
 from rest_framework import viewsets, permissions
+from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from common.views import InstrumentedViewSetMixin
 from .filters import MessageFilter, ConversationFilter, NotificationFilter
 
 from .models import Conversation, Message, Notification
+from .pagination import MessageKeysetPagination, encode_cursor
 from .permissions import IsParticipantOrPublicHive, IsMessageSenderOrParticipant, IsOwner
+from .services import MessageService
 from .serializers import MessageSerializer, ConversationListSerializer, \
     ConversationDetailSerializer, NotificationSerializer
 
 
-class ConversationViewSet(viewsets.ModelViewSet):
+class ConversationViewSet(InstrumentedViewSetMixin, viewsets.ModelViewSet):
     queryset = Conversation.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsParticipantOrPublicHive]
     filter_backends = [DjangoFilterBackend]
@@ -35,17 +39,37 @@ class ConversationViewSet(viewsets.ModelViewSet):
         conversation.save()
 
 
-class MessageViewSet(viewsets.ModelViewSet):
+class MessageViewSet(InstrumentedViewSetMixin, viewsets.ModelViewSet):
     queryset = Message.objects.all()
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated, IsMessageSenderOrParticipant]
     filter_backends = [DjangoFilterBackend]
     filterset_class = MessageFilter
 
+    pagination_class = MessageKeysetPagination
+
     def get_queryset(self):
-        return Message.objects.filter(
-            Q(conversation__participants=self.request.user) | Q(conversation__hive__is_public=True)
-        ).distinct()
+        return MessageService.get_accessible_messages(self.request.user)
+
+    @action(detail=False, methods=['get'], url_path='since')
+    def since(self, request):
+        """
+        Messages of a conversation newer than the cursor, oldest first. Used to resume after a reconnect.
+        """
+        conversation_id = request.query_params.get('conversation')
+        if not conversation_id or not conversation_id.isdigit():
+            raise ValidationError({"conversation": "This query parameter is required."})
+        cursor = request.query_params.get('cursor')
+        page_size = self.paginator.get_page_size(request)
+
+        messages = MessageService.get_messages_since(request.user, int(conversation_id), cursor, page_size)
+        has_more = len(messages) > page_size
+        messages = messages[:page_size]
+        return Response({
+            'cursor': encode_cursor(messages[-1]) if messages else cursor,
+            'has_more': has_more,
+            'results': self.get_serializer(messages, many=True).data,
+        })
 
     def perform_create(self, serializer):
         conversation = serializer.validated_data['conversation']
@@ -58,7 +82,7 @@ class RaiseValidationError:
     pass
 
 
-class NotificationViewSet(viewsets.ModelViewSet):
+class NotificationViewSet(InstrumentedViewSetMixin, viewsets.ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated, IsOwner]
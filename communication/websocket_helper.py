@@ -1,4 +1,4 @@
-import json
+import asyncio
 
 from asgiref.sync import async_to_sync
 from channels.layers import get_channel_layer
@@ -10,62 +10,76 @@ User = get_user_model()
 
 
 class WebSocketHelper:
+    """
+    Payloads are sent as plain dicts, the redis channel layer ships them msgpack encoded and the
+    consumers encode them once for the client instead of the producer re-serializing them to JSON strings.
+    """
 
     @staticmethod
-    def send_page_to_user(user: User, page: str, data: dict):
-        group_name = f"user_{user.id}"
+    def send_batch(messages: [(str, dict)]):
+        """
+        Deliver many (group name, event) pairs to the channel layer from a single event loop turn.
 
-        # Get the channel layer
+        :param messages: pairs of group name and channel layer event, the event needs a "type" key
+        """
+        if not messages:
+            return
         channel_layer = get_channel_layer()
-        json_request = {
-            "page": page,
-            "data": data,
-        }
 
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                "type": "send_component",
-                "message": json.dumps(json_request),
-            }
-        )
+        async def send_all():
+            await asyncio.gather(*[channel_layer.group_send(group_name, event) for group_name, event in messages])
 
-    @staticmethod
-    def send_notification(user: User, message: str):
-        group_name = f"user_notification_{user.id}"
+        async_to_sync(send_all)()
 
-        # Get the channel layer
-        channel_layer = get_channel_layer()
-        json_request = {
-            "message": message,
+    @staticmethod
+    def page_event(user: User, page: str, data: dict) -> (str, dict):
+        return f"user_{user.id}", {
+            "type": "send_component",
+            "message": {
+                "page": page,
+                "data": data,
+            },
         }
 
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                "type": "send_notification",
-                "message": json.dumps(json_request),
-            }
-        )
+    @staticmethod
+    def notification_event(user_id: int, message: str) -> (str, dict):
+        return f"user_notification_{user_id}", {
+            "type": "send_notification",
+            "message": {
+                "message": message,
+            },
+        }
 
     @staticmethod
-    def send_message_to_conversation(message: 'Message'):
-        from communication.models import Message
-        group_name = f"chat_{message.conversation.id}"
-        data = {
-            "message": message.content,
-            "sender": message.sender.id,
-            "timestamp": message.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            "document": message.document.document.path if message.document else None,
+    def conversation_message_event(message: 'Message') -> (str, dict):
+        from communication.pagination import encode_cursor
+        return f"chat_{message.conversation_id}", {
+            "type": "send_message",
+            "message": {
+                "id": message.id,
+                "cursor": encode_cursor(message),
+                "message": message.content,
+                "sender": message.sender_id,
+                "timestamp": message.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
+                "document": message.document.document.path if message.document else None,
+            },
         }
 
-        # Get the channel layer
-        channel_layer = get_channel_layer()
+    @staticmethod
+    def send_page_to_user(user: User, page: str, data: dict):
+        WebSocketHelper.send_batch([WebSocketHelper.page_event(user, page, data)])
+
+    @staticmethod
+    def send_notification(user: User, message: str):
+        WebSocketHelper.send_batch([WebSocketHelper.notification_event(user.id, message)])
 
-        async_to_sync(channel_layer.group_send)(
-            group_name,
-            {
-                "type": "send_message",
-                "message": json.dumps(data),
-            }
-        )
+    @staticmethod
+    def send_notifications(notifications: ['Notification']):
+        WebSocketHelper.send_batch([
+            WebSocketHelper.notification_event(notification.user_id, notification.message)
+            for notification in notifications
+        ])
+
+    @staticmethod
+    def send_message_to_conversation(message: 'Message'):
+        WebSocketHelper.send_batch([WebSocketHelper.conversation_message_event(message)])
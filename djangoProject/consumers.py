@@ -1,11 +1,19 @@
+import asyncio
 import json
+import logging
+from urllib.parse import parse_qs
 
-import magic
+import msgpack
 from asgiref.sync import sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 
+from ai.voice import VoiceUpload, VoiceUploadError, get_mime_type, pack_audio_frame
+from common.instrumentation import InstrumentedConsumerMixin
 
-class BaseConsumer(AsyncWebsocketConsumer):
+logger = logging.getLogger(__name__)
+
+
+class BaseConsumer(InstrumentedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         if self.scope["user"].is_authenticated:
             self.room_group_name = self.generate_room_group_name()
@@ -21,16 +29,87 @@ class BaseConsumer(AsyncWebsocketConsumer):
     def generate_room_group_name(self):
         raise NotImplementedError("Subclasses must implement this method.")
 
+    def wants_msgpack(self) -> bool:
+        query_string = parse_qs(self.scope.get("query_string", b"").decode())
+        return query_string.get("encoding", [None])[0] == "msgpack"
+
+    async def send_event(self, data: dict):
+        # Clients connected with ?encoding=msgpack receive binary frames, the others the JSON format
+        # where "message" is a JSON encoded string
+        if self.wants_msgpack():
+            await self.send(bytes_data=msgpack.packb(data, use_bin_type=True))
+            return
+        if not isinstance(data.get("message"), str):
+            data = {**data, "message": json.dumps(data.get("message"))}
+        await self.send(text_data=json.dumps(data, indent=4))
+
 
 class FrontEndConsumer(BaseConsumer):
+    """
+    Assistant chat of a user. Text frames are messages, a binary frame is a complete voice message.
+    Long voice messages can be streamed instead: a {"type": "voice_start"} text frame, the recording in binary
+    frames and a {"type": "voice_end"} text frame. Clients connected with ?audio=frames receive the spoken answer
+    in binary audio frames (see ai.voice.pack_audio_frame) as soon as it is synthesized, the others one clip
+    per sentence.
+    The messages of all the sockets of a user share the run queue of their thread, so the answers are sent to the
+    user group and every socket receives them, whichever socket runs the queue.
+    """
+    voice_upload = None
+    # The streamed voice message went over the limit, its remaining chunks are dropped until voice_end
+    voice_upload_rejected = False
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Run queue tasks started by this socket and the queue each of them runs
+        self.run_tasks = {}
 
     def generate_room_group_name(self):
         return f"user_{self.scope['user'].id}"
 
+    async def disconnect(self, close_code):
+        if self.voice_upload:
+            self.voice_upload.close()
+        # Nobody reads the answers of a closed socket, its runs stop and leave the thread to the other sockets
+        run_tasks = list(self.run_tasks.items())
+        for task, _ in run_tasks:
+            task.cancel()
+        await asyncio.gather(*[task for task, _ in run_tasks], return_exceptions=True)
+        for _, queue in run_tasks:
+            await sync_to_async(queue.release)(force=True)
+        await super().disconnect(close_code)
+
+    def wants_audio_frames(self) -> bool:
+        query_string = parse_qs(self.scope.get("query_string", b"").decode())
+        return query_string.get("audio", [None])[0] == "frames"
+
+    def get_voice_command(self, text_data: str):
+        if not text_data.startswith('{'):
+            return None
+        try:
+            command = json.loads(text_data)
+        except json.JSONDecodeError:
+            return None
+        if isinstance(command, dict) and command.get("type") in ("voice_start", "voice_end"):
+            return command["type"]
+        return None
+
     async def receive(self, text_data=None, bytes_data=None):
-        from ai.helpers import AIBaseClass
-        from ai.services import AIService
         print("Received data")
+        if bytes_data and self.voice_upload:
+            await self.receive_voice_chunk(bytes_data)
+            return
+        if bytes_data and self.voice_upload_rejected:
+            return
+        command = self.get_voice_command(text_data) if text_data else None
+        if command == "voice_end":
+            await self.end_voice_upload()
+            return
+        # Checked before the voice is transcribed, the transcription is paid for as well
+        if not await self.allow_message():
+            return
+        if command == "voice_start":
+            await self.start_voice_upload()
+            return
         if bytes_data:
             # Check if the received file is a voice file
             if self.is_voice_file(bytes_data):
@@ -42,12 +121,59 @@ class FrontEndConsumer(BaseConsumer):
             user_language = await self.get_user_language(user)
             print(user_language)
             # Handle the text data
-            ai_service = await sync_to_async(AIService)(user, 'backend_assistant')
             print("Text data", text_data)
-            response = await sync_to_async(ai_service.send_message)(text_data)
-            voice = AIBaseClass.generate_audio(response, user_language)
-            await self.send_file_to_client(voice.content)
-            await self.send(text_data=response)
+            await self.queue_message(text_data, user_language)
+
+    async def allow_message(self) -> bool:
+        from ai.throttling import get_assistant_rate_limiter
+        limit = await sync_to_async(get_assistant_rate_limiter().take)(self.scope['user'].id)
+        if not limit.allowed:
+            await self.send_event(limit.as_event())
+        return limit.allowed
+
+    async def queue_message(self, message: str, user_language: str, send_response: bool = True):
+        """
+        Queue the message on the thread of the user. The first message starts a task that runs the queue,
+        the messages received while its run is active are answered together in its next run.
+        """
+        from ai.services import AIService
+        from ai.throttling import AssistantRunQueue
+        service = await sync_to_async(AIService)(self.scope['user'], "backend_assistant")
+        queue = AssistantRunQueue(service.thread_id)
+        is_runner, pending = await sync_to_async(queue.submit)(message)
+        if not is_runner:
+            await self.send_event({"type": "assistant_status", "message": {"status": "queued", "pending": pending}})
+            if not queue.behind_exclusive_run:
+                return
+        # An exclusive run does not answer the queued messages, they are run once it released the lock
+        task = asyncio.create_task(self.run_queue(queue, service, user_language, send_response,
+                                                  wait_for_lock=not is_runner))
+        self.run_tasks[task] = queue
+        task.add_done_callback(lambda done: self.run_tasks.pop(done, None))
+
+    async def run_queue(self, queue, service, user_language: str, send_response: bool, wait_for_lock: bool = False):
+        async def answer(message):
+            response = await self.send_to_assistant(message, user_language, service)
+            if send_response and response is not None:
+                await self.send_to_user({"type": "assistant_response", "text": response})
+
+        try:
+            if wait_for_lock and not await queue.acquire_async(queue.lock_timeout):
+                return
+            await queue.drain_async(answer)
+        except Exception:
+            logger.exception("Assistant run failed on thread %s", queue.thread_id)
+            await self.send_assistant_event({"type": "assistant_status", "message": {"status": "failed"}})
+
+    async def send_to_assistant(self, message: str, user_language: str, service=None):
+        from ai.streaming import AssistantStreamPipeline
+        if self.wants_audio_frames():
+            pipeline = AssistantStreamPipeline(self.scope['user'], self.send_assistant_event, language=user_language,
+                                               service=service, send_audio_chunk=self.send_audio_frame)
+        else:
+            pipeline = AssistantStreamPipeline(self.scope['user'], self.send_assistant_event, self.send_file_to_client,
+                                               language=user_language, service=service)
+        return await pipeline.send_message(message)
 
     async def get_user_language(self, user):
         user_language = "English"  # default language
@@ -67,41 +193,85 @@ class FrontEndConsumer(BaseConsumer):
 
     def is_voice_file(self, bytes_data):
         # Use python-magic to detect the MIME type of the file
-        mime = magic.Magic(mime=True)
-        file_type = mime.from_buffer(bytes_data)
+        file_type = get_mime_type(bytes_data)
         print("File type", file_type)
         return True
         # return file_type.startswith("audio")
 
     async def handle_voice_file(self, bytes_data):
-        from ai.helpers import AIBaseClass
-        from ai.services import AIService
         user = self.scope['user']
         user_language = await self.get_user_language(user)
 
         text = await self.convert_speech_to_text(bytes_data)
-        if user.is_superuser:
-            ai_service = await sync_to_async(AIService)(user, 'backend_assistant')
-            response = await sync_to_async(ai_service.send_message)(text)
-            voice = AIBaseClass.generate_audio(response, user_language)
-            await self.send_file_to_client(voice.content)
-        else:
-            ai_service = await sync_to_async(AIService)(user, 'backend_assistant')
-            response = await sync_to_async(ai_service.send_message)(text)
-            voice = AIBaseClass.generate_audio(response, user_language)
-            await self.send_file_to_client(voice.content)
-            await self.send(text_data=response)
+        await self.queue_message(text, user_language, send_response=not user.is_superuser)
+
+    async def send_voice_status(self, status: str, **kwargs):
+        await self.send_event({"type": "voice_status", "message": {"status": status, **kwargs}})
+
+    async def start_voice_upload(self):
+        if self.voice_upload:
+            self.voice_upload.close()
+        self.voice_upload = VoiceUpload()
+        self.voice_upload_rejected = False
+        await self.send_voice_status("receiving")
+
+    async def receive_voice_chunk(self, bytes_data):
+        try:
+            await sync_to_async(self.voice_upload.write, thread_sensitive=False)(bytes_data)
+        except VoiceUploadError as e:
+            self.voice_upload.close()
+            self.voice_upload = None
+            self.voice_upload_rejected = True
+            await self.send_voice_status("rejected", error=str(e))
+
+    async def end_voice_upload(self):
+        voice_upload, self.voice_upload = self.voice_upload, None
+        if self.voice_upload_rejected:
+            # The client was told when the message was rejected
+            self.voice_upload_rejected = False
+            return
+        if voice_upload is None:
+            await self.send_voice_status("rejected", error="No voice message was started")
+            return
+        print("File type", voice_upload.mime_type)
+        try:
+            await self.send_voice_status("received", size=voice_upload.size)
+            await self.handle_voice_file(voice_upload.open())
+        except VoiceUploadError as e:
+            await self.send_voice_status("rejected", error=str(e))
+        finally:
+            voice_upload.close()
 
     async def convert_speech_to_text(self, file) -> str:
         from ai.helpers import AIBaseClass
-        return AIBaseClass.get_translation(file)
+        return await AIBaseClass.get_translation_async(file, user=self.scope['user'])
+
+    async def send_to_user(self, event: dict):
+        await self.channel_layer.group_send(self.room_group_name, event)
+
+    async def send_assistant_event(self, data: dict):
+        await self.send_to_user({"type": "assistant_event", "event": data})
 
     async def send_file_to_client(self, voice):
-        # Read the file in binary mode
-        await self.send(bytes_data=voice)
+        await self.send_to_user({"type": "assistant_audio", "frames": False, "bytes": voice})
+
+    async def send_audio_frame(self, clip: int, index: int, chunk: bytes, last: bool):
+        await self.send_to_user({"type": "assistant_audio", "frames": True,
+                                 "bytes": pack_audio_frame(clip, index, chunk, last)})
+
+    async def assistant_event(self, event: dict):
+        await self.send_event(event["event"])
+
+    async def assistant_response(self, event: dict):
+        await self.send(text_data=event["text"])
+
+    async def assistant_audio(self, event: dict):
+        # The speech comes in the format the running socket asked for, sockets that want the other one get the text
+        if event["frames"] == self.wants_audio_frames():
+            await self.send(bytes_data=event["bytes"])
 
     async def send_component(self, data: dict):
-        await self.send(text_data=json.dumps(data, indent=4))
+        await self.send_event(data)
 
 
 class NotificationConsumer(BaseConsumer):
@@ -114,10 +284,32 @@ class NotificationConsumer(BaseConsumer):
         pass
 
     async def send_notification(self, data: dict):
-        await self.send(text_data=json.dumps(data, indent=4))
+        await self.send_event(data)
 
 
 class ConversationConsumer(BaseConsumer):
+    REPLAY_LIMIT = 200
+
+    async def connect(self):
+        await super().connect()
+        # Clients reconnecting with ?cursor= receive the messages they missed before the live ones
+        cursor = parse_qs(self.scope.get("query_string", b"").decode()).get("cursor", [None])[0]
+        if cursor and self.scope["user"].is_authenticated:
+            for event in await self.get_missed_events(cursor):
+                await self.send_message(event)
+
+    @sync_to_async
+    def get_missed_events(self, cursor: str) -> [dict]:
+        from rest_framework.exceptions import ValidationError
+        from communication.services import MessageService
+        from communication.websocket_helper import WebSocketHelper
+        conversation_id = self.scope['url_route']['kwargs']['conversation_id']
+        try:
+            messages = MessageService.get_messages_since(self.scope["user"], int(conversation_id), cursor,
+                                                         self.REPLAY_LIMIT)
+        except ValidationError:
+            return []
+        return [WebSocketHelper.conversation_message_event(message)[1] for message in messages[:self.REPLAY_LIMIT]]
 
     def generate_room_group_name(self):
         return f"chat_{self.scope['url_route']['kwargs']['conversation_id']}"
@@ -129,6 +321,6 @@ class ConversationConsumer(BaseConsumer):
     async def send_message(self, event):
         message = event['message']
 
-        await self.send(text_data=json.dumps({
+        await self.send_event({
             'message': message
-        }))
+        })
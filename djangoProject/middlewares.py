@@ -1,19 +1,28 @@
 from urllib.parse import parse_qs
 
-from asgiref.sync import sync_to_async
 from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
+from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AnonymousUser
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.settings import api_settings
+
+from user.services import UserCache
 
 
 class JWTAuthMiddleware(BaseMiddleware):
     """
-    Token authentication middleware for Django Channels 2
+    Token authentication middleware for Django Channels 2.
+    The token is verified in the thread pool instead of the single thread of sync_to_async so handshakes run
+    concurrently, and the users that passed the checks of get_user are remembered in UserCache so reconnects only
+    load them by primary key.
     """
 
     def __init__(self, inner):
         super().__init__(inner)
+        self.jwt_auth = JWTAuthentication()
 
     async def __call__(self, scope, receive, send):
         # Extract token from query string
@@ -22,10 +31,8 @@ class JWTAuthMiddleware(BaseMiddleware):
 
         if token:
             # Authenticate the token and get the user
-            jwt_auth = JWTAuthentication()
             try:
-                validated_token = jwt_auth.get_validated_token(token)
-                scope['user'] = await sync_to_async(jwt_auth.get_user, thread_sensitive=True)(validated_token)
+                scope['user'] = await database_sync_to_async(self.authenticate, thread_sensitive=False)(token)
             except Exception as e:
                 scope['user'] = AnonymousUser()
 
@@ -34,6 +41,23 @@ class JWTAuthMiddleware(BaseMiddleware):
 
         return await super().__call__(scope, receive, send)
 
+    def authenticate(self, token: str) -> 'User':
+        validated_token = self.jwt_auth.get_validated_token(token)
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        state = UserCache.get(user_id)
+        if state is None:
+            user = self.jwt_auth.get_user(validated_token)
+            UserCache.set(user)
+            return user
+
+        # Users are cached once they passed get_user and dropped when they change, only the token is left to check
+        if not state['is_active']:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+        if api_settings.CHECK_REVOKE_TOKEN and (validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) !=
+                                                state['revoke_marker']):
+            raise AuthenticationFailed("The user's password has been changed.", code="password_changed")
+        return get_user_model().objects.get(**{api_settings.USER_ID_FIELD: user_id})
+
 
 # Convenience function to wrap the ASGI application with authentication middleware
 def JWTAuthMiddlewareStack(inner):
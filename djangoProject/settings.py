@@ -65,6 +65,7 @@ INSTALLED_APPS = DJANGO_APPS + THIRD_PARTY_APPS + CUSTOM_APPS
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'common.instrumentation.QueryInstrumentationMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -98,12 +99,46 @@ WSGI_APPLICATION = 'djangoProject.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# DATABASE_PROFILE=postgres is used by the deployed daphne and celery processes, connections are kept for
+# DATABASE_CONN_MAX_AGE seconds and checked before reuse. DATABASE_REPLICA_HOST adds the read only replica used by
+# the list and retrieve actions. The sqlite profile can stand in a replica with DATABASE_SQLITE_REPLICA=1, a second
+# connection to the same file.
+DATABASE_PROFILE = os.environ.get('DATABASE_PROFILE', 'sqlite')
+
+if DATABASE_PROFILE == 'postgres':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DATABASE_NAME', 'talent_buzz'),
+            'USER': os.environ.get('DATABASE_USER', 'talent_buzz'),
+            'PASSWORD': os.environ.get('DATABASE_PASSWORD', ''),
+            'HOST': os.environ.get('DATABASE_HOST', 'localhost'),
+            'PORT': os.environ.get('DATABASE_PORT', '5432'),
+            'CONN_MAX_AGE': int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'connect_timeout': 5},
+        }
     }
-}
+    if os.environ.get('DATABASE_REPLICA_HOST'):
+        DATABASES['replica'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['DATABASE_REPLICA_HOST'],
+            'PORT': os.environ.get('DATABASE_REPLICA_PORT', DATABASES['default']['PORT']),
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+            # Seconds a connection waits for the lock of another process before failing
+            'OPTIONS': {'timeout': 20},
+        }
+    }
+    if os.environ.get('DATABASE_SQLITE_REPLICA'):
+        DATABASES['replica'] = {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}}
+
+DATABASE_ROUTERS = ['common.db_routers.ReplicaRouter']
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -173,6 +208,9 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
 }
 
+# Seconds the websocket authentication keeps a user without reading it again
+JWT_USER_CACHE_TIMEOUT = 60
+
 sentry_sdk.init(
     dsn="https://c9a33539b84305d9d8a9323e5a1eebae@o4507398276055040.ingest.de.sentry.io/4507398277627984",
     # Set traces_sample_rate to 1.0 to capture 100%
@@ -209,6 +247,32 @@ CORS_ALLOW_HEADERS = [
 ]
 CORS_ALLOWED_CREDENTIALS = True
 OPEN_AI_API_KEY = os.environ.get('OPEN_AI_API_KEY', '')
+# Point the OpenAI client to another endpoint, e.g. a local fake of the API in tests
+OPEN_AI_BASE_URL = os.environ.get('OPEN_AI_BASE_URL') or None
+OPEN_AI_MAX_RETRIES = 2
+# Seconds the assistants, threads and vector stores retrieved from OpenAI are reused
+OPEN_AI_CACHE_TTL = 300
+# Tool calls of a run step are executed concurrently on a bounded pool, timeouts are in seconds
+AI_TOOL_CALL_WORKERS = 8
+AI_TOOL_CALL_TIMEOUT = 30
+AI_TOOL_CALL_TIMEOUTS = {}
+# Size limits of the AI readable context rendered into the assistant instructions
+AI_CONTEXT_TOKEN_BUDGET = 6000
+AI_CONTEXT_FIELD_MAX_CHARS = 500
+AI_CONTEXT_CACHE_TIMEOUT = 60 * 60 * 24
+# Seconds a vector store sync waits so bursts of document changes end up in one job
+VECTOR_STORE_SYNC_DEBOUNCE = 10
+# Vector store file batches in flight at once, files per batch and seconds a batch is polled before giving up
+AI_UPLOAD_CONCURRENCY = 4
+AI_UPLOAD_BATCH_SIZE = 100
+AI_UPLOAD_POLL_TIMEOUT = 120
+# Seconds after which a vector store file still marked in progress was left by a crashed upload and is sent again
+VECTOR_STORE_FILE_IN_PROGRESS_TIMEOUT = 60 * 30
+# Workers of each stage of the create_user_from_cv ingestion
+CV_INGESTION_WORKERS = 4
+# Share one remote assistant per instruction, tools and model instead of creating one per Assistant
+ASSISTANT_REUSE_ASSISTANTS = True
+ASSISTANT_VECTOR_STORE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
 
 # Celery settings
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
@@ -219,8 +283,64 @@ CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
 
 IS_TEST = 'test' in sys.argv
+CELERY_TASK_ALWAYS_EAGER = IS_TEST
 
-
+# Cache shared by all processes in the redis of channels and celery, tests use their own database
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/3' if IS_TEST else 'redis://localhost:6379/2',
+    }
+}
+# Sessions are read from the cache and written through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+# Seconds the responses of cache_response views and the swagger schema are kept
+VIEW_CACHE_TIMEOUT = 60 * 5
+SWAGGER_CACHE_TIMEOUT = 60 * 15
+
+# Speech clips of assistant replies kept on disk, least recently used ones are removed past the size limit.
+# Replies longer than the text length limit are not cached
+AI_AUDIO_CACHE_DIR = os.path.join(BASE_DIR, 'test_audio_cache' if IS_TEST else 'audio_cache')
+AI_AUDIO_CACHE_MAX_BYTES = 500 * 1024 * 1024
+AI_AUDIO_CACHE_MAX_TEXT_LENGTH = 500
+AI_TRANSLATION_CACHE_TIMEOUT = 60 * 60 * 24 * 30
+# Voice messages: size limit of whisper, bytes kept in memory before the upload spills to disk
+# and size of the speech chunks streamed back
+AI_VOICE_MAX_BYTES = 25 * 1024 * 1024
+AI_VOICE_SPOOL_SIZE = 1024 * 1024
+AI_VOICE_FRAME_SIZE = 16 * 1024
+
+# Query count and latency metrics of the requests under the paths and of the websocket consumers, served on /metrics
+INSTRUMENTATION_ENABLED = os.environ.get('INSTRUMENTATION_ENABLED', '1') == '1'
+INSTRUMENTATION_PATHS = ['/honeycomb/', '/comunication/']
+# Lowest share of the requests of a healthy endpoint whose queries are recorded
+INSTRUMENTATION_MIN_SAMPLE_RATE = 0.05
+# Repetitions of a query and seconds after which a request is recorded every time again
+INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD = 3
+INSTRUMENTATION_SLOW_REQUEST_SECONDS = 0.5
+# Bearer token of the Prometheus scraper, staff users can read the metrics without it
+METRICS_AUTH_TOKEN = os.environ.get('METRICS_AUTH_TOKEN', '')
+
+# Notifications
+NOTIFICATION_DEDUPLICATION_WINDOW = timedelta(minutes=1)
+NOTIFICATION_BATCH_SIZE = 500
+
+
+
+# Leaderboards
+LEADERBOARD_REDIS_URL = 'redis://localhost:6379/1'
+LEADERBOARD_KEY_PREFIX = 'test_leaderboard' if IS_TEST else 'leaderboard'
+
+# Assistant rate limits and run queues, kept in the redis of the channel layer and celery
+AI_THROTTLE_REDIS_URL = 'redis://localhost:6379/1'
+AI_THROTTLE_KEY_PREFIX = 'test_ai' if IS_TEST else 'ai'
+# Messages a user can send in a burst and messages per second they get back
+AI_RATE_LIMIT_CAPACITY = 5
+AI_RATE_LIMIT_REFILL_RATE = 0.2
+# Seconds the run lock of a thread is held without the runner taking the next messages
+AI_RUN_LOCK_TIMEOUT = 300
+# Seconds a hive assistant request waits for the active run of its thread before it is rejected
+AI_RUN_WAIT_TIMEOUT = 60
 
 ASGI_APPLICATION = 'djangoProject.asgi.application'
 
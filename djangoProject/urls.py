@@ -14,6 +14,7 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from drf_yasg import openapi
@@ -51,7 +52,8 @@ urlpatterns = [
     path('profile/', include('user_profile.urls')),
     path('sentry-debug/', trigger_error),
     path('assistant/', include('assistant.urls')),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
+    path('swagger/', schema_view.with_ui('swagger', cache_timeout=settings.SWAGGER_CACHE_TIMEOUT),
+         name='schema-swagger-ui'),
 ]
 
 
@@ -1,7 +1,7 @@
 from django.contrib import admin
 from simple_history.admin import SimpleHistoryAdmin
 
-from .models import Hive, Bee, Membership, Nectar, HiveRequest, Contract
+from .models import Hive, Bee, Membership, Nectar, HiveRequest, Contract, HiveDashboard, CVIngestion
 
 
 @admin.register(Hive)
@@ -73,3 +73,18 @@ class ContractAdmin(SimpleHistoryAdmin):
     accept_application.short_description = 'Accept selected contracts'
 
     actions = [accept_application]
+
+
+@admin.register(HiveDashboard)
+class HiveDashboardAdmin(admin.ModelAdmin):
+    list_display = ('hive', 'total_active_nectars', 'total_contracts', 'pending_requests', 'pending_contracts',
+                    'updated_at')
+    search_fields = ('hive__name',)
+    readonly_fields = HiveDashboard.COUNTER_FIELDS + ('updated_at',)
+
+
+@admin.register(CVIngestion)
+class CVIngestionAdmin(admin.ModelAdmin):
+    list_display = ('file_path', 'stage', 'document', 'attempts', 'updated_at')
+    search_fields = ('file_path', 'error')
+    list_filter = ('stage',)
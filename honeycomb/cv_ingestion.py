@@ -0,0 +1,180 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files import File
+from django.db import close_old_connections
+
+from ai.helpers import AIBaseClass
+from ai.services import AIService
+from common.models import Document
+from .models import Bee, CVIngestion
+
+STAGES = (
+    ('upload', CVIngestion.STAGE_PENDING, CVIngestion.STAGE_UPLOADED),
+    ('index', CVIngestion.STAGE_UPLOADED, CVIngestion.STAGE_INDEXED),
+    ('extract', CVIngestion.STAGE_INDEXED, CVIngestion.STAGE_EXTRACTED),
+)
+
+
+class IngestionStats:
+    """
+    Throughput and failures of one pipeline run.
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.stage_seconds = {name: [] for name, _, _ in STAGES}
+        self.extracted = 0
+        self.skipped = 0
+        self.failures = []
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stage_seconds[stage].append(seconds)
+            self.extracted += stage == 'extract'
+
+    def fail(self, checkpoint: CVIngestion, stage: str, error: str) -> None:
+        with self._lock:
+            self.failures.append((checkpoint.file_path, stage, error))
+
+    @property
+    def seconds(self) -> float:
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def summary(self) -> [str]:
+        per_minute = self.extracted / self.seconds * 60 if self.seconds else 0
+        lines = [f"{self.extracted} CV(s) extracted, {len(self.failures)} failed, {self.skipped} skipped in "
+                 f"{self.seconds:.1f}s ({per_minute:.1f} CV/min)"]
+        for stage, seconds in self.stage_seconds.items():
+            if seconds:
+                lines.append(f"{stage}: {len(seconds)} done, avg {sum(seconds) / len(seconds):.2f}s, "
+                             f"max {max(seconds):.2f}s")
+        return lines
+
+
+class CVIngestionPipeline:
+    """
+    Turns CV files into bees in three stages: upload the file, index it in its own vector store and let the backend
+    assistant extract the user from it. Every stage has its own pool of workers so uploads, indexing and the slow
+    assistant runs overlap across files. The progress of every file is checkpointed in CVIngestion, failed files
+    keep the stage they failed in and are only retried with retry_failed.
+    """
+
+    def __init__(self, user: 'User', workers: int):
+        self.user = user
+        self.workers = workers
+        self.stats = IngestionStats()
+        self.pools = {}
+        self.pending = 0
+        self.done = threading.Condition()
+
+    def run(self, file_paths: [str], retry_failed: bool = False) -> IngestionStats:
+        file_paths = [os.path.abspath(file_path) for file_path in file_paths]
+        CVIngestion.objects.bulk_create([CVIngestion(file_path=file_path) for file_path in file_paths],
+                                        ignore_conflicts=True)
+        checkpoints = CVIngestion.objects.filter(file_path__in=file_paths).order_by('id')
+        # Create the thread of the user once, the workers would race to create it otherwise
+        AIService(self.user, "backend_assistant")
+
+        self.pools = {name: ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=f'cv-{name}')
+                      for name, _, _ in STAGES}
+        try:
+            for checkpoint in checkpoints:
+                if checkpoint.stage == CVIngestion.STAGE_EXTRACTED or (checkpoint.is_failed and not retry_failed):
+                    self.stats.skipped += 1
+                    continue
+                with self.done:
+                    self.pending += 1
+                self.advance(checkpoint)
+            with self.done:
+                self.done.wait_for(lambda: self.pending == 0)
+        finally:
+            for pool in self.pools.values():
+                pool.shutdown()
+        self.stats.finished_at = time.perf_counter()
+        return self.stats
+
+    def advance(self, checkpoint: CVIngestion) -> None:
+        for name, from_stage, _ in STAGES:
+            if checkpoint.stage == from_stage:
+                self.pools[name].submit(self.run_stage, name, checkpoint)
+                return
+        self.finish()
+
+    def finish(self) -> None:
+        with self.done:
+            self.pending -= 1
+            self.done.notify_all()
+
+    def run_stage(self, name: str, checkpoint: CVIngestion) -> None:
+        # Workers are long lived threads, their connections have to be recycled like the ones of a request
+        close_old_connections()
+        try:
+            advanced = self.process(name, checkpoint)
+        except Exception as e:
+            # The checkpoint could not be written, the file is left as it was for the next run
+            print(f"CV {checkpoint.file_path} could not be checkpointed after {name}: {e}")
+            self.stats.fail(checkpoint, name, str(e))
+            advanced = False
+        finally:
+            close_old_connections()
+        # The file is finished exactly once, here or by advance after its last stage
+        if advanced:
+            self.advance(checkpoint)
+        else:
+            self.finish()
+
+    def process(self, name: str, checkpoint: CVIngestion) -> bool:
+        """
+        Run the stage and checkpoint its outcome, True if the file moved on to the next stage.
+        """
+        start = time.perf_counter()
+        try:
+            getattr(self, name)(checkpoint)
+        except Exception as e:
+            print(f"CV {checkpoint.file_path} failed in {name}: {e}")
+            checkpoint.error = f"{name}: {e}"
+            checkpoint.attempts += 1
+            checkpoint.save(update_fields=['error', 'attempts', 'document', 'vector_store_id', 'updated_at'])
+            self.stats.fail(checkpoint, name, str(e))
+            return False
+
+        checkpoint.stage = next(to_stage for stage, _, to_stage in STAGES if stage == name)
+        checkpoint.error = ""
+        checkpoint.save(update_fields=['stage', 'error', 'document', 'vector_store_id', 'updated_at'])
+        self.stats.record(name, time.perf_counter() - start)
+        return True
+
+    def upload(self, checkpoint: CVIngestion) -> None:
+        document = checkpoint.document
+        if document is None:
+            with open(checkpoint.file_path, 'rb') as file:
+                # Stored and hashed in one read, the upload below streams it from the storage
+                document = Document(user=self.user, document=File(file, os.path.basename(checkpoint.file_path)))
+                document.upload_in_background = False
+                document.save()
+            checkpoint.document = document
+        if not document.file_id:
+            document.upload_to_ai()
+
+    def index(self, checkpoint: CVIngestion) -> None:
+        document = checkpoint.document
+        ai = AIBaseClass("backend_assistant")
+        if not checkpoint.vector_store_id:
+            checkpoint.vector_store_id = ai.get_or_create_vector_store("").id
+            document.isolated_vector_store = checkpoint.vector_store_id
+            document.save(update_fields=['isolated_vector_store'])
+        result = ai.upload_files_to_vector_store(checkpoint.vector_store_id, {document.file_id: document.hash})
+        if result.failed_file_ids:
+            raise RuntimeError(result.files[document.file_id].error)
+
+    def extract(self, checkpoint: CVIngestion) -> None:
+        document = checkpoint.document
+        AIService(self.user, "backend_assistant").review_document_with_file_id(document.file_id,
+                                                                               checkpoint.vector_store_id)
+        if not Bee.objects.filter(documents=document).exists():
+            raise RuntimeError("The assistant did not create a user from the CV")
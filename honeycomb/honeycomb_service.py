@@ -1,4 +1,5 @@
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
 
@@ -116,8 +117,9 @@ class BeeService:
 
     @staticmethod
     def get_user_bees_AI_readable(**kwargs):
+        from ai.context import AIContextBuilder
         from .models import Bee
-        return " ,".join([bee.convert_to_ai_readable() for bee in Bee.objects.all()])
+        return AIContextBuilder(token_budget=settings.AI_CONTEXT_TOKEN_BUDGET).render(Bee.objects.order_by('id'))
 
     @staticmethod
 
@@ -130,5 +132,7 @@ class ContractService:
 
     @staticmethod
     def get_nectar_requests(user):
+        from ai.context import AIContextBuilder
         from .models import Contract
-        return [" ,".join(contract.convert_to_ai_readable()) for contract in Contract.objects.filter(is_accepted=False, accepted_at=None)]
\ No newline at end of file
+        contracts = Contract.objects.filter(is_accepted=False, accepted_at=None).order_by('id')
+        return AIContextBuilder(token_budget=settings.AI_CONTEXT_TOKEN_BUDGET).render(contracts)
\ No newline at end of file
@@ -0,0 +1,157 @@
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+import redis
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_redis_client = None
+
+# Only touch leaderboards that were already built, a partial sorted set would be mistaken for a complete one
+UPDATE_IF_BUILT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('ZADD', KEYS[1], ARGV[1], ARGV[2])
+end
+return -1
+"""
+
+REBUILD_CHUNK_SIZE = 1000
+
+
+def rank_scores(scores: List[int], offset: int, above: int) -> List[int]:
+    """
+    Return the 1 based ranks of a page of scores ordered from the highest, equal scores share the rank of the
+    first of them. above is the number of scores higher than the first one of the page.
+    """
+    ranks = []
+    for position, score in enumerate(scores):
+        if position and score == scores[position - 1]:
+            ranks.append(ranks[-1])
+        else:
+            ranks.append(above + 1 if not position else offset + position + 1)
+    return ranks
+
+
+def get_redis_client() -> redis.Redis:
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.LEADERBOARD_REDIS_URL)
+    return _redis_client
+
+
+class Leaderboard:
+    """
+    Rank index kept in a redis sorted set. Scores are updated incrementally by the honeycomb signals,
+    rank lookups and pages are O(log n) reads. The sorted set is built from the database on first use.
+    """
+
+    def __init__(self, name: str):
+        self.key = f"{settings.LEADERBOARD_KEY_PREFIX}:{name}"
+        self.client = get_redis_client()
+
+    def load_scores(self) -> Iterable[Tuple[int, int]]:
+        raise NotImplementedError("Subclasses must implement this method.")
+
+    def rebuild(self) -> None:
+        pipeline = self.client.pipeline(transaction=True)
+        pipeline.delete(self.key)
+        scores = {}
+        for member_id, score in self.load_scores():
+            scores[member_id] = score
+            if len(scores) >= REBUILD_CHUNK_SIZE:
+                pipeline.zadd(self.key, scores)
+                scores = {}
+        if scores:
+            pipeline.zadd(self.key, scores)
+        pipeline.execute()
+
+    def ensure_built(self) -> None:
+        if not self.client.exists(self.key):
+            self.rebuild()
+
+    def update(self, member_id: int, score: int) -> None:
+        try:
+            self.client.eval(UPDATE_IF_BUILT_SCRIPT, 1, self.key, score, member_id)
+        except redis.RedisError:
+            logger.exception("Failed to update leaderboard %s", self.key)
+            self.discard()
+
+    def remove(self, member_id: int) -> None:
+        try:
+            self.client.zrem(self.key, member_id)
+        except redis.RedisError:
+            logger.exception("Failed to update leaderboard %s", self.key)
+            self.discard()
+
+    def discard(self) -> None:
+        # A sorted set that missed a write would rank from stale scores, it is rebuilt on the next read instead
+        try:
+            self.client.delete(self.key)
+        except redis.RedisError:
+            logger.exception("Failed to discard leaderboard %s", self.key)
+
+    def clear(self) -> None:
+        self.client.delete(self.key)
+
+    def get_rank(self, member_id: int) -> Optional[int]:
+        """
+        Return the 1 based rank of the member, members with equal scores share the same rank.
+        None if the member is unknown or redis is unavailable.
+        """
+        try:
+            self.ensure_built()
+            score = self.client.zscore(self.key, member_id)
+            if score is None:
+                return None
+            return self.client.zcount(self.key, f'({score}', '+inf') + 1
+        except redis.RedisError:
+            logger.exception("Failed to read leaderboard %s", self.key)
+            return None
+
+    def count_above(self, score: int) -> Optional[int]:
+        """
+        Return the number of members with a higher score, None if redis is unavailable.
+        """
+        try:
+            self.ensure_built()
+            return self.client.zcount(self.key, f'({score}', '+inf')
+        except redis.RedisError:
+            logger.exception("Failed to read leaderboard %s", self.key)
+            return None
+
+    def get_page(self, limit: Optional[int] = None, offset: int = 0) -> Optional[List[Tuple[int, int]]]:
+        """
+        Return (member_id, score) pairs ordered by score, None if redis is unavailable.
+        """
+        end = offset + limit - 1 if limit else -1
+        try:
+            self.ensure_built()
+            page = self.client.zrevrange(self.key, offset, end, withscores=True)
+        except redis.RedisError:
+            logger.exception("Failed to read leaderboard %s", self.key)
+            return None
+        return [(int(member_id), int(score)) for member_id, score in page]
+
+
+class UserLeaderboard(Leaderboard):
+    """Global ranking of users by their points."""
+
+    def __init__(self):
+        super().__init__('users')
+
+    def load_scores(self):
+        from django.contrib.auth import get_user_model
+        return get_user_model().objects.values_list('id', 'points').order_by().iterator()
+
+
+class HiveLeaderboard(Leaderboard):
+    """Ranking of the bees of a hive by their membership honey points."""
+
+    def __init__(self, hive_id: int):
+        super().__init__(f'hive:{hive_id}')
+        self.hive_id = hive_id
+
+    def load_scores(self):
+        from honeycomb.models import Membership
+        return Membership.objects.filter(hive_id=self.hive_id).values_list('bee_id', 'honey_points').iterator()
@@ -0,0 +1,61 @@
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections
+from rest_framework.test import APIClient
+
+from common.benchmarks import get_percentile
+
+LIST_ENDPOINTS = ('/honeycomb/hives/', '/honeycomb/bees/', '/honeycomb/nectars/', '/honeycomb/memberships/')
+
+
+class Command(BaseCommand):
+    help = ('Measure the throughput of the honeycomb list endpoints with concurrent clients. Run it once per '
+            'DATABASE_PROFILE and replica setting to compare them.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint')
+        parser.add_argument('--concurrency', type=int, default=8, help='Clients sending requests at once')
+        parser.add_argument('--email', help='User the clients authenticate as, the first active user by default')
+        parser.add_argument('--endpoint', action='append', dest='endpoints',
+                            help='Endpoint to measure, can be repeated. All honeycomb lists by default')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        users = User.objects.filter(is_active=True)
+        user = users.filter(email=options['email']).first() if options['email'] else users.order_by('id').first()
+        if user is None:
+            raise CommandError('No user to authenticate the requests with')
+
+        replica = 'replica' if 'replica' in settings.DATABASES else 'no replica'
+        self.stdout.write(f"Database profile {settings.DATABASE_PROFILE} with {replica}, "
+                          f"{options['concurrency']} client(s), {options['requests']} request(s) per endpoint")
+        for endpoint in options['endpoints'] or LIST_ENDPOINTS:
+            self.benchmark(user, endpoint, options['requests'], options['concurrency'])
+
+    def benchmark(self, user, endpoint: str, requests: int, concurrency: int):
+        def send(_):
+            # Worker threads keep their own connection, like the threads of daphne
+            close_old_connections()
+            client = APIClient(HTTP_HOST=settings.ALLOWED_HOSTS[0] if settings.ALLOWED_HOSTS else 'localhost')
+            client.force_authenticate(user)
+            start = time.perf_counter()
+            status_code = client.get(endpoint).status_code
+            return time.perf_counter() - start, status_code
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(send, range(requests)))
+        seconds = time.perf_counter() - start
+
+        latencies = [latency for latency, _ in results]
+        errors = sum(status_code != 200 for _, status_code in results)
+        p95 = get_percentile(latencies, 95)
+        style = self.style.SUCCESS if not errors else self.style.WARNING
+        self.stdout.write(style(f"{endpoint}: {requests / seconds:.1f} req/s, p50 "
+                                f"{statistics.median(latencies) * 1000:.1f}ms, p95 {p95 * 1000:.1f}ms, "
+                                f"{errors} error(s)"))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from honeycomb.models import Hive, HiveDashboard
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the precomputed hive dashboard counters from scratch and report any drift that was found.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hive', type=int, action='append', dest='hive_ids',
+                            help='Only rebuild the dashboard of the given hive id (can be repeated)')
+        parser.add_argument('--check', action='store_true',
+                            help='Only report drifted dashboards without writing, exits with an error if any is found')
+
+    def handle(self, *args, **options):
+        hives = Hive.objects.all()
+        if options['hive_ids']:
+            hives = hives.filter(id__in=options['hive_ids'])
+        dashboards = {dashboard.hive_id: dashboard for dashboard in HiveDashboard.objects.filter(hive__in=hives)}
+
+        drifted = 0
+        for hive in hives.only('id', 'name'):
+            expected = HiveDashboard.objects.compute_for_hive(hive.id)
+            dashboard = dashboards.get(hive.id)
+            current = dashboard.get_counters() if dashboard else None
+            if current == expected:
+                continue
+
+            drifted += 1
+            if current is None:
+                self.stdout.write(self.style.WARNING(f'Hive {hive.id} ({hive.name}) has no dashboard yet'))
+            else:
+                changes = ', '.join(f'{field}: {current[field]} -> {value}' for field, value in expected.items()
+                                    if current[field] != value)
+                self.stdout.write(self.style.WARNING(f'Hive {hive.id} ({hive.name}) drifted: {changes}'))
+
+            if not options['check']:
+                HiveDashboard.objects.update_or_create(hive=hive, defaults=expected)
+
+        if options['check'] and drifted:
+            raise CommandError(f'{drifted} hive dashboard(s) drifted')
+        action = 'found' if options['check'] else 'rebuilt'
+        self.stdout.write(self.style.SUCCESS(f'{drifted} drifted hive dashboard(s) {action}'))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from honeycomb.leaderboard import UserLeaderboard, HiveLeaderboard
+from honeycomb.models import Hive
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the global and per hive honey point leaderboards from the database.'
+
+    def handle(self, *args, **options):
+        UserLeaderboard().rebuild()
+        hive_ids = list(Hive.objects.values_list('id', flat=True))
+        for hive_id in hive_ids:
+            HiveLeaderboard(hive_id).rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt the user leaderboard and {len(hive_ids)} hive leaderboard(s)'))
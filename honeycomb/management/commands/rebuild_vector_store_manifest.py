@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from ai.clients import get_openai_client
+from ai.helpers import AIBaseClass
+from ai.models import VectorStoreFile
+from common.models import Document
+from honeycomb.models import Hive
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the local vector store file manifest from the files that are in the OpenAI vector stores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--vector-store', action='append', dest='vector_store_ids',
+                            help='Only rebuild the manifest of the given vector store id (can be repeated)')
+
+    def handle(self, *args, **options):
+        vector_store_ids = options['vector_store_ids']
+        if not vector_store_ids:
+            vector_store_ids = [AIBaseClass.get_or_create_assistant_info_model_object().base_vector_store_id]
+            vector_store_ids += Hive.objects.exclude(vector_store_id='').values_list('vector_store_id', flat=True)
+
+        client = get_openai_client()
+        for vector_store_id in filter(None, vector_store_ids):
+            statuses = {file.id: file.status for file in client.beta.vector_stores.files.list(
+                vector_store_id=vector_store_id, limit=100)}
+            hashes = dict(Document.objects.filter(file_id__in=statuses).values_list('file_id', 'hash'))
+
+            VectorStoreFile.objects.filter(vector_store_id=vector_store_id).delete()
+            for status in (VectorStoreFile.STATUS_COMPLETED, VectorStoreFile.STATUS_IN_PROGRESS,
+                           VectorStoreFile.STATUS_FAILED):
+                VectorStoreFile.objects.mark(vector_store_id, {file_id: hashes.get(file_id, '')
+                                                               for file_id, file_status in statuses.items()
+                                                               if file_status == status}, status)
+            self.stdout.write(self.style.SUCCESS(f'{len(statuses)} file(s) recorded for vector store {vector_store_id}'))
@@ -0,0 +1,264 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:01
+
+import simple_history.models
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('common', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Contract',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('contract_id', models.UUIDField(default=uuid.uuid4, editable=False, unique=True)),
+                ('accepted_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_accepted', models.BooleanField(default=False)),
+                ('applied_at', models.DateTimeField(auto_now_add=True)),
+                ('accepted_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CVIngestion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_path', models.CharField(max_length=500, unique=True)),
+                ('stage', models.CharField(choices=[('pending', 'Pending'), ('uploaded', 'Uploaded'), ('indexed', 'Indexed'), ('extracted', 'Extracted')], default='pending', max_length=20)),
+                ('vector_store_id', models.CharField(blank=True, max_length=255)),
+                ('error', models.TextField(blank=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HistoricalBee',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('bee_bio', models.TextField(blank=True, null=True)),
+                ('bee_type', models.CharField(choices=[('worker', 'Worker'), ('scout', 'Scout'), ('guardian', 'Guardian'), ('queen', 'Queen')], default='worker', max_length=10)),
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history_date', models.DateTimeField(db_index=True)),
+                ('history_change_reason', models.CharField(max_length=100, null=True)),
+                ('history_type', models.CharField(choices=[('+', 'Created'), ('~', 'Changed'), ('-', 'Deleted')], max_length=1)),
+            ],
+            options={
+                'verbose_name': 'historical bee',
+                'verbose_name_plural': 'historical bees',
+                'ordering': ('-history_date', '-history_id'),
+                'get_latest_by': ('history_date', 'history_id'),
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+        migrations.CreateModel(
+            name='HistoricalContract',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('contract_id', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False)),
+                ('accepted_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('is_accepted', models.BooleanField(default=False)),
+                ('applied_at', models.DateTimeField(blank=True, editable=False)),
+                ('accepted_at', models.DateTimeField(blank=True, null=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history_date', models.DateTimeField(db_index=True)),
+                ('history_change_reason', models.CharField(max_length=100, null=True)),
+                ('history_type', models.CharField(choices=[('+', 'Created'), ('~', 'Changed'), ('-', 'Deleted')], max_length=1)),
+            ],
+            options={
+                'verbose_name': 'historical contract',
+                'verbose_name_plural': 'historical contracts',
+                'ordering': ('-history_date', '-history_id'),
+                'get_latest_by': ('history_date', 'history_id'),
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+        migrations.CreateModel(
+            name='HistoricalHive',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('hive_type', models.CharField(choices=[('queen', 'With Queen (Paid)'), ('no_queen', 'No Queen (Collective Collaboration)')], max_length=10)),
+                ('hive_requirements', models.TextField()),
+                ('is_public', models.BooleanField(default=False)),
+                ('status', models.CharField(blank=True, default='open', max_length=255)),
+                ('vector_store_id', models.CharField(blank=True, max_length=255)),
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history_date', models.DateTimeField(db_index=True)),
+                ('history_change_reason', models.CharField(max_length=100, null=True)),
+                ('history_type', models.CharField(choices=[('+', 'Created'), ('~', 'Changed'), ('-', 'Deleted')], max_length=1)),
+            ],
+            options={
+                'verbose_name': 'historical hive',
+                'verbose_name_plural': 'historical hives',
+                'ordering': ('-history_date', '-history_id'),
+                'get_latest_by': ('history_date', 'history_id'),
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+        migrations.CreateModel(
+            name='HistoricalHiveRequest',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('is_accepted', models.BooleanField(default=False)),
+                ('applied_at', models.DateTimeField(blank=True, editable=False)),
+                ('accepted_at', models.DateTimeField(blank=True, null=True)),
+                ('motivation', models.TextField(blank=True)),
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history_date', models.DateTimeField(db_index=True)),
+                ('history_change_reason', models.CharField(max_length=100, null=True)),
+                ('history_type', models.CharField(choices=[('+', 'Created'), ('~', 'Changed'), ('-', 'Deleted')], max_length=1)),
+            ],
+            options={
+                'verbose_name': 'historical hive request',
+                'verbose_name_plural': 'historical hive requests',
+                'ordering': ('-history_date', '-history_id'),
+                'get_latest_by': ('history_date', 'history_id'),
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+        migrations.CreateModel(
+            name='HistoricalMembership',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('is_accepted', models.BooleanField(default=False)),
+                ('joined_at', models.DateTimeField(blank=True, editable=False)),
+                ('left_at', models.DateTimeField(blank=True, null=True)),
+                ('honey_points', models.IntegerField(default=0)),
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history_date', models.DateTimeField(db_index=True)),
+                ('history_change_reason', models.CharField(max_length=100, null=True)),
+                ('history_type', models.CharField(choices=[('+', 'Created'), ('~', 'Changed'), ('-', 'Deleted')], max_length=1)),
+            ],
+            options={
+                'verbose_name': 'historical membership',
+                'verbose_name_plural': 'historical memberships',
+                'ordering': ('-history_date', '-history_id'),
+                'get_latest_by': ('history_date', 'history_id'),
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+        migrations.CreateModel(
+            name='HistoricalNectar',
+            fields=[
+                ('id', models.BigIntegerField(auto_created=True, blank=True, db_index=True, verbose_name='ID')),
+                ('nectar_title', models.CharField(max_length=255)),
+                ('nectar_description', models.TextField()),
+                ('is_public', models.BooleanField(default=True)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('duration', models.DurationField(blank=True, null=True)),
+                ('required_skills', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(blank=True, editable=False)),
+                ('updated_at', models.DateTimeField(blank=True, editable=False)),
+                ('deadline', models.DateTimeField(blank=True, null=True)),
+                ('required_bees', models.PositiveIntegerField(blank=True, default=1, null=True)),
+                ('status', models.CharField(blank=True, default='open', max_length=255)),
+                ('history_id', models.AutoField(primary_key=True, serialize=False)),
+                ('history_date', models.DateTimeField(db_index=True)),
+                ('history_change_reason', models.CharField(max_length=100, null=True)),
+                ('history_type', models.CharField(choices=[('+', 'Created'), ('~', 'Changed'), ('-', 'Deleted')], max_length=1)),
+            ],
+            options={
+                'verbose_name': 'historical nectar',
+                'verbose_name_plural': 'historical nectars',
+                'ordering': ('-history_date', '-history_id'),
+                'get_latest_by': ('history_date', 'history_id'),
+            },
+            bases=(simple_history.models.HistoricalChanges, models.Model),
+        ),
+        migrations.CreateModel(
+            name='Hive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField()),
+                ('hive_type', models.CharField(choices=[('queen', 'With Queen (Paid)'), ('no_queen', 'No Queen (Collective Collaboration)')], max_length=10)),
+                ('hive_requirements', models.TextField()),
+                ('is_public', models.BooleanField(default=False)),
+                ('status', models.CharField(blank=True, default='open', max_length=255)),
+                ('vector_store_id', models.CharField(blank=True, max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HiveDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_active_nectars', models.PositiveIntegerField(default=0)),
+                ('total_completed_nectars', models.PositiveIntegerField(default=0)),
+                ('total_open_contracts', models.PositiveIntegerField(default=0)),
+                ('total_contracts', models.PositiveIntegerField(default=0)),
+                ('pending_requests', models.PositiveIntegerField(default=0)),
+                ('pending_contracts', models.PositiveIntegerField(default=0)),
+                ('total_reports', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HiveRequest',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_accepted', models.BooleanField(default=False)),
+                ('applied_at', models.DateTimeField(auto_now_add=True)),
+                ('accepted_at', models.DateTimeField(blank=True, null=True)),
+                ('motivation', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Membership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_accepted', models.BooleanField(default=False)),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('left_at', models.DateTimeField(blank=True, null=True)),
+                ('honey_points', models.IntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Nectar',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nectar_title', models.CharField(max_length=255)),
+                ('nectar_description', models.TextField()),
+                ('is_public', models.BooleanField(default=True)),
+                ('price', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('duration', models.DurationField(blank=True, null=True)),
+                ('required_skills', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('deadline', models.DateTimeField(blank=True, null=True)),
+                ('required_bees', models.PositiveIntegerField(blank=True, default=1, null=True)),
+                ('status', models.CharField(blank=True, default='open', max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Report',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hours', models.FloatField(default=0.0)),
+                ('title', models.CharField(max_length=255)),
+                ('content', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('status', models.CharField(blank=True, max_length=255)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Bee',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bee_bio', models.TextField(blank=True, null=True)),
+                ('bee_type', models.CharField(choices=[('worker', 'Worker'), ('scout', 'Scout'), ('guardian', 'Guardian'), ('queen', 'Queen')], default='worker', max_length=10)),
+                ('documents', models.ManyToManyField(blank=True, related_name='bee_documents', to='common.document')),
+            ],
+        ),
+    ]
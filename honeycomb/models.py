@@ -5,7 +5,7 @@ import openai
 from django.conf import settings
 from django.core.exceptions import ValidationError
 from django.db import models
-from django.db.models import Sum, QuerySet
+from django.db.models import Sum, QuerySet, Count, Q
 from django.utils import timezone
 from openai import OpenAI
 from simple_history.models import HistoricalRecords
@@ -74,6 +74,42 @@ class Hive(models.Model):
             total_honey_points=Sum('membership__honey_points')
         ).order_by('-total_honey_points')
 
+    def get_honey_points_leaderboard(self, limit: int = None, offset: int = 0) -> [('Bee', int)]:
+        from honeycomb.leaderboard import HiveLeaderboard
+        page = HiveLeaderboard(self.id).get_page(limit, offset)
+        if page is None:
+            bees = self.get_bees_ordered_by_honey_points().select_related('user')
+            bees = bees[offset:offset + limit] if limit else bees[offset:]
+            return [(bee, bee.total_honey_points) for bee in bees]
+        bees = Bee.objects.select_related('user').in_bulk([bee_id for bee_id, _ in page])
+        return [(bees[bee_id], honey_points) for bee_id, honey_points in page if bee_id in bees]
+
+    def get_honey_points_ranking(self, limit: int = None, offset: int = 0) -> [(int, 'Bee', int)]:
+        """
+        Leaderboard page with the rank of every bee, ranked like get_bee_rank so equal honey points share a rank.
+        """
+        from honeycomb.leaderboard import HiveLeaderboard, rank_scores
+        leaderboard = self.get_honey_points_leaderboard(limit, offset)
+        if not leaderboard:
+            return []
+        top_points = leaderboard[0][1]
+        above = HiveLeaderboard(self.id).count_above(top_points)
+        if above is None:
+            above = self.get_bees_ordered_by_honey_points().filter(total_honey_points__gt=top_points).count()
+        ranks = rank_scores([honey_points for _, honey_points in leaderboard], offset, above)
+        return [(rank, bee, honey_points) for rank, (bee, honey_points) in zip(ranks, leaderboard)]
+
+    def get_bee_rank(self, bee: 'Bee') -> Union[int, None]:
+        from honeycomb.leaderboard import HiveLeaderboard
+        rank = HiveLeaderboard(self.id).get_rank(bee.id)
+        if rank is None:
+            bees = self.get_bees_ordered_by_honey_points()
+            honey_points = bees.filter(pk=bee.pk).values_list('total_honey_points', flat=True).first()
+            if honey_points is None:
+                return None
+            rank = bees.filter(total_honey_points__gt=honey_points).count() + 1
+        return rank
+
     def is_admin_by_user(self, user: settings.AUTH_USER_MODEL) -> bool:
         return user in self.admins.all()
 
@@ -98,13 +134,8 @@ class Hive(models.Model):
         return self.name
 
     def convert_to_ai_readable(self):
-        return f"""
-        Name: {self.name}
-        Description: {self.description}
-        Hive type: {self.hive_type}
-        Hive requirements: {self.hive_requirements}
-        hive documents: {[document.convert_to_ai_readable() for document in self.documents.all()]}
-        """
+        from ai.context import AIContextBuilder
+        return AIContextBuilder().render_object(self)
 
 
 class Bee(models.Model):
@@ -123,9 +154,8 @@ class Bee(models.Model):
         return self.user.email
 
     def convert_to_ai_readable(self):
-        return f"""user information : {self.user.convert_to_ai_readable()}
-         bee id: {self.id}
-         """
+        from ai.context import AIContextBuilder
+        return AIContextBuilder().render_object(self)
 
 
 
@@ -211,16 +241,8 @@ class Nectar(models.Model):
         return self.nectar_title
 
     def convert_to_ai_readable(self):
-        return f"""
-        Title: {self.nectar_title}
-        Description: {self.nectar_description}
-        required skills for this nectar: {self.required_skills}
-        Price: {self.price}
-        Duration: {self.duration}
-        Deadline: {self.deadline}
-        documents: {[document.convert_to_ai_readable() for document in self.documents.all()]}
-        tags: {self.tags.all()}
-        """
+        from ai.context import AIContextBuilder
+        return AIContextBuilder().render_object(self)
 
 
 class HiveRequest(models.Model):
@@ -323,12 +345,8 @@ class Contract(models.Model):
         return f"Application for {self.nectar} by {self.bee}"
 
     def convert_to_ai_readable(self):
-        return f"""
-        Contract for {self.nectar.convert_to_ai_readable()} by {self.bee.convert_to_ai_readable()}.
-        accepted rate : {self.accepted_rate}
-        documents: {[document.convert_to_ai_readable() for document in self.documents.all()]}
-        is accepted : {self.is_accepted}
-        """
+        from ai.context import AIContextBuilder
+        return AIContextBuilder().render_object(self)
 
 class ReportManager(models.Manager):
     def for_hive(self, hive: 'Hive') -> QuerySet['Report']:
@@ -356,10 +374,105 @@ class Report(models.Model):
     objects = ReportManager()
 
     def convert_to_ai_readable(self):
-        return f"""
-        Report for {self.hive.convert_to_ai_readable()} by {self.bee.convert_to_ai_readable()}.
-        title : {self.title}
-        content : {self.content}
-        documents: {[document.convert_to_ai_readable() for document in self.documents.all()]}
-        status : {self.status}
-        """
\ No newline at end of file
+        from ai.context import AIContextBuilder
+        return AIContextBuilder().render_object(self)
+
+
+class HiveDashboardManager(models.Manager):
+    def compute_for_hive(self, hive_id: int) -> dict:
+        nectar_counts = Nectar.objects.filter(nectar_hive_id=hive_id).aggregate(
+            total_active_nectars=Count('id', filter=Q(status='Active')),
+            total_completed_nectars=Count('id', filter=Q(status='Complete')),
+        )
+        contract_counts = Contract.objects.filter(nectar__nectar_hive_id=hive_id).aggregate(
+            total_open_contracts=Count('id', filter=Q(is_accepted=True, completed_at__isnull=True)),
+            total_contracts=Count('id'),
+            pending_contracts=Count('id', filter=Q(is_accepted=False)),
+        )
+        return {
+            **nectar_counts,
+            **contract_counts,
+            'pending_requests': HiveRequest.objects.filter(hive_id=hive_id, is_accepted=False).count(),
+            'total_reports': Report.objects.filter(hive_id=hive_id).count(),
+        }
+
+    def refresh_for_hive(self, hive_id: int) -> None:
+        # Only existing rows are refreshed on writes, rows are created lazily on first read or by
+        # the rebuild_hive_dashboards command. This keeps cascading hive deletes from recreating them.
+        if hive_id is None or not self.filter(hive_id=hive_id).exists():
+            return
+        self.filter(hive_id=hive_id).update(updated_at=timezone.now(), **self.compute_for_hive(hive_id))
+
+    def get_or_build(self, hive: 'Hive') -> 'HiveDashboard':
+        dashboard = self.filter(hive=hive).first()
+        if dashboard is None:
+            dashboard, _ = self.get_or_create(hive=hive, defaults=self.compute_for_hive(hive.id))
+        return dashboard
+
+
+class HiveDashboard(models.Model):
+    """
+    Precomputed per-hive counters used by the hive dashboard endpoint.
+    Kept current by the honeycomb signals on Nectar, Contract, HiveRequest and Report writes.
+    """
+    hive = models.OneToOneField(Hive, on_delete=models.CASCADE, related_name='dashboard')
+    total_active_nectars = models.PositiveIntegerField(default=0)
+    total_completed_nectars = models.PositiveIntegerField(default=0)
+    total_open_contracts = models.PositiveIntegerField(default=0)
+    total_contracts = models.PositiveIntegerField(default=0)
+    pending_requests = models.PositiveIntegerField(default=0)
+    pending_contracts = models.PositiveIntegerField(default=0)
+    total_reports = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = HiveDashboardManager()
+
+    COUNTER_FIELDS = (
+        'total_active_nectars',
+        'total_completed_nectars',
+        'total_open_contracts',
+        'total_contracts',
+        'pending_requests',
+        'pending_contracts',
+        'total_reports',
+    )
+
+    def get_counters(self) -> dict:
+        return {field: getattr(self, field) for field in self.COUNTER_FIELDS}
+
+    def __str__(self):
+        return f"Dashboard of {self.hive}"
+
+
+class CVIngestion(models.Model):
+    """
+    Checkpoint of a CV file processed by the create_user_from_cv command. A rerun resumes every file after the
+    last stage it finished, files that already became a bee are skipped.
+    """
+    STAGE_PENDING = 'pending'
+    STAGE_UPLOADED = 'uploaded'
+    STAGE_INDEXED = 'indexed'
+    STAGE_EXTRACTED = 'extracted'
+    STAGE_CHOICES = [
+        (STAGE_PENDING, 'Pending'),
+        (STAGE_UPLOADED, 'Uploaded'),
+        (STAGE_INDEXED, 'Indexed'),
+        (STAGE_EXTRACTED, 'Extracted'),
+    ]
+
+    file_path = models.CharField(max_length=500, unique=True)
+    stage = models.CharField(max_length=20, choices=STAGE_CHOICES, default=STAGE_PENDING)
+    document = models.ForeignKey(COMMON_DOCUMENT_MODEL, on_delete=models.SET_NULL, related_name='cv_ingestions',
+                                 blank=True, null=True)
+    vector_store_id = models.CharField(max_length=255, blank=True)
+    error = models.TextField(blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def is_failed(self) -> bool:
+        return bool(self.error)
+
+    def __str__(self):
+        return f"{self.file_path} ({self.stage})"
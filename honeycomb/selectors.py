@@ -21,3 +21,32 @@ def get_hive_related_documents(hive_id: int):
     combined_documents = combined_documents.distinct()
 
     return combined_documents
+
+
+def get_vector_store_documents(vector_store_id: str):
+    """
+    Return every document that belongs to the vector store, None if the vector store is unknown.
+    The base vector store holds the bee documents, the hive vector stores the hive related documents.
+    """
+    from ai.models import AssistantInfo
+    from honeycomb.models import Hive
+    hive_id = Hive.objects.filter(vector_store_id=vector_store_id).values_list('id', flat=True).first()
+    if hive_id:
+        return get_hive_related_documents(hive_id)
+    if AssistantInfo.objects.filter(base_vector_store_id=vector_store_id).exists():
+        return Document.objects.filter(bee_documents__isnull=False).distinct()
+    return None
+
+
+def get_document_vector_store_ids(document_id: int) -> [str]:
+    """
+    Return the ids of the vector stores the document belongs to, the inverse of get_vector_store_documents.
+    """
+    from ai.models import AssistantInfo
+    from honeycomb.models import Hive
+    hive_ids = set(Hive.objects.filter(documents=document_id).values_list('id', flat=True))
+    hive_ids |= set(Task.objects.filter(documents=document_id).values_list('contract__nectar__nectar_hive', flat=True))
+    vector_store_ids = list(Hive.objects.filter(id__in=hive_ids).values_list('vector_store_id', flat=True))
+    if Document.objects.filter(id=document_id, bee_documents__isnull=False).exists():
+        vector_store_ids.append(AssistantInfo.objects.values_list('base_vector_store_id', flat=True).first())
+    return [vector_store_id for vector_store_id in vector_store_ids if vector_store_id]
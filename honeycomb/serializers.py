@@ -1,8 +1,9 @@
+from django.db import models
 from rest_framework import serializers
 from taggit.serializers import TagListSerializerField
 
 from common.models import Document
-from common.serializers import DocumentSerializer
+from common.serializers import DocumentSerializer, EagerLoadingMixin
 from user.serializers import UserSerializer
 from .models import Hive, Bee, Membership, Nectar, HiveRequest, Contract, Report
 
@@ -13,7 +14,7 @@ class BeeSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class BeeWithDetailSerializer(serializers.ModelSerializer):
+class BeeWithDetailSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     user = UserSerializer()
 
     class Meta:
@@ -21,7 +22,7 @@ class BeeWithDetailSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class HiveWiThDetailsSerializer(serializers.ModelSerializer):
+class HiveWiThDetailsSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     hive_bees = BeeWithDetailSerializer(many=True)
 
     uploaded_documents = DocumentSerializer(many=True, read_only=True, source='documents')
@@ -31,9 +32,11 @@ class HiveWiThDetailsSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class NectarContractSerializer(serializers.ModelSerializer):
+class NectarContractSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     bee = serializers.SerializerMethodField()
 
+    method_field_serializers = {'bee': BeeSerializer}
+
     class Meta:
         model = Contract
         fields = '__all__'
@@ -44,7 +47,14 @@ class NectarContractSerializer(serializers.ModelSerializer):
         else:
             return None  # Or provide some default data
 
-class NectarSerializer(serializers.ModelSerializer):
+class NectarListSerializer(serializers.ListSerializer):
+    def to_representation(self, data):
+        nectars = list(data.all() if isinstance(data, models.Manager) else data)
+        self.child.resolve_applications(nectars)
+        return super().to_representation(nectars)
+
+
+class NectarSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     nectar_hive = HiveWiThDetailsSerializer(read_only=True)
     tags = TagListSerializerField()
     documents = serializers.ListField(
@@ -60,27 +70,45 @@ class NectarSerializer(serializers.ModelSerializer):
     class Meta:
         model = Nectar
         fields = '__all__'
+        list_serializer_class = NectarListSerializer
 
-    def get_has_application(self, obj):
+    def get_request_user(self):
         request = self.context.get('request')
-        if request and hasattr(request, 'user'):
-            user = request.user
-            contract = Contract.objects.filter(bee__user=user, nectar=obj).exists()
-            if not contract:
-                return False
-            else:
-                contract = Contract.objects.get(bee__user=user, nectar=obj)
-                if contract.is_accepted:
-                    return {'has_accepted': True}
-                else:
-                    return True
-        return False
+        user = getattr(request, 'user', None)
+        return user if user is not None and user.is_authenticated else None
+
+    def resolve_applications(self, nectars):
+        """
+        Fetch the contracts of the requesting user for all given nectars in one query.
+        The result is kept in the serializer context, None means the user has no contract for the nectar.
+        """
+        user = self.get_request_user()
+        if user is None:
+            return
+        applications = self.context.setdefault('nectar_applications', {})
+        nectar_ids = [nectar.id for nectar in nectars if nectar.id not in applications]
+        if not nectar_ids:
+            return
+        applications.update(dict.fromkeys(nectar_ids))
+        contracts = Contract.objects.filter(bee__user=user, nectar_id__in=nectar_ids)
+        for nectar_id, is_accepted in contracts.values_list('nectar_id', 'is_accepted'):
+            applications[nectar_id] = applications[nectar_id] or is_accepted
+
+    def get_has_application(self, obj):
+        if self.get_request_user() is None:
+            return False
+        if obj.id not in self.context.get('nectar_applications', {}):
+            self.resolve_applications([obj])
+        is_accepted = self.context['nectar_applications'][obj.id]
+        if is_accepted is None:
+            return False
+        return {'has_accepted': True} if is_accepted else True
 
 
 
 
 
-class HiveRequestSerializer(serializers.ModelSerializer):
+class HiveRequestSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     bee = BeeWithDetailSerializer(read_only=True)
     hive = HiveWiThDetailsSerializer(read_only=True)
 
@@ -89,10 +117,12 @@ class HiveRequestSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ContractSerializer(serializers.ModelSerializer):
+class ContractSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     bees_with_detail = serializers.SerializerMethodField()
     nectar = NectarSerializer(read_only=True)
 
+    method_field_serializers = {'bee': BeeWithDetailSerializer}
+
     class Meta:
         model = Contract
         fields = '__all__'
@@ -112,7 +142,7 @@ class MembershipSubmitSerializer(serializers.Serializer):
     hive = serializers.IntegerField(required=True)
 
 
-class HiveSerializer(serializers.ModelSerializer):
+class HiveSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     tags = TagListSerializerField()
     admins = UserSerializer(many=True, read_only=True)
     hive_bees = BeeSerializer(many=True, read_only=True)
@@ -189,7 +219,7 @@ class CreateContractSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
-class ReportSerializer(serializers.ModelSerializer):
+class ReportSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     hive = HiveSerializer(read_only=True)
     nectar = NectarSerializer(read_only=True)
     bee = BeeWithDetailSerializer(read_only=True)
@@ -266,7 +296,7 @@ class CreateNectarSerializer(serializers.ModelSerializer):
         return instance
 
 
-class MembershipSerializer(serializers.ModelSerializer):
+class MembershipSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     hive = HiveSerializer(read_only=True)
     bee = BeeWithDetailSerializer(read_only=True)
     assigned_tasks = serializers.SerializerMethodField()
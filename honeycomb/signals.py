@@ -1,14 +1,20 @@
 # myapp/signals.py
 from django.conf import settings
-from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete, m2m_changed, pre_save
 from django.dispatch import receiver
 from openai import OpenAI
 
 from ai.helpers import AIBaseClass
-from ai.models import AssistantInfo
+from common.cache import connect_model_versions
+from common.models import Document
 from communication.models import Notification, Conversation
-from honeycomb.tasks import sync_hive_vector_store
-from .models import Hive, Membership, Nectar, HiveRequest, Contract, Report, Bee
+from communication.services import NotificationService
+from honeycomb.selectors import get_document_vector_store_ids
+from honeycomb.tasks import schedule_vector_store_sync
+from .leaderboard import HiveLeaderboard, UserLeaderboard
+from .models import Hive, Membership, Nectar, HiveRequest, Contract, Report, Bee, HiveDashboard
 
 client = OpenAI(api_key=settings.OPEN_AI_API_KEY)
 
@@ -30,30 +36,27 @@ def membership_created(sender, instance, created, **kwargs):
 def nectar_created(sender, instance, created, **kwargs):
     if created:
         # Notify hive admins of the new nectar
-        for admin in instance.nectar_hive.admins.all():
-            Notification.objects.create(
-                user=admin,
-                message=f"A new nectar '{instance.nectar_title}' has been created in hive '{instance.nectar_hive.name}'.",
-                notification_type='info'
-            )
-        for bee in instance.nectar_hive.get_hive_bees():
-            Notification.objects.create(
-                user=bee.user,
-                message=f"Nectar '{instance.nectar_title}' in hive '{instance.nectar_hive.name} posted'.",
-                notification_type='info'
-            )
+        NotificationService.notify_users(
+            instance.nectar_hive.admins.values_list('id', flat=True),
+            message=f"A new nectar '{instance.nectar_title}' has been created in hive '{instance.nectar_hive.name}'.",
+            notification_type='info'
+        )
+        NotificationService.notify_users(
+            instance.nectar_hive.get_hive_bees().values_list('user_id', flat=True),
+            message=f"Nectar '{instance.nectar_title}' in hive '{instance.nectar_hive.name} posted'.",
+            notification_type='info'
+        )
 
 
 @receiver(post_save, sender=HiveRequest)
 def hive_request_created(sender, instance, created, **kwargs):
     if created:
         # Notify hive admins of the new hive request
-        for admin in instance.hive.admins.all():
-            Notification.objects.create(
-                user=admin,
-                message=f"A new membership request for hive '{instance.hive.name}' has been submitted by '{instance.bee.user.email}'.",
-                notification_type='info'
-            )
+        NotificationService.notify_users(
+            instance.hive.admins.values_list('id', flat=True),
+            message=f"A new membership request for hive '{instance.hive.name}' has been submitted by '{instance.bee.user.email}'.",
+            notification_type='info'
+        )
 
 
 @receiver(post_save, sender=Membership)
@@ -83,24 +86,22 @@ def membership_status_changed(sender, instance, created, **kwargs):
 def contract_created(sender, instance, created, **kwargs):
     if created:
         # Notify nectar hive admins of the new contract
-        for admin in instance.nectar.nectar_hive.admins.all():
-            Notification.objects.create(
-                user=admin,
-                message=f"A new contract for nectar '{instance.nectar.nectar_title}' has been submitted by '{instance.bee.user.email}'.",
-                notification_type='info'
-            )
+        NotificationService.notify_users(
+            instance.nectar.nectar_hive.admins.values_list('id', flat=True),
+            message=f"A new contract for nectar '{instance.nectar.nectar_title}' has been submitted by '{instance.bee.user.email}'.",
+            notification_type='info'
+        )
 
 
 @receiver(post_save, sender=Report)
 def report_created(sender, instance, created, **kwargs):
     if created:
         # Notify hive admins of the new report
-        for admin in instance.hive.admins.all():
-            Notification.objects.create(
-                user=admin,
-                message=f"A new report '{instance.title}' has been created in hive '{instance.hive.name}'.",
-                notification_type='info'
-            )
+        NotificationService.notify_users(
+            instance.hive.admins.values_list('id', flat=True),
+            message=f"A new report '{instance.title}' has been created in hive '{instance.hive.name}'.",
+            notification_type='info'
+        )
 
 
 @receiver(post_delete, sender=Membership)
@@ -146,7 +147,16 @@ def sync_vector_store(sender, instance, created, **kwargs):
         instance.save()
     else:
         # Sync vector store if it already exists
-        sync_hive_vector_store.delay(vector_store_id=instance.vector_store_id, hive_id=instance.id)
+        schedule_vector_store_sync(instance.vector_store_id)
+
+
+@receiver(m2m_changed, sender=Hive.documents.through)
+def sync_hive_files(sender, instance, action, reverse, model, pk_set, **kwargs):
+    if settings.IS_TEST:
+        return
+
+    if action in ("post_add", "post_remove", "post_clear") and not reverse:
+        schedule_vector_store_sync(instance.vector_store_id)
 
 
 @receiver(m2m_changed, sender=Bee.documents.through)
@@ -154,6 +164,89 @@ def sync_bee_files(sender, instance, action, reverse, model, pk_set, **kwargs):
     if settings.IS_TEST:
         return
 
-    if action == "post_add" or action == "post_remove":
-        base_vector_store = AssistantInfo.objects.first().base_vector_store_id
-        AIBaseClass().add_documents_to_vector_store(base_vector_store, instance.documents.all())
+    if action in ("post_add", "post_remove", "post_clear"):
+        schedule_vector_store_sync(AIBaseClass.get_or_create_assistant_info_model_object().base_vector_store_id)
+
+
+@receiver(post_save, sender=Document)
+def sync_document_files(sender, instance, created, update_fields=None, **kwargs):
+    if settings.IS_TEST:
+        return
+
+    # Documents are uploaded in the background, their vector stores are synced once the file_id is known
+    if update_fields and 'file_id' in update_fields:
+        for vector_store_id in get_document_vector_store_ids(instance.id):
+            schedule_vector_store_sync(vector_store_id)
+
+
+def get_dashboard_hive_id(instance):
+    if isinstance(instance, Contract):
+        return Nectar.objects.filter(id=instance.nectar_id).values_list('nectar_hive_id', flat=True).first()
+    if isinstance(instance, Nectar):
+        return instance.nectar_hive_id
+    return instance.hive_id
+
+
+# Lookup of the hive a dashboard row belongs to, read from the database before the row is saved
+DASHBOARD_HIVE_LOOKUPS = {
+    Nectar: 'nectar_hive_id',
+    Contract: 'nectar__nectar_hive_id',
+    HiveRequest: 'hive_id',
+    Report: 'hive_id',
+}
+
+
+@receiver(pre_save, sender=Nectar)
+@receiver(pre_save, sender=Contract)
+@receiver(pre_save, sender=HiveRequest)
+@receiver(pre_save, sender=Report)
+def remember_dashboard_hive(sender, instance, **kwargs):
+    # Rows can be moved to another hive, the previous hive dashboard has to be refreshed too
+    instance._previous_dashboard_hive_id = None
+    if instance.pk:
+        instance._previous_dashboard_hive_id = sender.objects.filter(pk=instance.pk).values_list(
+            DASHBOARD_HIVE_LOOKUPS[sender], flat=True).first()
+
+
+@receiver(post_save, sender=Nectar)
+@receiver(post_save, sender=Contract)
+@receiver(post_save, sender=HiveRequest)
+@receiver(post_save, sender=Report)
+@receiver(post_delete, sender=Nectar)
+@receiver(post_delete, sender=Contract)
+@receiver(post_delete, sender=HiveRequest)
+@receiver(post_delete, sender=Report)
+def refresh_hive_dashboard(sender, instance, **kwargs):
+    hive_ids = {get_dashboard_hive_id(instance), getattr(instance, '_previous_dashboard_hive_id', None)}
+    for hive_id in hive_ids - {None}:
+        HiveDashboard.objects.refresh_for_hive(hive_id)
+
+
+# Leaderboards are written once the transaction commits, a rollback must not leave redis ahead of the database
+@receiver(post_save, sender=Membership)
+def update_hive_leaderboard(sender, instance, **kwargs):
+    hive_id, bee_id, honey_points = instance.hive_id, instance.bee_id, instance.honey_points
+    transaction.on_commit(lambda: HiveLeaderboard(hive_id).update(bee_id, honey_points))
+
+
+@receiver(post_delete, sender=Membership)
+def remove_from_hive_leaderboard(sender, instance, **kwargs):
+    hive_id, bee_id = instance.hive_id, instance.bee_id
+    transaction.on_commit(lambda: HiveLeaderboard(hive_id).remove(bee_id))
+
+
+@receiver(post_save, sender=get_user_model())
+def update_user_leaderboard(sender, instance, **kwargs):
+    user_id, points = instance.id, instance.points
+    transaction.on_commit(lambda: UserLeaderboard().update(user_id, points))
+
+
+@receiver(post_delete, sender=get_user_model())
+def remove_from_user_leaderboard(sender, instance, **kwargs):
+    user_id = instance.id
+    transaction.on_commit(lambda: UserLeaderboard().remove(user_id))
+
+
+# Versions of the cached honeycomb responses, they embed the documents of the honeycomb models as well
+connect_model_versions('honeycomb')
+connect_model_versions('common')
@@ -1,18 +1,41 @@
-import asyncio
-
 from celery import shared_task
 from django.conf import settings
-from openai import OpenAI
+from django.db import transaction
 
 from ai.helpers import AIBaseClass
-from honeycomb.selectors import get_hive_related_documents
+from ai.models import PendingVectorStoreSync
+from honeycomb.selectors import get_hive_related_documents, get_vector_store_documents
+
+
+def schedule_vector_store_sync(vector_store_id: str) -> None:
+    """
+    Sync the vector store after VECTOR_STORE_SYNC_DEBOUNCE seconds, changes until then share the same job.
+    The job is claimed once the transaction commits, a rolled back change neither syncs nor delays later ones.
+    """
+    if not vector_store_id:
+        return
+
+    def queue_sync():
+        if PendingVectorStoreSync.objects.claim(vector_store_id, stale_after=settings.VECTOR_STORE_SYNC_DEBOUNCE * 10):
+            sync_vector_store.apply_async(kwargs={'vector_store_id': vector_store_id},
+                                          countdown=settings.VECTOR_STORE_SYNC_DEBOUNCE)
 
-client = OpenAI(api_key=settings.OPEN_AI_API_KEY)
+    transaction.on_commit(queue_sync)
+
+
+@shared_task
+def sync_vector_store(vector_store_id):
+    # Changes made while this job runs schedule the next one
+    PendingVectorStoreSync.objects.release(vector_store_id)
+    documents = get_vector_store_documents(vector_store_id)
+    if documents is None:
+        print(f"Skipped sync of unknown vector store {vector_store_id}")
+        return
+    AIBaseClass().add_documents_to_vector_store(vector_store_id, documents, remove_missing=True)
 
 
 @shared_task
 def sync_hive_vector_store(vector_store_id, hive_id):
     # Get the vector store, check the file_ids, add new files if any
     related_documents = get_hive_related_documents(hive_id)
-    AIBaseClass().add_documents_to_vector_store(vector_store_id, related_documents)
-
+    AIBaseClass().add_documents_to_vector_store(vector_store_id, related_documents, remove_missing=True)
@@ -1,8 +1,28 @@
+import os
+import shutil
+import tempfile
+import threading
+from io import StringIO
+from unittest import mock
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.test import TestCase
+from django.core.management import call_command, CommandError
+from django.db import DatabaseError, connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from .models import Hive, Bee, Membership, Nectar, HiveRequest, Contract
+from ai.testing import FakeOpenAIServer
+from common.db_routers import ReplicaRouter, is_replica_read, start_replica_reads, stop_replica_reads
+from communication.models import Notification
+from .cv_ingestion import CVIngestionPipeline
+from .leaderboard import get_redis_client
+from .serializers import NectarSerializer, HiveSerializer
+from .models import Hive, Bee, Membership, Nectar, HiveRequest, Contract, HiveDashboard, CVIngestion
 
 User = get_user_model()
 
@@ -159,3 +179,520 @@ class HiveBeePlatformTests(TestCase):
         contract = self.nectar.submit_contract(self.bee1)
         with self.assertRaises(ValidationError):
             contract.accept_application(user=self.user3)
+
+
+class HiveDashboardTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin1@example.com', password='pass')
+        self.bee = Bee.objects.create(user=User.objects.create_user(email='bee1@example.com', password='pass'))
+        self.hive = Hive.objects.create(name='Hive', description='A hive for testing', hive_type='queen')
+        self.hive.admins.add(self.admin)
+        self.dashboard = HiveDashboard.objects.get_or_build(self.hive)
+
+    def test_dashboard_counters_follow_writes(self):
+        """
+        Test Scenario: Nectars, contracts and hive requests are written after the dashboard was built.
+
+        This test ensures that the precomputed counters are refreshed by the signals
+        and match a full recount of the hive.
+        """
+        nectar = Nectar.objects.create(nectar_title='Nectar', nectar_description='Nectar', nectar_hive=self.hive,
+                                       status='Active')
+        contract = nectar.submit_contract(self.bee)
+        self.hive.submit_membership_application(self.bee)
+
+        self.dashboard.refresh_from_db()
+        self.assertEqual(self.dashboard.total_active_nectars, 1)
+        self.assertEqual(self.dashboard.total_contracts, 1)
+        self.assertEqual(self.dashboard.pending_contracts, 1)
+        self.assertEqual(self.dashboard.pending_requests, 1)
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        response = client.get(f'/honeycomb/hives/{self.hive.id}/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual({field: response.data[field] for field in HiveDashboard.COUNTER_FIELDS},
+                         self.dashboard.get_counters())
+
+        contract.delete()
+        self.dashboard.refresh_from_db()
+        self.assertEqual(self.dashboard.total_contracts, 0)
+        self.assertEqual(self.dashboard.get_counters(), HiveDashboard.objects.compute_for_hive(self.hive.id))
+
+    def test_moved_contract_refreshes_both_hives(self):
+        """
+        Test Scenario: A contract is moved to a nectar of another hive and a hive request to another hive.
+
+        This test ensures that the dashboards of the previous hives lose the moved rows and the ones of the
+        new hives gain them.
+        """
+        other_hive = Hive.objects.create(name='Other Hive', description='Another hive', hive_type='queen')
+        other_dashboard = HiveDashboard.objects.get_or_build(other_hive)
+        nectar = Nectar.objects.create(nectar_title='Nectar', nectar_description='Nectar', nectar_hive=self.hive,
+                                       status='Active')
+        other_nectar = Nectar.objects.create(nectar_title='Other', nectar_description='Other',
+                                             nectar_hive=other_hive, status='Active')
+        contract = nectar.submit_contract(self.bee)
+        self.hive.submit_membership_application(self.bee)
+
+        contract.nectar = other_nectar
+        contract.save()
+        hive_request = HiveRequest.objects.get(hive=self.hive, bee=self.bee)
+        hive_request.hive = other_hive
+        hive_request.save()
+
+        for dashboard, hive in ((self.dashboard, self.hive), (other_dashboard, other_hive)):
+            dashboard.refresh_from_db()
+            self.assertEqual(dashboard.get_counters(), HiveDashboard.objects.compute_for_hive(hive.id))
+        self.assertEqual((self.dashboard.total_contracts, self.dashboard.pending_requests), (0, 0))
+        self.assertEqual((other_dashboard.total_contracts, other_dashboard.pending_requests), (1, 1))
+
+    def test_rebuild_command_repairs_drift(self):
+        """
+        Test Scenario: Dashboard counters drifted because of a write that bypassed the signals.
+
+        This test ensures that the rebuild command reports the drift in check mode
+        and repairs the counters otherwise.
+        """
+        HiveDashboard.objects.filter(hive=self.hive).update(total_contracts=42)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_hive_dashboards', '--check', stdout=StringIO())
+        call_command('rebuild_hive_dashboards', stdout=StringIO())
+
+        self.dashboard.refresh_from_db()
+        self.assertEqual(self.dashboard.total_contracts, 0)
+
+
+class LeaderboardTests(TestCase):
+
+    def setUp(self):
+        client = get_redis_client()
+        for key in client.scan_iter(f"{settings.LEADERBOARD_KEY_PREFIX}:*"):
+            client.delete(key)
+
+        self.hive = Hive.objects.create(name='Hive', description='A hive for testing', hive_type='queen')
+        self.bees = [Bee.objects.create(user=User.objects.create_user(email=f'bee{i}@example.com', password='pass'))
+                     for i in range(3)]
+        self.memberships = [Membership.objects.create(hive=self.hive, bee=bee, is_accepted=True, honey_points=points)
+                            for bee, points in zip(self.bees, [10, 30, 20])]
+
+    def test_hive_leaderboard_follows_honey_points(self):
+        """
+        Test Scenario: Honey points of a membership change after the leaderboard was built.
+
+        This test ensures that the hive leaderboard orders bees by honey points and that
+        a membership update moves the bee without rebuilding the index.
+        """
+        ranking = [(bee.id, points) for bee, points in self.hive.get_honey_points_leaderboard()]
+        self.assertEqual(ranking, [(self.bees[1].id, 30), (self.bees[2].id, 20), (self.bees[0].id, 10)])
+
+        self.memberships[0].honey_points = 50
+        with self.captureOnCommitCallbacks(execute=True):
+            self.memberships[0].save()
+        self.assertEqual(self.hive.get_bee_rank(self.bees[0]), 1)
+        self.assertEqual(self.hive.get_honey_points_leaderboard(limit=1, offset=1)[0][0], self.bees[1])
+
+    def test_user_rank_follows_points(self):
+        """
+        Test Scenario: A user earns points after the global leaderboard was built.
+
+        This test ensures that the user rank is read from the leaderboard and kept
+        current when the user points change.
+        """
+        users = [bee.user for bee in self.bees]
+        self.assertEqual(users[0].get_rank(), 1)
+        users[0].points = 3
+        with self.captureOnCommitCallbacks(execute=True):
+            users[0].save()
+        self.assertEqual(users[0].get_rank(), 1)
+        self.assertEqual(users[1].get_rank(), 2)
+
+        users[1].points = 5
+        with self.captureOnCommitCallbacks(execute=True):
+            users[1].save()
+        self.assertEqual(users[1].get_rank(), 1)
+        self.assertEqual(users[0].get_rank(), 2)
+
+    def test_rolled_back_points_do_not_reach_the_leaderboard(self):
+        """
+        Test Scenario: Honey points of a membership change inside a transaction that is rolled back.
+
+        This test ensures that the leaderboard is only written once the transaction commits.
+        """
+        self.assertEqual(self.hive.get_bee_rank(self.bees[0]), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self.memberships[0].honey_points = 50
+                    self.memberships[0].save()
+                    raise ValueError('rolled back')
+            except ValueError:
+                pass
+        self.assertEqual(self.hive.get_bee_rank(self.bees[0]), 3)
+
+    def test_leaderboard_page_ranks_ties_like_bee_rank(self):
+        """
+        Test Scenario: Two bees have the same honey points and the second one starts a leaderboard page.
+
+        This test ensures that the ranks of the leaderboard action match get_bee_rank for tied bees.
+        """
+        self.memberships[2].honey_points = 30
+        with self.captureOnCommitCallbacks(execute=True):
+            self.memberships[2].save()
+        client = APIClient()
+        client.force_authenticate(self.bees[0].user)
+
+        ranks = {row['bee_id']: row['rank'] for row in
+                 client.get(f'/honeycomb/hives/{self.hive.id}/leaderboard/').json()}
+        self.assertEqual(ranks, {self.bees[1].id: 1, self.bees[2].id: 1, self.bees[0].id: 3})
+        page = client.get(f'/honeycomb/hives/{self.hive.id}/leaderboard/?limit=1&offset=1').json()
+        self.assertEqual(page[0]['rank'], self.hive.get_bee_rank(Bee.objects.get(id=page[0]['bee_id'])))
+        self.assertEqual(page[0]['rank'], 1)
+
+    def test_unavailable_redis_falls_back_to_the_database(self):
+        """
+        Test Scenario: Redis is unreachable while honey points change and the ranks are read.
+
+        This test ensures that the failures are logged and that the ranks, the leaderboard page and the user
+        rank are read from the database ordering instead.
+        """
+        unreachable = redis.Redis(port=1)
+        with mock.patch('honeycomb.leaderboard.get_redis_client', return_value=unreachable), \
+                self.assertLogs('honeycomb.leaderboard', 'ERROR') as logs:
+            self.memberships[0].honey_points = 50
+            with self.captureOnCommitCallbacks(execute=True):
+                self.memberships[0].save()
+            self.assertEqual(self.hive.get_bee_rank(self.bees[0]), 1)
+            self.assertEqual(self.hive.get_bee_rank(self.bees[2]), 3)
+            ranking = [(rank, bee.id) for rank, bee, _ in self.hive.get_honey_points_ranking(limit=2, offset=1)]
+            self.assertEqual(ranking, [(2, self.bees[1].id), (3, self.bees[2].id)])
+            self.assertEqual(self.bees[0].user.get_rank(), 1)
+        self.assertIn('Failed to update leaderboard', logs.output[0])
+
+    def test_missed_write_rebuilds_the_leaderboard(self):
+        """
+        Test Scenario: The update of a built leaderboard fails while redis itself stays reachable.
+
+        This test ensures that the stale sorted set is discarded and rebuilt from the database on the next read.
+        """
+        self.assertEqual(self.hive.get_bee_rank(self.bees[0]), 3)
+        client = get_redis_client()
+        with mock.patch.object(client, 'eval', side_effect=redis.ConnectionError('lost')), \
+                self.assertLogs('honeycomb.leaderboard', 'ERROR'):
+            self.memberships[0].honey_points = 50
+            with self.captureOnCommitCallbacks(execute=True):
+                self.memberships[0].save()
+        self.assertEqual(self.hive.get_bee_rank(self.bees[0]), 1)
+
+
+class EagerLoadingTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin1@example.com', password='pass')
+        self.hive = Hive.objects.create(name='Hive', description='A hive for testing', hive_type='queen')
+        self.hive.admins.add(self.admin)
+        self.hive.tags.add('testing')
+
+    def add_nectar_with_contract(self, index):
+        bee = Bee.objects.create(user=User.objects.create_user(email=f'bee{index}@example.com', password='pass'))
+        Membership.objects.create(hive=self.hive, bee=bee, is_accepted=True)
+        nectar = Nectar.objects.create(nectar_title=f'Nectar {index}', nectar_description='Nectar',
+                                       nectar_hive=self.hive)
+        nectar.tags.add('testing')
+        nectar.submit_contract(bee)
+
+    def count_serializer_queries(self, serializer_class, queryset):
+        with CaptureQueriesContext(connection) as context:
+            serializer_class(serializer_class.setup_eager_loading(queryset), many=True).data
+        return len(context)
+
+    def test_serializer_query_count_is_fixed(self):
+        """
+        Test Scenario: Nectar and hive lists grow while being serialized with their eager loading plan.
+
+        This test ensures that the number of queries needed to serialize the nested
+        nectar and hive graphs does not depend on the number of rows.
+        """
+        self.add_nectar_with_contract(0)
+        nectar_queries = self.count_serializer_queries(NectarSerializer, Nectar.objects.all())
+        hive_queries = self.count_serializer_queries(HiveSerializer, Hive.objects.all())
+
+        for index in range(1, 5):
+            self.add_nectar_with_contract(index)
+        Hive.objects.create(name='Other Hive', description='Another hive', hive_type='queen')
+
+        self.assertEqual(self.count_serializer_queries(NectarSerializer, Nectar.objects.all()), nectar_queries)
+        self.assertEqual(self.count_serializer_queries(HiveSerializer, Hive.objects.all()), hive_queries)
+
+    def test_nectar_list_query_count_is_fixed(self):
+        """
+        Test Scenario: An authenticated bee lists nectars it applied to.
+
+        This test ensures that the nectar list endpoint resolves has_application for
+        the whole page at once and keeps a fixed number of queries.
+        """
+        self.add_nectar_with_contract(0)
+        client = APIClient()
+        client.force_authenticate(User.objects.get(email='bee0@example.com'))
+        with CaptureQueriesContext(connection) as context:
+            response = client.get('/honeycomb/nectars/')
+        self.assertEqual(response.json()[0]['has_application'], True)
+
+        for index in range(1, 5):
+            self.add_nectar_with_contract(index)
+        with self.assertNumQueries(len(context)):
+            response = client.get('/honeycomb/nectars/')
+        has_application = {nectar['nectar_title']: nectar['has_application'] for nectar in response.json()}
+        self.assertEqual(has_application, {'Nectar 0': True, **{f'Nectar {index}': False for index in range(1, 5)}})
+
+
+class NotificationFanOutTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_user(email='admin1@example.com', password='pass')
+        self.hive = Hive.objects.create(name='Hive', description='A hive for testing', hive_type='queen')
+        self.hive.admins.add(self.admin)
+        self.bees = [Bee.objects.create(user=User.objects.create_user(email=f'bee{i}@example.com', password='pass'))
+                     for i in range(3)]
+        for bee in self.bees:
+            Membership.objects.create(hive=self.hive, bee=bee, is_accepted=True)
+
+    def create_nectar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            Nectar.objects.create(nectar_title='Nectar', nectar_description='Nectar', nectar_hive=self.hive)
+
+    def test_nectar_notifications_are_fanned_out_once(self):
+        """
+        Test Scenario: The same nectar is posted twice in a row in a hive with several bees.
+
+        This test ensures that the admins and every hive bee are notified once and that
+        identical notifications within the deduplication window are skipped.
+        """
+        self.create_nectar()
+        self.create_nectar()
+
+        posted = Notification.objects.filter(message__startswith="Nectar 'Nectar'")
+        self.assertEqual(sorted(posted.values_list('user__email', flat=True)),
+                         [bee.user.email for bee in self.bees])
+        self.assertEqual(Notification.objects.filter(user=self.admin, message__startswith="A new nectar").count(), 1)
+
+
+class ScriptedCVIngestionPipeline(CVIngestionPipeline):
+    """
+    Stands in for the backend assistant, which creates the bee through its create_user tool. The stages still
+    run on the worker pools but one at a time, the shared memory test database fails concurrent writes at once
+    instead of waiting on their locks.
+    """
+    unreadable = {'broken.pdf'}
+    database_lock = threading.Lock()
+
+    def process(self, name, checkpoint):
+        with self.database_lock:
+            return super().process(name, checkpoint)
+
+    def extract(self, checkpoint):
+        if os.path.basename(checkpoint.file_path) in self.unreadable:
+            raise RuntimeError("The assistant did not create a user from the CV")
+        user = User.objects.create_user(email=f'{checkpoint.id}@example.com', password='pass')
+        Bee.objects.create(user=user).documents.add(checkpoint.document)
+
+
+class CVIngestionTests(TransactionTestCase):
+
+    def setUp(self):
+        self.server = FakeOpenAIServer.start_for(self)
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=os.path.join(self.directory, 'media'))
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.admin = User.objects.create_superuser(email='admin@example.com', password='pass')
+        self.file_paths = []
+        for name in ('ada.pdf', 'broken.pdf', 'grace.pdf'):
+            self.file_paths.append(os.path.join(self.directory, name))
+            with open(self.file_paths[-1], 'wb') as file:
+                file.write(f'CV of {name}'.encode())
+
+    def test_ingestion_is_checkpointed_and_resumable(self):
+        """
+        Test Scenario: Three CVs are ingested by two workers per stage, one of them cannot be extracted.
+        The ingestion then runs again, first as is and then retrying the failed CV once it is readable.
+
+        This test ensures that every CV is uploaded and indexed in its own vector store, that the failure is
+        recorded with its stage, that finished CVs are never processed twice and that a retry resumes the
+        failed CV at the stage it failed in.
+        """
+        stats = ScriptedCVIngestionPipeline(self.admin, workers=2).run(self.file_paths)
+
+        self.assertEqual((stats.extracted, len(stats.failures), stats.skipped), (2, 1, 0))
+        self.assertEqual(stats.failures[0][:2], (self.file_paths[1], 'extract'))
+        self.assertEqual(self.server.calls('POST', '/files'), 3)
+        self.assertEqual(self.server.calls('POST', '/vector_stores'), 3)
+        stages = dict(CVIngestion.objects.values_list('file_path', 'stage'))
+        self.assertEqual(stages, {self.file_paths[0]: 'extracted', self.file_paths[1]: 'indexed',
+                                  self.file_paths[2]: 'extracted'})
+        failed = CVIngestion.objects.get(file_path=self.file_paths[1])
+        self.assertTrue(failed.error.startswith('extract:'))
+        self.assertEqual(failed.document.isolated_vector_store, failed.vector_store_id)
+
+        stats = ScriptedCVIngestionPipeline(self.admin, workers=2).run(self.file_paths)
+        self.assertEqual((stats.extracted, stats.skipped), (0, 3))
+
+        pipeline = ScriptedCVIngestionPipeline(self.admin, workers=2)
+        pipeline.unreadable = set()
+        stats = pipeline.run(self.file_paths, retry_failed=True)
+        self.assertEqual((stats.extracted, len(stats.failures), stats.skipped), (1, 0, 2))
+        self.assertEqual(self.server.calls('POST', '/files'), 3)
+        self.assertEqual(self.server.calls('POST', '/vector_stores'), 3)
+        self.assertEqual(Bee.objects.filter(documents__cv_ingestions__isnull=False).count(), 3)
+        self.assertIn('1 CV(s) extracted, 0 failed, 2 skipped', stats.summary()[0])
+
+    def test_failure_that_cannot_be_checkpointed_finishes_once(self):
+        """
+        Test Scenario: A CV fails to be extracted and its failure cannot be written to the checkpoint either.
+
+        This test ensures that the file is counted as one failure and leaves the pipeline once, so the run only
+        returns after the other CVs are done.
+        """
+        save = CVIngestion.save
+
+        def save_unless_failed(checkpoint, *args, **kwargs):
+            if 'attempts' in kwargs.get('update_fields', ()):
+                raise DatabaseError('checkpoint lost')
+            return save(checkpoint, *args, **kwargs)
+
+        pipeline = ScriptedCVIngestionPipeline(self.admin, workers=2)
+        with mock.patch.object(CVIngestion, 'save', autospec=True, side_effect=save_unless_failed):
+            stats = pipeline.run(self.file_paths)
+
+        self.assertEqual(pipeline.pending, 0)
+        self.assertEqual((stats.extracted, stats.failures), (2, [(self.file_paths[1], 'extract', 'checkpoint lost')]))
+        self.assertEqual(CVIngestion.objects.get(file_path=self.file_paths[1]).attempts, 0)
+
+
+class CachedViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.hive = Hive.objects.create(name='Public Hive', description='Open to all', hive_type='queen',
+                                        is_public=True)
+        Hive.objects.create(name='Private Hive', description='Members only', hive_type='queen')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='reader@example.com', password='pass'))
+
+    def get_public_hives(self) -> [str]:
+        return [hive['name'] for hive in self.client.get('/honeycomb/hives/?is_public=true').json()]
+
+    def test_public_hive_list_is_cached_until_a_hive_changes(self):
+        """
+        Test Scenario: The public hives are listed repeatedly while a hive is renamed and tagged in between.
+
+        This test ensures that repeated lists are answered from the cache without queries, that a change of a
+        hive or of its tags is visible on the next list and that lists of other filters are not cached.
+        """
+        self.assertEqual(self.get_public_hives(), ['Public Hive'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get_public_hives(), ['Public Hive'])
+
+        self.hive.name = 'Renamed Hive'
+        self.hive.save()
+        self.assertEqual(self.get_public_hives(), ['Renamed Hive'])
+
+        self.hive.tags.add('python')
+        self.assertEqual(self.client.get('/honeycomb/hives/?is_public=true').json()[0]['tags'], ['python'])
+
+        with CaptureQueriesContext(connection) as context:
+            self.client.get('/honeycomb/hives/')
+        self.assertGreater(len(context), 0)
+        with self.assertNumQueries(len(context)):
+            self.client.get('/honeycomb/hives/')
+
+    def test_cached_public_hives_keep_the_application_of_each_user(self):
+        """
+        Test Scenario: Two users list the public hives, one of them has applied to a nectar of a public hive,
+        then the other one applies too.
+
+        This test ensures that each user sees their own application state on the nectar and that a new
+        application is visible on the next list of its user.
+        """
+        nectar = Nectar.objects.create(nectar_title='Nectar', nectar_description='Nectar', nectar_hive=self.hive,
+                                       price=100, required_bees=1)
+        applicant, other = [Bee.objects.create(user=User.objects.create_user(email=f'{name}@example.com',
+                                                                             password='pass'))
+                            for name in ('applicant', 'other')]
+        Contract.objects.create(nectar=nectar, bee=applicant, accepted_rate=10)
+        clients = {}
+        for bee in (applicant, other):
+            clients[bee] = APIClient()
+            clients[bee].force_authenticate(bee.user)
+
+        def has_application(bee) -> bool:
+            hives = clients[bee].get('/honeycomb/hives/?is_public=true').json()
+            return hives[0]['nectars'][0]['has_application']
+
+        self.assertTrue(has_application(applicant))
+        self.assertFalse(has_application(other))
+        self.assertTrue(has_application(applicant))
+
+        Contract.objects.create(nectar=nectar, bee=other, accepted_rate=10)
+        self.assertTrue(has_application(other))
+
+
+class ReplicaRoutingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.hive = Hive.objects.create(name='Hive', description='A hive for testing', hive_type='queen')
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user(email='replica@example.com', password='pass'))
+
+    def test_only_read_only_actions_read_from_the_replica(self):
+        """
+        Test Scenario: A hive is listed and retrieved, then its leaderboard is read through a custom action.
+
+        This test ensures that the reads of list and retrieve are marked for the replica,
+        that other actions read from default and that the mark does not outlive the request.
+        """
+        reads = []
+
+        def db_for_read(router, model, **hints):
+            reads.append(is_replica_read())
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=db_for_read):
+            self.assertEqual(self.client.get('/honeycomb/hives/').status_code, 200)
+            self.assertEqual(self.client.get(f'/honeycomb/hives/{self.hive.id}/').status_code, 200)
+            self.assertTrue(reads and all(reads))
+            self.assertFalse(is_replica_read())
+
+            reads.clear()
+            self.client.get(f'/honeycomb/hives/{self.hive.id}/leaderboard/')
+            self.assertTrue(reads)
+            self.assertFalse(any(reads))
+
+    def test_router_uses_the_replica_only_when_configured(self):
+        """
+        Test Scenario: The router is asked for the database of a read inside and outside a read only action,
+        with and without a replica in the settings.
+
+        This test ensures that only reads of read only actions go to a configured replica,
+        that writes stay on default and that migrations skip the replica.
+        """
+        router = ReplicaRouter()
+        without_replica = {alias: database for alias, database in settings.DATABASES.items() if alias != 'replica'}
+        with_replica = {**without_replica, 'replica': settings.DATABASES['default']}
+        token = start_replica_reads()
+        try:
+            with mock.patch.object(settings, 'DATABASES', without_replica):
+                self.assertIsNone(router.db_for_read(Hive))
+            with mock.patch.object(settings, 'DATABASES', with_replica):
+                self.assertEqual(router.db_for_read(Hive), 'replica')
+                self.assertEqual(router.db_for_write(Hive), 'default')
+        finally:
+            stop_replica_reads(token)
+        with mock.patch.object(settings, 'DATABASES', with_replica):
+            self.assertIsNone(router.db_for_read(Hive))
+        self.assertFalse(router.allow_migrate('replica', 'honeycomb'))
+        self.assertTrue(router.allow_migrate('default', 'honeycomb'))
@@ -11,17 +11,20 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from common.cache import cache_response
 from common.models import Document
+from common.views import EagerLoadingViewSetMixin, InstrumentedViewSetMixin, ReplicaReadViewSetMixin
 from communication.models import Conversation, Notification
 from .filters import HiveFilter, BeeFilter, NectarFilter, MembershipFilter, ContractFilter, HiveRequestFilter, ReportsFilter
 from .honeycomb_service import NectarService, HiveService
-from .models import Hive, Bee, Membership, Nectar, HiveRequest, Contract, Report
+from .models import Hive, Bee, Membership, Nectar, HiveRequest, Contract, Report, HiveDashboard
 from .serializers import HiveSerializer, BeeSerializer, MembershipSerializer, NectarSerializer, HiveRequestSerializer, \
     ContractSerializer, MembershipAcceptSerializer, ReportSerializer, HiveWiThDetailsSerializer, CreateReportSerializer, \
     CreateNectarSerializer, CreateHiveRequestSerializer, CreateContractSerializer, BeeWithDetailSerializer, CreateHiveSerializer
 
 
-class HiveViewSet(viewsets.ModelViewSet):
+class HiveViewSet(InstrumentedViewSetMixin, ReplicaReadViewSetMixin, EagerLoadingViewSetMixin,
+                  viewsets.ModelViewSet):
     queryset = Hive.objects.all()
     serializer_class = HiveSerializer
     permission_classes = [IsAuthenticated]
@@ -35,6 +38,13 @@ class HiveViewSet(viewsets.ModelViewSet):
         else:
             return HiveSerializer
 
+    # The public hives are listed by every member, other lists are filtered per request and not worth caching.
+    # Their nectars tell whether the requesting user applied (has_application), so entries are kept per user.
+    @cache_response(models=[Hive, Bee, Nectar, Contract, Membership, 'user.User', 'common.Document', 'taggit.Tag'],
+                    per_user=True,
+                    condition=lambda request: request.query_params.get('is_public') in ('true', 'True'))
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
 
 
     @atomic
@@ -80,44 +90,54 @@ class HiveViewSet(viewsets.ModelViewSet):
 
     def retrieve(self, request, *args, **kwargs):
         instance = self.get_object()
-        bees_ordered = instance.get_bees_ordered_by_honey_points()
         data = {
             "hive": HiveSerializer(instance).data,
             "bees": [
                 {
                     "bee_id": bee.id,
                     "email": bee.user.email,
-                    "total_honey_points": bee.total_honey_points
-                } for bee in bees_ordered
+                    "total_honey_points": honey_points
+                } for bee, honey_points in instance.get_honey_points_leaderboard()
             ]
         }
         return Response(data)
 
+    @action(detail=True, methods=['get'], url_path='leaderboard')
+    def leaderboard(self, request, pk=None):
+        hive = self.get_object()
+        try:
+            limit = int(request.query_params.get('limit', 10))
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            return Response({"message": "limit and offset should be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = [
+            {
+                "rank": rank,
+                "bee_id": bee.id,
+                "email": bee.user.email,
+                "total_honey_points": honey_points
+            } for rank, bee, honey_points in hive.get_honey_points_ranking(max(limit, 1), max(offset, 0))
+        ]
+        return Response(data)
+
     @action(detail=True, methods=['get'], url_path='dashboard')
     def dashboard(self, request, pk=None):
         try:
             hive = self.get_object()
+            hive_with_details = HiveWiThDetailsSerializer.setup_eager_loading(Hive.objects.filter(pk=hive.pk)).get()
 
-            # Aggregated Data
-            active_nectars = Nectar.objects.filter(nectar_hive=hive, status='Active')
-            completed_nectars = Nectar.objects.filter(nectar_hive=hive, status='Complete')
-            active_nectars_count = active_nectars.count()
-            total_open_contracts = Contract.objects.filter(nectar__nectar_hive=hive, is_accepted=True,
-                                                           completed_at__isnull=True).count()
-            total_contracts = Contract.objects.filter(nectar__nectar_hive=hive).count()
-            pending_requests = HiveRequest.objects.filter(hive=hive, is_accepted=False).count()
-            pending_contracts = Contract.objects.filter(nectar__nectar_hive=hive, is_accepted=False).count()
-            last_reports = Report.objects.filter(hive=hive).order_by('-created_at')[:5]
+            # Aggregated Data, kept current by the honeycomb signals
+            counters = HiveDashboard.objects.get_or_build(hive).get_counters()
+            active_nectars = NectarSerializer.setup_eager_loading(
+                Nectar.objects.filter(nectar_hive=hive, status='Active'))
+            last_reports = ReportSerializer.setup_eager_loading(
+                Report.objects.filter(hive=hive).order_by('-created_at'))[:5]
 
             data = {
-                'hive': HiveWiThDetailsSerializer(hive).data,
+                'hive': HiveWiThDetailsSerializer(hive_with_details).data,
                 'active_nectars': NectarSerializer(active_nectars, many=True).data,
-                'total_active_nectars': active_nectars_count,
-                'total_completed_nectars': completed_nectars.count(),
-                'total_open_contracts': total_open_contracts,
-                'total_contracts': total_contracts,
-                'pending_requests': pending_requests,
-                'pending_contracts': pending_contracts,
+                **counters,
                 'last_reports': ReportSerializer(last_reports, many=True).data
             }
             return Response(data)
@@ -125,7 +145,8 @@ class HiveViewSet(viewsets.ModelViewSet):
             return Response({"message": "Hive not found"}, status=404)
 
 
-class BeeViewSet(viewsets.ModelViewSet):
+class BeeViewSet(InstrumentedViewSetMixin, ReplicaReadViewSetMixin, EagerLoadingViewSetMixin,
+                 viewsets.ModelViewSet):
     queryset = Bee.objects.all()
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
@@ -138,7 +159,8 @@ class BeeViewSet(viewsets.ModelViewSet):
             return BeeWithDetailSerializer
 
 
-class MembershipViewSet(viewsets.ModelViewSet):
+class MembershipViewSet(InstrumentedViewSetMixin, ReplicaReadViewSetMixin, EagerLoadingViewSetMixin,
+                        viewsets.ModelViewSet):
     queryset = Membership.objects.all()
     serializer_class = MembershipSerializer
     permission_classes = [IsAuthenticated]
@@ -150,7 +172,8 @@ class MembershipViewSet(viewsets.ModelViewSet):
         return Membership.objects.filter(bee__user=user)
 
 
-class NectarViewSet(viewsets.ModelViewSet):
+class NectarViewSet(InstrumentedViewSetMixin, ReplicaReadViewSetMixin, EagerLoadingViewSetMixin,
+                    viewsets.ModelViewSet):
     queryset = Nectar.objects.all()
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
@@ -177,7 +200,8 @@ class NectarViewSet(viewsets.ModelViewSet):
         conversation.save()
 
 
-class HiveRequestViewSet(viewsets.ModelViewSet):
+class HiveRequestViewSet(InstrumentedViewSetMixin, ReplicaReadViewSetMixin, EagerLoadingViewSetMixin,
+                         viewsets.ModelViewSet):
     queryset = HiveRequest.objects.all()
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
@@ -237,7 +261,8 @@ class HiveRequestViewSet(viewsets.ModelViewSet):
         return hive.is_admin_by_user(user)
 
 
-class ReportViewSet(viewsets.ModelViewSet):
+class ReportViewSet(InstrumentedViewSetMixin, ReplicaReadViewSetMixin, EagerLoadingViewSetMixin,
+                    viewsets.ModelViewSet):
     queryset = Report.objects.all()
     serializer_class = ReportSerializer
     permission_classes = [IsAuthenticated]
@@ -262,7 +287,8 @@ class ReportViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class ContractViewSet(viewsets.ModelViewSet):
+class ContractViewSet(InstrumentedViewSetMixin, ReplicaReadViewSetMixin, EagerLoadingViewSetMixin,
+                      viewsets.ModelViewSet):
     queryset = Contract.objects.all()
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend]
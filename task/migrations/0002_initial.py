@@ -0,0 +1,95 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:01
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('common', '0002_initial'),
+        ('honeycomb', '0001_initial'),
+        ('task', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historicalbeeselection',
+            name='history_user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='historicaltask',
+            name='bee_selection',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='task.beeselection'),
+        ),
+        migrations.AddField(
+            model_name='historicaltask',
+            name='contract',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='honeycomb.contract'),
+        ),
+        migrations.AddField(
+            model_name='historicaltask',
+            name='history_user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='historicaltask',
+            name='nectar',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='honeycomb.nectar'),
+        ),
+        migrations.AddField(
+            model_name='historicaltaskassignment',
+            name='bee',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='honeycomb.bee'),
+        ),
+        migrations.AddField(
+            model_name='historicaltaskassignment',
+            name='history_user',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='assigned_bees',
+            field=models.ManyToManyField(blank=True, related_name='tasks', to='honeycomb.bee'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='bee_selection',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='task', to='task.beeselection'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='contract',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='honeycomb.contract'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='documents',
+            field=models.ManyToManyField(blank=True, related_name='tasks', to='common.document'),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='nectar',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tasks', to='honeycomb.nectar'),
+        ),
+        migrations.AddField(
+            model_name='historicaltaskassignment',
+            name='task',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='task.task'),
+        ),
+        migrations.AddField(
+            model_name='taskassignment',
+            name='bee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_task_assignments', to='honeycomb.bee'),
+        ),
+        migrations.AddField(
+            model_name='taskassignment',
+            name='task',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pending_assignments', to='task.task'),
+        ),
+    ]
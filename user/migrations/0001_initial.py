@@ -0,0 +1,176 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:01
+
+import django.core.validators
+import django.db.models.deletion
+import taggit.managers
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('common', '0001_initial'),
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('password', models.CharField(max_length=128, verbose_name='password')),
+                ('last_login', models.DateTimeField(blank=True, null=True, verbose_name='last login')),
+                ('email', models.EmailField(db_index=True, max_length=254, unique=True)),
+                ('username', models.CharField(blank=True, max_length=120, null=True)),
+                ('phone_number', models.CharField(blank=True, max_length=17, null=True, unique=True, validators=[django.core.validators.RegexValidator(message="Phone number must be entered in the format: '+999999999'. Up to 15 digits allowed.", regex='^\\+?1?\\d{9,15}$')])),
+                ('avatar', models.ImageField(blank=True, null=True, upload_to='avatars/')),
+                ('is_active', models.BooleanField(default=True)),
+                ('is_staff', models.BooleanField(default=False)),
+                ('is_superuser', models.BooleanField(default=False)),
+                ('is_freelancer', models.BooleanField(db_index=True, default=False)),
+                ('is_company', models.BooleanField(db_index=True, default=False)),
+                ('date_joined', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('first_name', models.CharField(blank=True, max_length=120)),
+                ('last_name', models.CharField(blank=True, max_length=120)),
+                ('date_of_birth', models.DateField(blank=True, null=True)),
+                ('passport_number', models.CharField(blank=True, max_length=120)),
+                ('language', models.CharField(blank=True, max_length=120)),
+                ('bio', models.TextField(blank=True)),
+                ('headline', models.CharField(blank=True, max_length=120)),
+                ('hourly_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=10, null=True)),
+                ('cv_notes', models.TextField(blank=True)),
+                ('company_name', models.CharField(blank=True, max_length=120)),
+                ('kvk_number', models.CharField(blank=True, max_length=120)),
+                ('vat_id', models.CharField(blank=True, max_length=120)),
+                ('bank_account', models.CharField(blank=True, max_length=120)),
+                ('company_logo', models.ImageField(blank=True, upload_to='company_logo')),
+                ('company_description', models.TextField(blank=True)),
+                ('company_website', models.URLField(blank=True)),
+                ('company_size', models.CharField(blank=True, max_length=120)),
+                ('company_industry', models.CharField(blank=True, max_length=120)),
+                ('company_type', models.CharField(blank=True, max_length=120)),
+                ('company_founded', models.DateField(blank=True, null=True)),
+                ('company_location', models.CharField(blank=True, max_length=120)),
+                ('company_specialities', models.JSONField(blank=True, default=list)),
+                ('company_social_media', models.JSONField(blank=True, default=dict)),
+                ('settings', models.JSONField(blank=True, default=dict)),
+                ('personality_type', models.JSONField(blank=True, default=dict)),
+                ('iq', models.IntegerField(blank=True, null=True)),
+                ('points', models.IntegerField(db_index=True, default=0)),
+                ('level', models.IntegerField(db_index=True, default=1)),
+                ('groups', models.ManyToManyField(blank=True, help_text='The groups this user belongs to. A user will get all permissions granted to each of their groups.', related_name='user_set', related_query_name='user', to='auth.group', verbose_name='groups')),
+                ('tags', taggit.managers.TaggableManager(help_text='A comma-separated list of tags.', through='taggit.TaggedItem', to='taggit.Tag', verbose_name='Tags')),
+                ('user_permissions', models.ManyToManyField(blank=True, help_text='Specific permissions for this user.', related_name='user_set', related_query_name='user', to='auth.permission', verbose_name='user permissions')),
+            ],
+            options={
+                'verbose_name': 'user',
+                'verbose_name_plural': 'users',
+                'ordering': ['-date_joined'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Address',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address_type', models.CharField(choices=[('home', 'Home'), ('work', 'Work'), ('other', 'Other')], max_length=50)),
+                ('street_address', models.CharField(max_length=255)),
+                ('city', models.CharField(max_length=100)),
+                ('state', models.CharField(blank=True, max_length=100)),
+                ('postal_code', models.CharField(max_length=20)),
+                ('country', models.CharField(max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='addresses', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AvailableTimeSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('recurrence_rule', models.CharField(blank=True, max_length=255)),
+                ('recurrence_end', models.DateField(blank=True, null=True)),
+                ('type', models.CharField(max_length=100)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='available_time_slots', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AvailableTimeSlotException',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField()),
+                ('reason', models.CharField(blank=True, max_length=255)),
+                ('slot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exceptions', to='user.availabletimeslot')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Certificate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=50)),
+                ('institution', models.CharField(blank=True, max_length=50)),
+                ('date_earned', models.DateField(blank=True, null=True)),
+                ('description', models.TextField()),
+                ('documents', models.ManyToManyField(related_name='certifications', to='common.document')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='certifications', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Education',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('degree', models.CharField(max_length=50)),
+                ('description', models.TextField()),
+                ('university', models.CharField(max_length=50)),
+                ('major', models.CharField(max_length=50)),
+                ('documents', models.ManyToManyField(blank=True, related_name='educations', to='common.document')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='educations', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Portfolio',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('title', models.CharField(max_length=50)),
+                ('description', models.TextField(blank=True)),
+                ('link', models.URLField(blank=True, null=True)),
+                ('image', models.ImageField(blank=True, null=True, upload_to='portfolio/')),
+                ('documents', models.ManyToManyField(blank=True, related_name='portfolios', to='common.document')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='portfolio', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Skill',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50)),
+                ('type', models.CharField(blank=True, choices=[('Technical', 'Technical'), ('Soft', 'Soft')], max_length=50)),
+                ('equivalents', models.CharField(blank=True, max_length=50)),
+                ('description', models.TextField(blank=True)),
+                ('parents', models.ManyToManyField(blank=True, related_name='sub_skills', to='user.skill')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Experience',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.CharField(max_length=50)),
+                ('company', models.CharField(max_length=50)),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('description', models.TextField(blank=True)),
+                ('documents', models.ManyToManyField(blank=True, related_name='experiences', to='common.document')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='experiences', to=settings.AUTH_USER_MODEL)),
+                ('related_skills', models.ManyToManyField(blank=True, related_name='experiences', to='user.skill')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='skills',
+            field=models.ManyToManyField(blank=True, related_name='users', to='user.skill'),
+        ),
+    ]
@@ -172,7 +172,7 @@ class User(AbstractBaseUser, PermissionsMixin):
     iq = models.IntegerField(blank=True, null=True)
 
     # Gamification
-    points = models.IntegerField(default=0)
+    points = models.IntegerField(default=0, db_index=True)
     level = models.IntegerField(default=1, db_index=True)
 
     skills = models.ManyToManyField('Skill', related_name='users', blank=True)
@@ -200,13 +200,11 @@ class User(AbstractBaseUser, PermissionsMixin):
         return self.email
 
     def get_rank(self):
-        # I want to get the rank of the user based on the points in comparison to other users
-        users = User.objects.all().order_by('-points')
-        rank = 1
-        for user in users:
-            if user == self:
-                return rank
-            rank += 1
+        # Rank of the user based on the points in comparison to other users, read from the leaderboard index
+        from honeycomb.leaderboard import UserLeaderboard
+        rank = UserLeaderboard().get_rank(self.id)
+        if rank is None:
+            rank = User.objects.filter(points__gt=self.points).count() + 1
         return rank
 
     def convert_to_ai_readable(self):
@@ -1,11 +1,42 @@
+from typing import Optional
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.db import transaction
+from rest_framework_simplejwt.utils import get_md5_hash_password
 
 from user.models import Skill
 
 User = get_user_model()
 
 
+class UserCache:
+    """
+    Websocket authentication state of users by id: whether they are active and the revoke marker tokens carry,
+    the user itself is loaded by primary key. Entries live JWT_USER_CACHE_TIMEOUT seconds and are dropped by
+    user.signals when the user is saved or deleted, a deactivation takes effect on the next handshake.
+    """
+
+    @staticmethod
+    def get_key(user_id) -> str:
+        return f"user:{user_id}"
+
+    @staticmethod
+    def get(user_id) -> Optional[dict]:
+        return cache.get(UserCache.get_key(user_id))
+
+    @staticmethod
+    def set(user) -> None:
+        # The marker is the hash of the password hash that tokens carry in their revoke claim, not the hash itself
+        state = {'id': user.pk, 'is_active': user.is_active, 'revoke_marker': get_md5_hash_password(user.password)}
+        cache.set(UserCache.get_key(user.pk), state, settings.JWT_USER_CACHE_TIMEOUT)
+
+    @staticmethod
+    def delete(user_id) -> None:
+        cache.delete(UserCache.get_key(user_id))
+
+
 class UserService:
 
     @staticmethod
@@ -4,6 +4,7 @@ from rest_framework import viewsets
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import AllowAny, IsAuthenticated
 
+from common.cache import cache_response
 from .filters import SkillFilter
 from .models import User, Skill, Experience, Education, Certificate, Portfolio
 from .serializers import UserWithRelatedFieldsSerializer, SkillSerializer, UserBaseCreateSerializer, UserSerializer, \
@@ -116,3 +117,11 @@ class SkillViewSet(viewsets.ModelViewSet):
     serializer_class = SkillSerializer
     filter_backends = [DjangoFilterBackend]
     filterset_class = SkillFilter
+
+    @cache_response(models=[Skill])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(models=[Skill])
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)